@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de l'audit du lake: lecture complète + second passage MD5 (ancienne méthode)
+contre lecture unique en flux (audit_lake.scan_file).
+
+Chaque méthode tourne dans un sous-processus distinct pour mesurer son pic de mémoire
+(ru_maxrss) et son temps écoulé. Vient ensuite l'audit complet (audit_lake.py --full)
+pour chaque valeur de --workers. Sans --root, un lake synthétique est généré (moteur
+numpy si disponible) dans un répertoire temporaire.
+
+Usage:
+    python benchmarks/bench_audit.py [--days 10] [--consultations 200000] [--evenements 20000]
+    python benchmarks/bench_audit.py --root ficp_data_lake --workers 1,2,4,8
+"""
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import resource
+import tempfile
+import subprocess
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+import audit_lake  # noqa: E402
+
+AREAS = ('consultation', 'inscription', 'radiation')
+
+
+def legacy_scan(path, width):
+    """Ancienne méthode: toutes les lignes en mémoire, puis relecture pour le MD5."""
+    with open(path, 'r', encoding='utf-8') as f:
+        r = csv.reader(f)
+        header = next(r)
+        rows = list(r)
+    bad_rows = sum(1 for row in rows if len(row) != width)
+    h = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(8192), b''):
+            h.update(chunk)
+    return header, len(rows), bad_rows, h.hexdigest()
+
+
+def child(impl, root):
+    scan = legacy_scan if impl == 'legacy' else audit_lake.scan_file
+    t0 = time.perf_counter()
+    files = rows = 0
+    digests = []
+    for area in AREAS:
+        folder = os.path.join(root, area)
+        width = len(audit_lake.EXPECTED[area])
+        for name in sorted(os.listdir(folder)):
+            _, n, _, digest = scan(os.path.join(folder, name), width)
+            files += 1
+            rows += n
+            digests.append(digest)
+    elapsed = time.perf_counter() - t0
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'files': files, 'rows': rows, 'seconds': elapsed, 'rss_kb': rss_kb,
+                      'digest': hashlib.md5(''.join(digests).encode()).hexdigest()}))
+    return 0
+
+
+def build_lake(args):
+    """Lake synthétique généré par la CLI dans un sous-processus (le pic mémoire de la
+    génération ne doit pas être hérité par les mesures: ru_maxrss survit à exec)."""
+    root = tempfile.mkdtemp(prefix='ficp_bench_audit_')
+    cmd = [sys.executable, os.path.join(SCRIPTS, 'generate_ficp_daily.py'), '--root', root, '--no-state',
+           '--start', '2025-01-01', '--days', str(args.days),
+           '--consultations', str(args.consultations), '--evenements', str(args.evenements)]
+    try:
+        import numpy  # noqa: F401
+        cmd += ['--engine', 'numpy']
+    except ImportError:
+        pass
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return root
+
+
+def lake_size(root):
+    return sum(os.path.getsize(os.path.join(root, area, name))
+               for area in AREAS for name in os.listdir(os.path.join(root, area)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, help='Lake existant (defaut: lake synthetique temporaire)')
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--consultations', type=int, default=200000)
+    parser.add_argument('--evenements', type=int, default=20000)
+    parser.add_argument('--workers', type=str, default='1,2,4,8', help='Valeurs de --workers pour l\'audit complet')
+    parser.add_argument('--child', choices=('legacy', 'stream'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return child(args.child, args.root)
+
+    root = args.root or build_lake(args)
+    try:
+        print(f'lake: {root} ({lake_size(root) / 1e6:.1f} MB)')
+        print('impl    files  rows        seconds  peak_rss_MB')
+        results = {}
+        for impl in ('legacy', 'stream'):
+            out = subprocess.run([sys.executable, __file__, '--child', impl, '--root', root],
+                                 check=True, capture_output=True, text=True).stdout
+            res = results[impl] = json.loads(out)
+            print(f"{impl:7s} {res['files']:5d}  {res['rows']:10d}  {res['seconds']:7.2f}  {res['rss_kb'] / 1024:11.1f}")
+        same = results['legacy']['digest'] == results['stream']['digest']
+        print(f'\nsame md5: {same} - speedup x{results["legacy"]["seconds"] / results["stream"]["seconds"]:.2f}')
+
+        print(f'\naudit_lake.py --full (cpu: {os.cpu_count()})')
+        print('workers  seconds')
+        base = None
+        for workers in [int(w) for w in args.workers.split(',') if w]:
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(SCRIPTS, 'audit_lake.py'), root, '--full',
+                            '--workers', str(workers)], stdout=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - t0
+            base = base or elapsed
+            print(f'{workers:7d}  {elapsed:7.2f}  (x{base / elapsed:.2f})')
+    finally:
+        if not args.root:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
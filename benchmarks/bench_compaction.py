@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la compaction mensuelle: chargement à froid de l'historique avant/après.
+
+Le lake source (--root, sinon une année générée aux volumes par défaut) est copié, puis
+mesuré tel quel (fichiers quotidiens) et après compact_lake.py. Chaque mesure tourne dans
+un processus neuf (pas d'import ni de cache Python réutilisé): load_history_upto du
+générateur, HistoryStore.from_lake et audit_lake.py --full. Avec --drop-caches (root
+Linux), le cache de pages du système est vidé avant chaque mesure.
+
+Usage:
+    python benchmarks/bench_compaction.py [--days 365]
+    python benchmarks/bench_compaction.py --root /chemin/lake [--repeat 3] [--drop-caches]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+AREAS = ('consultation', 'inscription', 'radiation')
+
+CHILD = r'''
+import os, sys, json, time, contextlib
+sys.path.insert(0, sys.argv[1])
+root, what = sys.argv[2], sys.argv[3]
+t0 = time.perf_counter()
+import generate_ficp_daily as gen
+from history_store import HistoryStore
+import audit_lake
+import ficp_status
+gen.set_data_root(root)
+upto = ficp_status.latest_day() + gen.timedelta(days=1)
+if what == 'load_history':
+    gen.load_history_upto(upto)
+elif what == 'history_store':
+    HistoryStore.from_lake(root, upto.toordinal())
+else:
+    with contextlib.redirect_stdout(None):
+        audit_lake.main([root, '--full', '--save-manifest'])
+print(json.dumps(time.perf_counter() - t0))
+'''
+
+
+def build_lake(days, workdir):
+    root = os.path.join(workdir, 'source')
+    subprocess.run([sys.executable, os.path.join(SCRIPTS, 'generate_ficp_daily.py'), '--root', root,
+                    '--no-state', '--start', '2025-01-01', '--days', str(days)], check=True, stdout=subprocess.DEVNULL)
+    return root
+
+
+def drop_caches():
+    os.sync()
+    with open('/proc/sys/vm/drop_caches', 'w') as f:
+        f.write('3\n')
+
+
+def measure(root, what, repeat, cold):
+    best = None
+    for _ in range(repeat):
+        if cold:
+            drop_caches()
+        out = subprocess.run([sys.executable, '-c', CHILD, SCRIPTS, root, what],
+                             check=True, capture_output=True, text=True).stdout
+        elapsed = json.loads(out.strip().splitlines()[-1])
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def count_files(root):
+    return sum(len(os.listdir(os.path.join(root, area))) for area in AREAS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, help='Lake source (defaut: une annee generee)')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=3, help='Meilleur temps sur N processus')
+    parser.add_argument('--drop-caches', action='store_true', help='Vide le cache de pages avant chaque mesure (root)')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='ficp_bench_compaction_')
+    try:
+        src = args.root or build_lake(args.days, workdir)
+        lake = os.path.join(workdir, 'lake')
+        shutil.copytree(src, lake, ignore=shutil.ignore_patterns('_state', '_manifest.json'))
+        print(f'source: {src}')
+        print('lake        files  load_history_s  history_store_s  audit_full_s')
+        for label in ('quotidien', 'compacte'):
+            if label == 'compacte':
+                t0 = time.perf_counter()
+                subprocess.run([sys.executable, os.path.join(SCRIPTS, 'compact_lake.py'), '--root', lake],
+                               check=True, stdout=subprocess.DEVNULL)
+                print(f'(compaction: {time.perf_counter() - t0:.2f}s)')
+            times = [measure(lake, what, args.repeat, args.drop_caches)
+                     for what in ('load_history', 'history_store', 'audit')]
+            print(f'{label:10s} {count_files(lake):6d}  {times[0]:14.2f}  {times[1]:15.2f}  {times[2]:12.2f}')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
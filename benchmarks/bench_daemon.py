@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark du service (ficp_daemon.py) contre les exécutions isolées du runbook.
+
+Un lake de --days jours (avec l'état _state/) est préparé dans un processus à part, puis
+copié deux fois:
+- à froid: --triggers exécutions "generate_ficp_daily.py --date D", chacune dans un
+  interpréteur neuf comme une exécution planifiée (durée mesurée côté appelant, démarrage
+  de Python et imports compris; pic de mémoire lu dans sa ligne METRICS);
+- à chaud: le service est démarré une fois (--port), puis reçoit --triggers commandes
+  "next"; latence mesurée côté client, mémoire résidente lue dans "status".
+
+Usage:
+    python benchmarks/bench_daemon.py [--days 365] [--triggers 5] [--checkpoint 1]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import filecmp
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+import ficp_daemon  # noqa: E402
+
+START = datetime(2025, 1, 1)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def cold_runs(root, first, n):
+    times, rss = [], []
+    for i in range(n):
+        day = (first + timedelta(days=i)).strftime('%Y-%m-%d')
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.join(SCRIPTS, 'generate_ficp_daily.py'), '--root', root,
+                              '--date', day, '--metrics'], check=True, capture_output=True, text=True).stdout
+        times.append(time.perf_counter() - t0)
+        line = next(l for l in out.splitlines() if l.startswith('METRICS '))
+        rss.append(json.loads(line[len('METRICS '):])['peak_rss_kb'])
+    return times, max(rss)
+
+
+def warm_runs(root, n, checkpoint):
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(SCRIPTS, 'ficp_daemon.py'), '--root', root,
+                             '--port', str(port), '--checkpoint', str(checkpoint)], stdout=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                status = ficp_daemon.send('status', port)
+                break
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError('le service s\'est arrete')
+                time.sleep(0.05)
+        startup = time.perf_counter() - t0
+        times = []
+        for _ in range(n):
+            t1 = time.perf_counter()
+            reply = ficp_daemon.send('next', port)
+            times.append(time.perf_counter() - t1)
+            assert reply['ok'] and len(reply['days']) == 1, reply
+        status = ficp_daemon.send('status', port)
+        ficp_daemon.send('stop', port)
+        proc.wait(60)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    return startup, times, status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--triggers', type=int, default=5)
+    parser.add_argument('--checkpoint', type=int, default=1, help='--checkpoint du service')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='ficp_bench_daemon_')
+    try:
+        base = os.path.join(workdir, 'base')
+        end = START + timedelta(days=args.days - 1)
+        subprocess.run([sys.executable, os.path.join(SCRIPTS, 'generate_ficp_daily.py'), '--root', base,
+                        '--start', START.strftime('%Y-%m-%d'), '--end', end.strftime('%Y-%m-%d')],
+                       check=True, stdout=subprocess.DEVNULL)
+        cold_root, warm_root = os.path.join(workdir, 'cold'), os.path.join(workdir, 'warm')
+        shutil.copytree(base, cold_root)
+        shutil.copytree(base, warm_root)
+
+        cold, cold_rss = cold_runs(cold_root, end + timedelta(days=1), args.triggers)
+        startup, warm, status = warm_runs(warm_root, args.triggers, args.checkpoint)
+
+        print(f'lake de {args.days} jours, {args.triggers} jours generes par variante')
+        print('variante                 median_s    max_s  memoire_MB')
+        print(f"{'a froid (processus)':24s} {statistics.median(cold):8.3f} {max(cold):8.3f} {cold_rss / 1024:11.0f}"
+              '  (pic)')
+        print(f"{'a chaud (service)':24s} {statistics.median(warm):8.3f} {max(warm):8.3f} "
+              f"{status['rss_kb'] / 1024:11.0f}  (residente; pic {status['peak_rss_kb'] / 1024:.0f})")
+        print(f"demarrage du service: {startup:.2f}s (chargement de l'historique {status['load_s']:.2f}s)")
+        same = True
+        for area in ('consultation', 'inscription', 'radiation'):
+            names = sorted(os.listdir(os.path.join(cold_root, area)))
+            _, mismatch, errors = filecmp.cmpfiles(os.path.join(cold_root, area), os.path.join(warm_root, area),
+                                                   names, shallow=False)
+            same = same and not mismatch and not errors
+        print('fichiers identiques:', same)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark des moteurs de génération: python (historique) contre numpy (vectorisé).
+
+Pour chaque moteur, génère --days jours consécutifs dans un lake temporaire avec les
+volumes demandés et affiche le temps et le débit (lignes/s) de chaque jour.
+
+Usage:
+    python benchmarks/bench_engines.py [--consultations 200000] [--evenements 20000] [--days 2]
+    python benchmarks/bench_engines.py --engines numpy --consultations 1000000 --evenements 100000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+
+
+def run_engine(engine, args):
+    root = tempfile.mkdtemp(prefix=f'ficp_bench_{engine}_')
+    try:
+        gen.set_data_root(root)
+        gen.configure(consultations=args.consultations, evenements=args.evenements, engine=engine)
+        start = gen.parse_date(args.start)
+        history = gen.load_history_upto(start)
+        results = []
+        for i in range(args.days):
+            day = start + timedelta(days=i)
+            t0 = time.perf_counter()
+            rows = gen.generate_day(day, *history)
+            t1 = time.perf_counter()
+            gen.write_day(day, *rows)
+            t2 = time.perf_counter()
+            n = sum(len(r) for r in rows)
+            results.append((gen.str_date(day), n, t1 - t0, t2 - t1))
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--consultations', type=int, default=200000)
+    parser.add_argument('--evenements', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--start', type=str, default='2025-01-01')
+    parser.add_argument('--engines', type=str, default='python,numpy')
+    args = parser.parse_args(argv)
+
+    engines = [e for e in args.engines.split(',') if e]
+    if 'numpy' in engines and gen.np is None:
+        print('numpy absent: moteur numpy ignore')
+        engines.remove('numpy')
+
+    print(f'volumes: {args.consultations} consultations + {args.evenements} evenements / jour')
+    print('engine  day          rows      generate_s  write_s  rows/s')
+    totals = {}
+    for engine in engines:
+        results = run_engine(engine, args)
+        for day_str, n, t_gen, t_write in results:
+            print(f'{engine:7s} {day_str}  {n:9d}  {t_gen:10.3f}  {t_write:7.3f}  {n / (t_gen + t_write):8.0f}')
+        totals[engine] = sum(r[2] + r[3] for r in results)
+    if 'python' in totals and 'numpy' in totals:
+        print(f'\nspeedup numpy vs python: x{totals["python"] / totals["numpy"]:.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark des formats du lake (csv, csv.gz, parquet): octets sur disque, temps d'écriture
+et temps de chargement de l'historique.
+
+Les fichiers d'un lake CSV source (--root, sinon une année générée aux volumes par
+défaut) sont réécrits dans chaque format: seul l'appel à lake_io.write_rows est chronométré.
+Le chargement mesure load_history_upto (historique du générateur) et HistoryStore.from_lake
+sur le lake converti.
+
+Usage:
+    python benchmarks/bench_formats.py [--days 365]
+    python benchmarks/bench_formats.py --root /chemin/lake_csv [--formats csv,parquet]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import timedelta
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+import generate_ficp_daily as gen  # noqa: E402
+import lake_io  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+
+AREAS = ('consultation', 'inscription', 'radiation')
+
+
+def build_lake(days, workdir):
+    root = os.path.join(workdir, 'source')
+    subprocess.run([sys.executable, os.path.join(SCRIPTS, 'generate_ficp_daily.py'), '--root', root,
+                    '--no-state', '--start', '2025-01-01', '--days', str(days)], check=True, stdout=subprocess.DEVNULL)
+    return root
+
+
+def convert(src, dst, fmt):
+    """Réécrit chaque fichier de src au format fmt; retourne (secondes d'écriture, octets)."""
+    write_s = 0.0
+    size = 0
+    for area in AREAS:
+        os.makedirs(os.path.join(dst, area), exist_ok=True)
+        for day_str, name in lake_io.list_day_files(os.path.join(src, area)):
+            with lake_io.open_rows(os.path.join(src, area, name)) as (header, rows):
+                rows = [tuple(r) for r in rows]
+            path = lake_io.day_file(os.path.join(dst, area), day_str, fmt)
+            t0 = time.perf_counter()
+            lake_io.write_rows(path, header, rows)
+            write_s += time.perf_counter() - t0
+            size += os.path.getsize(path)
+    return write_s, size
+
+
+def load_times(root):
+    last = lake_io.list_day_files(os.path.join(root, 'inscription'))[-1][0]
+    upto = gen.parse_date(last) + timedelta(days=1)
+    gen.set_data_root(root)
+    t0 = time.perf_counter()
+    gen.load_history_upto(upto)
+    t1 = time.perf_counter()
+    HistoryStore.from_lake(root, upto.toordinal())
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, help='Lake CSV source (defaut: une annee generee)')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--formats', type=str, default=','.join(lake_io.FORMATS))
+    args = parser.parse_args(argv)
+
+    formats = [f for f in args.formats.split(',') if f]
+    if 'parquet' in formats and lake_io.pa is None:
+        print('pyarrow absent: format parquet ignore')
+        formats.remove('parquet')
+
+    workdir = tempfile.mkdtemp(prefix='ficp_bench_formats_')
+    try:
+        src = args.root or build_lake(args.days, workdir)
+        print(f'source: {src}')
+        print('format   MB      write_s  load_history_s  history_store_s')
+        for fmt in formats:
+            dst = os.path.join(workdir, fmt.replace('.', '_'))
+            write_s, size = convert(src, dst, fmt)
+            load_s, store_s = load_times(dst)
+            print(f'{fmt:8s} {size / 1e6:6.1f}  {write_s:7.2f}  {load_s:14.2f}  {store_s:15.2f}')
+            shutil.rmtree(dst, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark mémoire / temps de chargement de l'historique sur un lake d'un an.
+
+Compare:
+- load_history_upto: relecture du générateur (EventStore et registre de cle en mémoire);
+- load_history_snapshot: état sauvegardé (history.bin, history.json.gz, registre de cle),
+  écrit au préalable dans une copie du _state du lake;
+- HistoryStore.from_lake (colonnes compactes seules, ficp_status.py).
+La mémoire résidente et le pic sont mesurés avec tracemalloc.
+
+Usage:
+    python benchmarks/bench_history_store.py [--lake DIR] [--days 317]
+    (sans --lake, un lake temporaire est généré avec le moteur numpy si disponible)
+"""
+import os
+import gc
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+
+
+def measure(label, fn):
+    gc.collect()
+    t0 = time.perf_counter()
+    res = fn()
+    elapsed = time.perf_counter() - t0
+    del res
+    gc.collect()
+    tracemalloc.start()
+    res = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:32s} {elapsed:8.3f}s  {current / 1e6:9.1f} MB  {peak / 1e6:9.1f} MB')
+    return res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lake', type=str, help='Lake existant a mesurer')
+    parser.add_argument('--days', type=int, default=317)
+    parser.add_argument('--start', type=str, default='2025-01-01')
+    args = parser.parse_args(argv)
+
+    tmp = None
+    root = args.lake
+    if not root:
+        tmp = root = tempfile.mkdtemp(prefix='ficp_bench_store_')
+        gen.set_data_root(root)
+        if gen.np is not None:
+            gen.configure(engine='numpy')
+        start = gen.parse_date(args.start)
+        with contextlib.redirect_stdout(None):
+            gen.generate_range(start, start + timedelta(days=args.days - 1), use_state=False)
+    try:
+        gen.set_data_root(root)
+        last = max(src.days[-1] for src in gen.lake_io.list_sources(gen.DIR_INSCR))
+        upto = gen.parse_date(last) + timedelta(days=1)
+        print(f'lake: {root}')
+        print('loader                            load_s   resident      peak')
+        history = measure('load_history_upto (relecture)', lambda: gen.load_history_upto(upto))
+        # état écrit à côté du lake mesuré: son _state n'est pas modifié
+        state = tempfile.mkdtemp(prefix='ficp_bench_state_')
+        gen.DIR_STATE = state
+        gen.STATE_PATH = os.path.join(state, 'history.json.gz')
+        gen.EVENTS_PATH = os.path.join(state, 'history.bin')
+        try:
+            gen.save_history_snapshot(upto, *history)
+            del history
+            measure('load_history_snapshot (etat)', lambda: gen.load_history_snapshot(upto))[1].close()
+        finally:
+            shutil.rmtree(state, ignore_errors=True)
+            gen.set_data_root(root)
+        store = measure('HistoryStore (colonnes)', lambda: HistoryStore.from_lake(root, upto.toordinal()))
+        print(f'\nclients={len(store)} surveillances={len(store.surv_date)} '
+              f'inscriptions={len(store.insc_date)} store_bytes={store.nbytes()}')
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de l'état incrémental: temps par jour sur un lake synthétique.
+
+Génère --days jours consécutifs dans un répertoire temporaire avec l'état sauvegardé,
+mesure le temps de generate_daily pour chaque jour et, tous les --sample jours, compare
+le chargement de l'historique depuis l'état et par relecture complète des CSV.
+
+Usage:
+    python benchmarks/bench_incremental_state.py [--days 320] [--sample 40]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return time.perf_counter() - t0, res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=320)
+    parser.add_argument('--sample', type=int, default=40)
+    parser.add_argument('--start', type=str, default='2025-01-01')
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix='ficp_bench_')
+    try:
+        gen.set_data_root(root)
+        start = gen.parse_date(args.start)
+        per_day = []
+        print('day   generate_s  load_state_s  load_csv_s')
+        for i in range(args.days):
+            day = start + timedelta(days=i)
+            with contextlib.redirect_stdout(None):
+                elapsed, _ = timed(gen.generate_daily, day)
+            per_day.append(elapsed)
+            if (i + 1) % args.sample == 0:
+                nxt = day + timedelta(days=1)
+                t_state, _ = timed(gen.load_history_snapshot, nxt)
+                t_csv, _ = timed(gen.load_history_upto, nxt)
+                print(f'{i + 1:4d}  {elapsed:10.4f}  {t_state:12.4f}  {t_csv:10.4f}')
+
+        head = per_day[:10]
+        tail = per_day[-10:]
+        print(f'\nmean generate first 10 days: {sum(head) / len(head):.4f}s')
+        print(f'mean generate last 10 days:  {sum(tail) / len(tail):.4f}s')
+        print(f'total: {sum(per_day):.2f}s for {args.days} days')
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
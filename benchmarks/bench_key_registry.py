@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark du registre de cle connues: ensemble en mémoire (ancien état, liste 'known' du
+JSON) contre registre persistant (fichier trié projeté + filtre de Bloom, key_registry.py).
+
+--keys cle aléatoires (8 lettres + 5 chiffres) sont écrites dans les deux formats, puis
+chaque variante simule un jour du générateur dans un processus neuf: chargement, tirage de
+--sample clients connus par rang, --new nouvelles cle (test d'appartenance puis ajout) et
+sauvegarde. La préparation tourne elle aussi à part: sous Linux un processus fils hérite
+du pic de mémoire de son parent (ru_maxrss), qui fausserait la mesure.
+
+Usage:
+    python benchmarks/bench_key_registry.py [--keys 10000000] [--sample 600] [--new 1300]
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+import key_registry  # noqa: E402
+
+CHILD = r'''
+import os, sys, gzip, json, time, random, resource
+sys.path.insert(0, sys.argv[1])
+from key_registry import KeyRegistry
+from generate_ficp_daily import draw_key
+workdir, variant, n_sample, n_new = sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5])
+times = {}
+t0 = time.perf_counter()
+if variant == 'set':
+    with gzip.open(os.path.join(workdir, 'known.json.gz'), 'rt', encoding='utf-8') as f:
+        known = set(json.load(f))
+else:
+    known = KeyRegistry.open(os.path.join(workdir, 'registry'))
+t1 = time.perf_counter(); times['load'] = t1 - t0
+rng = random.Random(1)
+added = 0
+while added < n_new:
+    cle = draw_key(rng)
+    if cle not in known:
+        known.add(cle)
+        added += 1
+t2 = time.perf_counter(); times['new_keys'] = t2 - t1
+pool = sorted(known) if variant == 'set' else known
+sample = [rng.choice(pool) for _ in range(n_sample)]
+t3 = time.perf_counter(); times['sample'] = t3 - t2
+if variant == 'set':
+    with gzip.open(os.path.join(workdir, 'known.out.json.gz'), 'wt', encoding='utf-8', compresslevel=1) as f:
+        f.write(json.dumps(sorted(known), separators=(',', ':')))
+else:
+    known.save('2026-01-02')
+t4 = time.perf_counter(); times['save'] = t4 - t3
+times['total'] = t4 - t0
+print(json.dumps({'times': times, 'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  'first': sample[0]}))
+'''
+
+
+def random_keys(n):
+    """n cle distinctes triées (numpy si disponible)."""
+    np = key_registry.np
+    keys = set()
+    if np is not None:
+        rng = np.random.default_rng(0)
+        while len(keys) < n:
+            need = n - len(keys)
+            raw = np.empty((need, 13), dtype=np.uint8)
+            raw[:, :8] = rng.integers(65, 91, size=(need, 8), dtype=np.uint8)
+            raw[:, 8:] = rng.integers(48, 58, size=(need, 5), dtype=np.uint8)
+            keys.update(raw.view('S13').ravel().astype('U13').tolist())
+    else:
+        from generate_ficp_daily import draw_key
+        rng = random.Random(0)
+        while len(keys) < n:
+            keys.add(draw_key(rng))
+    return sorted(keys)
+
+
+def prepare(workdir, n):
+    t0 = time.perf_counter()
+    keys = random_keys(n)
+    with gzip.open(os.path.join(workdir, 'known.json.gz'), 'wt', encoding='utf-8', compresslevel=1) as f:
+        f.write(json.dumps(keys, separators=(',', ':')))
+    t1 = time.perf_counter()
+    key_registry.KeyRegistry.create(os.path.join(workdir, 'registry'), keys, '2026-01-01').close()
+    print(f'{n} cle: JSON {t1 - t0:.1f}s, creation du registre {time.perf_counter() - t1:.1f}s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--keys', type=int, default=10_000_000)
+    parser.add_argument('--sample', type=int, default=600, help='Clients connus tires par jour')
+    parser.add_argument('--new', type=int, default=1300, help='Nouvelles cle par jour')
+    parser.add_argument('--prepare', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.prepare:
+        prepare(args.prepare, args.keys)
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix='ficp_bench_keys_')
+    try:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--keys', str(args.keys), '--prepare', workdir],
+                       check=True)
+        sizes = {name: os.path.getsize(os.path.join(workdir, 'registry', name))
+                 for name in sorted(os.listdir(os.path.join(workdir, 'registry')))}
+        print(f"fichiers: known.json.gz {os.path.getsize(os.path.join(workdir, 'known.json.gz'))} o, registre {sizes}")
+
+        print('variante     load_s  new_keys_s  sample_s  save_s  total_s  pic_memoire_MB')
+        first = set()
+        for variant in ('set', 'registry'):
+            out = subprocess.run([sys.executable, '-c', CHILD, SCRIPTS, workdir, variant, str(args.sample), str(args.new)],
+                                 check=True, capture_output=True, text=True).stdout
+            res = json.loads(out.strip().splitlines()[-1])
+            t = res['times']
+            first.add(res['first'])
+            print(f"{variant:10s} {t['load']:8.2f} {t['new_keys']:11.3f} {t['sample']:9.3f} {t['save']:7.2f} "
+                  f"{t['total']:8.2f} {res['peak_rss_kb'] / 1024:15.0f}")
+        print('meme tirage:', len(first) == 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
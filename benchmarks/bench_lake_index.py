@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de l'index de zones (lake_index.py) contre le parcours complet du lake.
+
+Un lake de --days jours est généré dans un processus à part (mois clos compactés avec
+--compact), puis l'index est construit. Pour chaque requête, index (sans rafraîchissement)
+contre parcours complet: durée, blocs lus, fichiers ouverts, lignes trouvées (identiques
+par construction, vérifiées):
+- cle présente (moyenne sur --samples cle tirées dans le lake), cle absente;
+- une semaine de tous les jours (--from/--to sur le jour du lake);
+- radiations des inscriptions d'un mois (--column date_inscription).
+Sont aussi mesurés: construction complète, taille de l'index, rafraîchissement sans
+changement et mise à jour après un jour écrit.
+
+Usage:
+    python benchmarks/bench_lake_index.py [--days 1095] [--samples 20] [--compact]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime, timedelta
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+import lake_io  # noqa: E402
+import lake_index  # noqa: E402
+import generate_ficp_daily as gen  # noqa: E402
+
+START = datetime(2025, 1, 1)
+
+
+def timed_query(root, use_index, **kwargs):
+    stats = {}
+    t0 = time.perf_counter()
+    rows = list(lake_index.query(root, use_index=use_index, refresh=False, stats=stats, **kwargs))
+    return time.perf_counter() - t0, rows, stats
+
+
+def folder_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=1095)
+    parser.add_argument('--samples', type=int, default=20, help='cle presentes recherchees')
+    parser.add_argument('--compact', action='store_true', help='Compacte les mois clos en partitions')
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix='ficp_bench_index_')
+    try:
+        end = START + timedelta(days=args.days - 1)
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(SCRIPTS, 'generate_ficp_daily.py'), '--root', root,
+                        '--start', gen.str_date(START), '--end', gen.str_date(end)], check=True,
+                       stdout=subprocess.DEVNULL)
+        if args.compact:
+            subprocess.run([sys.executable, os.path.join(SCRIPTS, 'compact_lake.py'), '--root', root], check=True,
+                           stdout=subprocess.DEVNULL)
+        print(f'lake de {args.days} jours{" compacte" if args.compact else ""} genere en '
+              f'{time.perf_counter() - t0:.0f}s')
+
+        t0 = time.perf_counter()
+        built = lake_index.update(root)
+        build_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        lake_index.update(root)
+        refresh_s = time.perf_counter() - t0
+        print(f"index: {built['files']} fichiers en {build_s:.1f}s, "
+              f"{folder_size(os.path.join(root, lake_index.INDEX_DIR)) / 1e6:.1f} Mo "
+              f"(lake {sum(folder_size(os.path.join(root, a)) for a in lake_index.AREAS) / 1e6:.0f} Mo); "
+              f"rafraichissement sans changement {refresh_s * 1000:.0f} ms")
+
+        gen.set_data_root(root)
+        with contextlib.redirect_stdout(None):
+            gen.generate_daily(end + timedelta(days=1))
+        t0 = time.perf_counter()
+        lake_index.update(root, months={gen.str_date(end + timedelta(days=1))[:7]})
+        print(f'mise a jour apres un jour ecrit: {(time.perf_counter() - t0) * 1000:.0f} ms')
+
+        rng = random.Random(3)
+        days = [src for src in lake_io.list_sources(os.path.join(root, 'inscription'))]
+        keys = []
+        while len(keys) < args.samples:
+            src = rng.choice(days)
+            day_str = rng.choice(src.days)
+            keys.append(rng.choice(lake_io.read_day(src.path, day_str)[1])[0])
+        mid = START + timedelta(days=args.days // 2)
+        month = gen.str_date(mid)[:7]
+        cases = [
+            (f'cle presente (x{args.samples})', [dict(cle=k) for k in keys]),
+            ('cle absente', [dict(cle='ZZZZZZZZ00000')]),
+            ('une semaine', [dict(date_from=gen.str_date(mid), date_to=gen.str_date(mid + timedelta(days=6)))]),
+            ('radiations d\'un mois', [dict(date_from=f'{month}-01', date_to=f'{month}-31', column='date_inscription',
+                                            areas=('radiation',))]),
+        ]
+        print('requete                   index_ms  complet_ms  blocs_lus(index/complet)  fichiers  lignes')
+        for label, queries in cases:
+            ti = tf = 0.0
+            bi = bf = fo = n = 0
+            for kwargs in queries:
+                t, rows, st = timed_query(root, True, **kwargs)
+                ti += t
+                bi += st['blocks_read']
+                fo += st['files_opened']
+                t, full_rows, st = timed_query(root, False, **kwargs)
+                tf += t
+                bf += st['blocks_read']
+                assert rows == full_rows
+                n += len(rows)
+            k = len(queries)
+            print(f'{label:24s} {ti / k * 1000:9.1f} {tf / k * 1000:11.1f} {bi / k:12.0f}/{bf / k:<12.0f} '
+                  f'{fo / k:9.0f} {n / k:7.0f}')
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark du rattrapage --start/--end selon le nombre de processus (--workers).
+
+Pour chaque valeur de workers, génère la même plage dans un lake temporaire, affiche le
+temps total et le débit, et vérifie que les fichiers produits sont identiques à ceux
+de workers=1. Le gain dépend du nombre de coeurs disponibles (os.cpu_count()).
+
+Usage:
+    python benchmarks/bench_parallel_backfill.py [--days 60] [--workers 1,2,4]
+    python benchmarks/bench_parallel_backfill.py --consultations 20000 --evenements 3000
+"""
+import os
+import sys
+import time
+import shutil
+import filecmp
+import argparse
+import tempfile
+import contextlib
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+
+AREAS = ('consultation', 'inscription', 'radiation')
+
+
+def run(workers, args):
+    root = tempfile.mkdtemp(prefix=f'ficp_bench_w{workers}_')
+    gen.set_data_root(root)
+    gen.configure(consultations=args.consultations, evenements=args.evenements)
+    start = gen.parse_date(args.start)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(None):
+        gen.generate_range(start, start + timedelta(days=args.days - 1), use_state=False, workers=workers)
+    return root, time.perf_counter() - t0
+
+
+def same_lake(a, b):
+    for area in AREAS:
+        names = sorted(os.listdir(os.path.join(a, area)))
+        if names != sorted(os.listdir(os.path.join(b, area))):
+            return False
+        _, mismatch, errors = filecmp.cmpfiles(os.path.join(a, area), os.path.join(b, area), names, shallow=False)
+        if mismatch or errors:
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--consultations', type=int, default=gen.CONSULTATIONS_PAR_JOUR)
+    parser.add_argument('--evenements', type=int, default=gen.EVENEMENTS_PAR_JOUR)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--start', type=str, default='2025-01-01')
+    parser.add_argument('--workers', type=str, default='1,2,4')
+    args = parser.parse_args(argv)
+
+    counts = [int(w) for w in args.workers.split(',') if w]
+    print(f'cpu: {os.cpu_count()} - {args.days} jours de {args.consultations} consultations '
+          f'+ {args.evenements} evenements')
+    print('workers  total_s  days/s  identical')
+    roots = []
+    try:
+        ref, ref_time = None, None
+        for workers in counts:
+            root, elapsed = run(workers, args)
+            roots.append(root)
+            ref = ref or root
+            ref_time = ref_time or elapsed
+            print(f'{workers:7d}  {elapsed:7.2f}  {args.days / elapsed:6.1f}  {same_lake(ref, root)}'
+                  f'  (x{ref_time / elapsed:.2f})')
+    finally:
+        for root in roots:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la génération partitionnée par cle (--shards, sharding.py).
+
+Pour chaque nombre de shards, un rattrapage de --days jours à gros volumes
+(--consultations, --evenements) est lancé dans un processus neuf sur un lake vide, avec
+--metrics: durée totale et attente des shards par le processus principal (paiement_scan
++ shard_day: calcul dans les shards et échanges). Les fichiers produits sont comparés à ceux
+du premier cas (1 shard: generate_day).
+
+Le gain dépend des cœurs disponibles (os.cpu_count(), affiché): au-delà, les shards se
+partagent les mêmes cœurs et seul le coût des échanges reste.
+
+Usage:
+    python benchmarks/bench_shards.py [--days 30] [--consultations 50000] [--evenements 15000] [--shards 1,2,4]
+"""
+import os
+import sys
+import json
+import shutil
+import filecmp
+import argparse
+import tempfile
+import subprocess
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+
+
+def run(root, days, consultations, evenements, shards):
+    out = subprocess.run([sys.executable, os.path.join(SCRIPTS, 'generate_ficp_daily.py'), '--root', root,
+                          '--start', '2025-01-01', '--days', str(days), '--consultations', str(consultations),
+                          '--evenements', str(evenements), '--shards', str(shards), '--no-state', '--metrics'],
+                         check=True, capture_output=True, text=True).stdout
+    line = next(l for l in out.splitlines() if l.startswith('METRICS '))
+    return json.loads(line[len('METRICS '):])
+
+
+def same_lake(a, b):
+    for area in ('consultation', 'inscription', 'radiation'):
+        names = sorted(os.listdir(os.path.join(a, area)))
+        _, mismatch, errors = filecmp.cmpfiles(os.path.join(a, area), os.path.join(b, area), names, shallow=False)
+        if mismatch or errors:
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--consultations', type=int, default=50000)
+    parser.add_argument('--evenements', type=int, default=15000)
+    parser.add_argument('--shards', type=str, default='1,2,4', help='Nombres de shards, separes par des virgules')
+    args = parser.parse_args(argv)
+
+    counts = [int(n) for n in args.shards.split(',')]
+    workdir = tempfile.mkdtemp(prefix='ficp_bench_shards_')
+    try:
+        print(f'{args.days} jours x ({args.consultations} consultations + {args.evenements} evenements), '
+              f'{os.cpu_count()} coeur(s)')
+        print('shards  total_s  attente_shards_s  identique')
+        ref = None
+        for n in counts:
+            root = os.path.join(workdir, f'shards{n}')
+            res = run(root, args.days, args.consultations, args.evenements, n)
+            phases = {name: p['s'] for name, p in res['phases'].items()}
+            waited = f"{phases['paiement_scan'] + phases['shard_day']:16.2f}" if n > 1 else f"{'-':>16s}"
+            ref = ref or root
+            print(f"{n:6d} {res['wall_s']:8.2f} {waited}  {same_lake(ref, root)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de l'envoi du lake (upload_lake.py) vers le bouchon HTTP local.
+
+Un lake de --days jours est généré, puis envoyé vers un bouchon --serve lancé dans un
+processus à part avec --latency secondes ajoutées à chaque requête (aller-retour vers le
+stockage distant): d'abord fichier par fichier (--workers 1, comme la boucle
+Set-AzStorageBlobContent du runbook), puis avec --workers fichiers en parallèle, enfin une
+relance sur le lake inchangé (tout est sauté par MD5).
+
+Usage:
+    python benchmarks/bench_upload.py [--days 60] [--latency 0.02] [--workers 8]
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+import generate_ficp_daily as gen  # noqa: E402
+import upload_lake  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(folder, latency):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, os.path.join(SCRIPTS, 'upload_lake.py'), '--serve', folder,
+                             '--port', str(port), '--latency', str(latency)], stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'{url}/ping', timeout=1)
+        except urllib.error.HTTPError:
+            return proc, url
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError('bouchon HTTP injoignable')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.02, help='Latence par requete du bouchon (s)')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='ficp_bench_upload_')
+    try:
+        lake = os.path.join(workdir, 'lake')
+        gen.set_data_root(lake)
+        with contextlib.redirect_stdout(None):
+            gen.generate_range(datetime(2025, 1, 1), datetime(2025, 1, 1) + timedelta(days=args.days - 1))
+        size = sum(os.path.getsize(path) for _, path in upload_lake.lake_files(lake))
+        print(f'{len(upload_lake.lake_files(lake))} fichiers, {size / 1e6:.1f} Mo, latence {args.latency * 1000:.0f} ms')
+
+        print('cas                 secondes  envoyes  sautes  Mo/s')
+        for label, workers, remote in (('sequentiel', 1, 'seq'), (f'{args.workers} workers', args.workers, 'par'),
+                                       ('relance', args.workers, 'par')):
+            proc, url = start_server(os.path.join(workdir, remote), args.latency)
+            try:
+                summary = upload_lake.upload(lake, url, workers=workers)
+            finally:
+                proc.terminate()
+                proc.wait()
+            assert not summary['errors'], summary['errors']
+            rate = summary['bytes'] / 1e6 / summary['seconds']
+            print(f"{label:18s} {summary['seconds']:9.2f} {summary['sent']:8d} {summary['skipped']:7d} {rate:5.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks du lake: une commande, des lakes synthétiques de taille paramétrée,
+un fichier de résultats JSON et une comparaison à une référence enregistrée.
+
+Pour chaque lake JOURSxCONSULTATIONS (--lakes 30x1000,180x2000), le vrai générateur
+construit les JOURS - 1 - BACKFILL premiers jours (non mesuré, évènements au prorata des
+volumes par défaut), puis chaque tour mesure sur une copie de ce lake:
+- backfill: rattrapage --start/--days des BACKFILL jours suivants;
+- daily: generate_daily du dernier jour (historique repris de l'état sauvegardé);
+- audit_full: audit_lake.main --full --save-manifest (tous les fichiers relus), puis
+- audit: audit_lake.main avec le manifest du passage précédent;
+- validate: validate_lake.main (règles de cohérence sur tout le lake).
+Chaque cas tourne dans un processus neuf: temps écoulé (imports compris) et pic de
+mémoire résidente (ru_maxrss) sont ceux du cas seul. Le générateur et l'audit ajoutent
+leur détail par phase (--metrics, voir scripts/metrics.py). Sur --repeat tours, on garde
+le temps médian (avec les phases de ce tour), les temps de chaque tour et le plus grand pic
+de mémoire.
+
+Résultats (--out):
+  {"version": 1, "date": "...", "machine": {"python", "platform", "cpus", "numpy", "pyarrow"},
+   "params": {"lakes", "backfill", "repeat", "engine", "format"},
+   "results": {"180x2000/daily": {"wall_s", "runs_s", "peak_rss_kb", "exit_code", "phases"}, ...}}
+
+--compare REF compare les résultats (ceux de la suite qui vient de tourner, ou --results
+FICHIER sans rien relancer) à une référence: un cas dont le temps médian dépasse la
+référence de plus de --threshold (relatif), ou le pic de mémoire de plus de
+--rss-threshold, est une régression, sauf si l'écart de temps reste sous --min-seconds
+(bruit des cas très courts). Les seuils par défaut sont au-dessus du bruit mesuré entre
+suites sur la machine de la référence (1 CPU): médianes de temps jusqu'à x1.52 d'une suite
+à l'autre, pic de mémoire à moins de 1%. Code retour 1 en cas de
+régression. Sans --lakes, la suite reprend les paramètres de la référence. Une référence
+n'a de sens que sur la même machine: un écart de machine est signalé.
+benchmarks/baseline.json est une référence aux paramètres par défaut.
+
+Usage:
+    python benchmarks/run_suite.py [--lakes 30x1000,180x2000] [--backfill 7] [--repeat 5] [--out res.json]
+    python benchmarks/run_suite.py --compare benchmarks/baseline.json [--threshold 0.6] [--rss-threshold 0.1]
+    python benchmarks/run_suite.py --compare benchmarks/baseline.json --results res.json
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), '..', 'scripts')
+sys.path.insert(0, SCRIPTS)
+
+import generate_ficp_daily as gen  # noqa: E402
+
+RESULTS_VERSION = 1
+DEFAULT_LAKES = '30x1000,180x2000'
+DEFAULT_REPEAT = 5
+START = datetime(2025, 1, 1)
+CASES = ('backfill', 'daily', 'audit_full', 'audit', 'validate')
+
+CHILD = r'''
+import os, sys, json, time, importlib, contextlib
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+try:
+    import resource
+except ImportError:
+    resource = None
+module, argv = sys.argv[2], sys.argv[3:]
+with contextlib.redirect_stdout(None):
+    code = importlib.import_module(module).main(argv)
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+if rss and sys.platform == 'darwin':
+    rss //= 1024
+print(json.dumps({'wall_s': time.perf_counter() - t0, 'peak_rss_kb': rss, 'exit_code': code}))
+'''
+
+
+def parse_lakes(spec: str):
+    """'30x1000,180x2000' -> [(30, 1000), (180, 2000)]."""
+    lakes = []
+    for item in spec.split(','):
+        days, _, consultations = item.strip().partition('x')
+        lakes.append((int(days), int(consultations)))
+    return lakes
+
+
+def evenements_for(consultations: int) -> int:
+    return max(1, round(consultations * gen.EVENEMENTS_PAR_JOUR / gen.CONSULTATIONS_PAR_JOUR))
+
+
+def generator_args(root, consultations, engine, fmt):
+    return ['--root', root, '--consultations', str(consultations), '--evenements', str(evenements_for(consultations)),
+            '--engine', engine, '--format', fmt]
+
+
+def run_case(module, argv, metrics_path=None):
+    """Lance module.main(argv) dans un processus neuf; ajoute les phases si metrics_path."""
+    if metrics_path:
+        argv = argv + ['--metrics', metrics_path]
+    out = subprocess.run([sys.executable, '-c', CHILD, SCRIPTS, module, *argv],
+                         check=True, capture_output=True, text=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    if metrics_path:
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            result['phases'] = {name: p['s'] for name, p in json.load(f)['phases'].items()}
+    return result
+
+
+def build_base(root, days, consultations, backfill, engine, fmt):
+    base_days = days - 1 - backfill
+    if base_days < 1:
+        raise ValueError(f'{days} jours: trop peu pour --backfill {backfill} + le dernier jour')
+    run_case('generate_ficp_daily', generator_args(root, consultations, engine, fmt) +
+             ['--start', gen.str_date(START), '--days', str(base_days)])
+
+
+def run_round(base, workdir, days, consultations, backfill, engine, fmt):
+    lake = os.path.join(workdir, 'lake')
+    shutil.rmtree(lake, ignore_errors=True)
+    shutil.copytree(base, lake)
+    metrics_path = os.path.join(workdir, 'metrics.json')
+    gen_args = generator_args(lake, consultations, engine, fmt)
+    first = START + timedelta(days=days - 1 - backfill)
+    results = {}
+    if backfill:
+        results['backfill'] = run_case('generate_ficp_daily', gen_args + ['--start', gen.str_date(first),
+                                                                           '--days', str(backfill)], metrics_path)
+    results['daily'] = run_case('generate_ficp_daily', gen_args + ['--date', gen.str_date(START + timedelta(days=days - 1))],
+                                metrics_path)
+    results['audit_full'] = run_case('audit_lake', [lake, '--full', '--save-manifest'], metrics_path)
+    results['audit'] = run_case('audit_lake', [lake], metrics_path)
+    results['validate'] = run_case('validate_lake', [lake])
+    return results
+
+
+def summarize(rounds):
+    """Tour médian en temps (avec ses phases; inférieur des deux médians pour un nombre pair
+    de tours), temps de chaque tour et plus grand pic de mémoire."""
+    ordered = sorted(rounds, key=lambda r: r['wall_s'])
+    summary = dict(ordered[(len(ordered) - 1) // 2])
+    summary['runs_s'] = [r['wall_s'] for r in rounds]
+    summary['peak_rss_kb'] = max(r['peak_rss_kb'] or 0 for r in rounds) or None
+    return summary
+
+
+def machine():
+    info = {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+    for name in ('numpy', 'pyarrow'):
+        try:
+            info[name] = __import__(name).__version__
+        except ImportError:
+            info[name] = None
+    return info
+
+
+def run_suite(lakes, backfill, repeat, engine, fmt):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='ficp_bench_suite_')
+    try:
+        for days, consultations in lakes:
+            label = f'{days}x{consultations}'
+            base = os.path.join(workdir, 'base_' + label)
+            print(f'{label}: construction de {days - 1 - backfill} jours...', flush=True)
+            build_base(base, days, consultations, backfill, engine, fmt)
+            rounds = {}
+            for _ in range(repeat):
+                for case, result in run_round(base, workdir, days, consultations, backfill, engine, fmt).items():
+                    rounds.setdefault(case, []).append(result)
+            for case in CASES:
+                if case in rounds:
+                    summary = results[f'{label}/{case}'] = summarize(rounds[case])
+                    print(f"  {case:11s} {summary['wall_s']:8.3f}s  {summary['peak_rss_kb'] or 0:8d} KB", flush=True)
+            shutil.rmtree(base, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'version': RESULTS_VERSION, 'date': datetime.now().isoformat(timespec='seconds'), 'machine': machine(),
+            'params': {'lakes': [f'{d}x{c}' for d, c in lakes], 'backfill': backfill, 'repeat': repeat,
+                       'engine': engine, 'format': fmt},
+            'results': results}
+
+
+def compare(current, reference, threshold, min_seconds, rss_threshold=None):
+    """[(cas, mesure, référence, actuel, ratio, verdict)] et nombre de régressions.
+    verdict: REGRESSION, mieux, = ou absent (cas de la référence non mesuré).
+    rss_threshold: seuil du pic de mémoire (défaut: threshold)."""
+    rows = []
+    regressions = 0
+    for key, ref in sorted(reference['results'].items()):
+        cur = current['results'].get(key)
+        if cur is None:
+            rows.append((key, '-', None, None, None, 'absent'))
+            continue
+        rss_limit = threshold if rss_threshold is None else rss_threshold
+        for measure, limit in (('wall_s', threshold), ('peak_rss_kb', rss_limit)):
+            old, new = ref.get(measure), cur.get(measure)
+            if not old or new is None:
+                continue
+            ratio = new / old
+            noise = measure == 'wall_s' and abs(new - old) < min_seconds
+            if ratio > 1 + limit and not noise:
+                verdict = 'REGRESSION'
+                regressions += 1
+            elif ratio < 1 - limit and not noise:
+                verdict = 'mieux'
+            else:
+                verdict = '='
+            rows.append((key, measure, old, new, ratio, verdict))
+    return rows, regressions
+
+
+def print_comparison(rows, current, reference):
+    if current['machine'] != reference['machine']:
+        print(f"ATTENTION: machine differente de la reference ({reference['machine']} / {current['machine']})")
+    print(f"{'cas':24s} {'mesure':11s} {'reference':>11s} {'actuel':>11s} {'ratio':>7s}")
+    for key, measure, old, new, ratio, verdict in rows:
+        if ratio is None:
+            print(f'{key:24s} {measure:11s} {"":>11s} {"":>11s} {"":>7s}  {verdict}')
+            continue
+        fmt = '{:11.3f}' if measure == 'wall_s' else '{:11d}'
+        print(f'{key:24s} {measure:11s} {fmt.format(old)} {fmt.format(new)} {ratio:7.2f}  {verdict}')
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != RESULTS_VERSION:
+        raise ValueError(f'{path}: version de resultats inconnue')
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lakes', type=str, help=f'Lakes JOURSxCONSULTATIONS separes par des virgules '
+                                                  f'(defaut: {DEFAULT_LAKES}, ou ceux de --compare)')
+    parser.add_argument('--backfill', type=int, help='Jours generes par le cas backfill (defaut: 7)')
+    parser.add_argument('--repeat', type=int, help=f'Tours par lake: temps median, pic de memoire max '
+                                                   f'(defaut: {DEFAULT_REPEAT})')
+    parser.add_argument('--engine', choices=gen.ENGINES, help='Moteur du generateur (defaut: python)')
+    parser.add_argument('--format', choices=gen.FORMATS, help='Format des fichiers (defaut: csv)')
+    parser.add_argument('--out', type=str, default='bench_results.json', help='Fichier de resultats JSON')
+    parser.add_argument('--compare', type=str, metavar='REF', help='Compare a une reference (resultats enregistres)')
+    parser.add_argument('--results', type=str, help='Avec --compare: resultats deja mesures (pas de nouvelle execution)')
+    parser.add_argument('--threshold', type=float, default=0.6, help='Ecart relatif de temps tolere (defaut: 0.6)')
+    parser.add_argument('--rss-threshold', type=float, default=0.1,
+                        help='Ecart relatif de pic de memoire tolere (defaut: 0.1)')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='Ecart de temps absolu sous lequel il n\'y a pas de regression (defaut: 0.05)')
+    args = parser.parse_args(argv)
+
+    try:
+        reference = load(args.compare) if args.compare else None
+        if args.results:
+            if reference is None:
+                parser.error('--results demande --compare')
+            current = load(args.results)
+        else:
+            params = dict(reference['params']) if reference and not args.lakes else {}
+            lakes = parse_lakes(args.lakes or ','.join(params.get('lakes', [])) or DEFAULT_LAKES)
+            backfill = args.backfill if args.backfill is not None else params.get('backfill', 7)
+            repeat = args.repeat or params.get('repeat', DEFAULT_REPEAT)
+            engine = args.engine or params.get('engine', 'python')
+            fmt = args.format or params.get('format', 'csv')
+            current = run_suite(lakes, backfill, repeat, engine, fmt)
+            with open(args.out, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2)
+            print(f'resultats: {args.out}')
+    except (OSError, ValueError) as ex:
+        print(ex)
+        return 2
+
+    if reference is None:
+        return 0
+    rows, regressions = compare(current, reference, args.threshold, args.min_seconds, args.rss_threshold)
+    print_comparison(rows, current, reference)
+    print(f'{regressions} regression(s) au-dela de {args.threshold:.0%} (temps) / {args.rss_threshold:.0%} (memoire)')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -7,21 +7,66 @@ Audit the local FICP lake folders for completeness and duplicates.
 - Detects duplicate dates (multiple files with same yyyy-mm-dd name)
 - Detects missing days in the continuous range for each area
 
+Each file is streamed once as raw bytes: the MD5 is updated and the rows are parsed
+and checked line by line in the same pass, so memory stays constant per file.
+Files may be .csv, .csv.gz or .parquet (format from the extension, see lake_io).
+
+Monthly partitions (<YYYY-MM>.<format>, written by compact_lake.py) are scanned as one
+file and checked against their day index (<YYYY-MM>.index.json): the row count must
+match the index and every indexed day must belong to the month. Each indexed day is then
+reported like a daily file, with the row count and MD5 of the original daily file kept
+in the index, so the continuity, duplicate-date and duplicate-content checks see the
+same days before and after compaction.
+
+Results are cached in a manifest at the lake root (_manifest.json). A file whose size
+and mtime match its manifest entry is not read again; the duplicate-content and
+missing-day reports are rebuilt from the entries. --full re-scans every file.
+--workers N spreads the files to scan over N processes; the report order is the same.
+The report ends with the lake KPIs, taken from the incremental aggregates of kpi_lake.py
+(only the files not folded in yet are read; --full recomputes them too).
+The audit does not write to the lake unless asked: --save-manifest writes the updated
+manifest, --save-kpi the updated KPI aggregates (_state/kpi.json). Without them, an
+existing manifest and aggregates are only read, and the new files are scanned and folded
+in memory.
+The manifest doubles as a lake catalog for other tools (see load_manifest):
+  {"version": 1, "files": {"<area>/<YYYY-MM-DD>.csv": {"area", "date", "size",
+   "mtime_ns", "md5", "rows", "bad_rows", "header", "header_ok"}}}
+Partition entries ("<area>/<YYYY-MM>.csv", "date" = YYYY-MM) add "index_mtime_ns" and
+"days": {"<YYYY-MM-DD>": [rows, md5 of the daily file]}.
+
+--metrics prints one "METRICS {json}" line at the end (or writes it to a file): wall time
+per phase (scan_<area>, manifest, report, kpi), files scanned / taken from the manifest,
+bytes and rows scanned, peak RSS (see metrics.py). --profile out.prof adds a cProfile dump.
+
 Usage (from repo root):
-  python scripts/audit_lake.py
+  python scripts/audit_lake.py [--full] [--workers N] [--save-manifest] [--save-kpi]
+                               [--metrics [FILE]] [--profile out.prof]
 Optionally pass a specific root:
   python scripts/audit_lake.py ficp_data_lake
 """
 import sys
 import os
+import io
 import csv
+import gzip
+import json
 import hashlib
+import argparse
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import lake_io
+import kpi_lake
+import metrics
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 DEFAULT_LAKE = os.path.join(ROOT, 'ficp_data_lake')
 DATE_FMT = '%Y-%m-%d'
+AREAS = ('consultation', 'inscription', 'radiation')
+MANIFEST_NAME = '_manifest.json'
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1 << 16
 
 EXPECTED = {
     'consultation': ['cle_bdf','date_consultation','statut_ficp','date_surveillance','date_inscription'],
@@ -30,29 +75,82 @@ EXPECTED = {
 }
 
 class FileInfo:
-    def __init__(self, path, area, date_str, rows, md5, empty):
+    def __init__(self, path, area, date_str, rows, md5, empty, entry=None, cached=False):
         self.path = path
         self.area = area
         self.date_str = date_str
         self.rows = rows
         self.md5 = md5
         self.empty = empty  # True if file has header only (no data rows)
+        self.entry = entry  # manifest entry for this file
+        self.cached = cached  # True if taken from the manifest without reading the file
 
 
-def md5_file(path: str) -> str:
-    h = hashlib.md5()
-    with open(path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            h.update(chunk)
-    return h.hexdigest()
+def manifest_path(root: str) -> str:
+    return os.path.join(root, MANIFEST_NAME)
+
+
+def load_manifest(root: str) -> dict:
+    """Manifest entries keyed by "<area>/<file name>"; {} if missing, unreadable or outdated."""
+    try:
+        with open(manifest_path(root), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(root: str, files: dict):
+    path = manifest_path(root)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f, sort_keys=True, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class HashingReader(io.RawIOBase):
+    """Raw reader that feeds every byte it returns to a hash object."""
 
+    def __init__(self, f, h):
+        self.f = f
+        self.h = h
 
-def read_csv(path: str):
-    with open(path, 'r', encoding='utf-8') as f:
-        r = csv.reader(f)
-        header = next(r)
-        rows = list(r)
-    return header, rows
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.f.readinto(b)
+        if n:
+            self.h.update(memoryview(b)[:n])
+        return n
+
+
+def scan_file(path: str, width: int):
+    """Read the file once and return (header, data rows, rows with a column count
+    other than width, md5 hex digest of the file bytes). Header is None for a zero-byte
+    file. csv.gz is decompressed on the fly from the same bytes; for parquet the shape
+    comes from the footer (the schema fixes the column count)."""
+    h = hashlib.md5()
+    with open(path, 'rb') as f:
+        raw = io.BufferedReader(HashingReader(f, h), CHUNK_SIZE)
+        if lake_io.format_of(path) == 'parquet':
+            while raw.read(CHUNK_SIZE):
+                pass
+            header, rows = lake_io.parquet_shape(path)
+            return header, rows, (rows if len(header) != width else 0), h.hexdigest()
+        stream = gzip.GzipFile(fileobj=raw, mode='rb') if lake_io.format_of(path) == 'csv.gz' else raw
+        r = csv.reader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+        header = next(r, None)
+        rows = bad_rows = 0
+        for row in r:
+            rows += 1
+            if len(row) != width:
+                bad_rows += 1
+        while raw.read(CHUNK_SIZE):  # trailing bytes not consumed by the decoder
+            pass
+    return header, rows, bad_rows, h.hexdigest()
 
 
 def parse_date_from_filename(name: str):
@@ -65,7 +163,30 @@ def parse_date_from_filename(name: str):
         return None, None
 
 
-def audit_area(root: str, area: str):
+def parse_partition_from_filename(name: str):
+    """(YYYY-MM, first day of the month) for a monthly partition name, else (None, None)."""
+    month = lake_io.partition_month(os.path.basename(name))
+    if not month:
+        return None, None
+    try:
+        return month, datetime.strptime(month, '%Y-%m')
+    except ValueError:
+        return None, None
+
+
+def index_days(folder: str, month: str):
+    """{day: [rows, md5]} from the index of a partition, and the index mtime."""
+    index = lake_io.read_index(folder, month)
+    st = os.stat(lake_io.index_path(folder, month))
+    return {d: [e['rows'], e['md5']] for d, e in index['days'].items()}, st.st_mtime_ns
+
+
+def audit_area(root: str, area: str, cache=None, pool=None):
+    """Audit one area. cache maps "<area>/<file name>" to manifest entries; an entry whose
+    size and mtime still match the file is reused instead of reading the file.
+    With a pool (concurrent.futures executor) the files to read are scanned in parallel;
+    results are still merged in file name order."""
+    cache = cache or {}
     folder = os.path.join(root, area)
     problems = []
     infos = []
@@ -74,35 +195,80 @@ def audit_area(root: str, area: str):
         problems.append(f"Missing folder: {folder}")
         return infos, problems
 
-    by_date = defaultdict(list)
-    for name in os.listdir(folder):
-        if not name.endswith('.csv'):
+    expected = EXPECTED[area]
+    width = len(expected)
+    jobs = []  # (full, date_str, stat, (days, index mtime) or None, manifest entry or None, future or None)
+    for name in sorted(os.listdir(folder)):
+        if not lake_io.format_of(name):
             continue
+        full = os.path.join(folder, name)
         date_str, dt = parse_date_from_filename(name)
+        index = index_mtime = None
         if not date_str:
-            problems.append(f"Bad filename (date missing): {os.path.join(folder, name)}")
-            continue
-        full = os.path.join(folder, name)
+            date_str, dt = parse_partition_from_filename(name)
+            if not date_str:
+                problems.append(f"Bad filename (date missing): {full}")
+                continue
+            try:
+                index = index_days(folder, date_str)
+                index_mtime = index[1]
+            except (OSError, ValueError) as ex:
+                problems.append(f"Read error: {full} ({ex})")
+                continue
         try:
-            header, rows = read_csv(full)
-        except Exception as ex:
+            st = os.stat(full)
+        except OSError as ex:
             problems.append(f"Read error: {full} ({ex})")
             continue
-        expected = EXPECTED[area]
-        if header != expected:
-            problems.append(f"Header mismatch in {full}: {header} != {expected}")
+        entry = cache.get(f'{area}/{name}')
+        if (entry is not None and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns
+                and entry.get('index_mtime_ns') == index_mtime):
+            jobs.append((full, date_str, st, index, entry, None))
+        else:
+            jobs.append((full, date_str, st, index, None, pool.submit(scan_file, full, width) if pool else None))
+
+    by_date = defaultdict(list)
+    for full, date_str, st, index, entry, future in jobs:
+        cached = entry is not None
+        if not cached:
+            try:
+                header, rows, bad_rows, digest = future.result() if future else scan_file(full, width)
+            except Exception as ex:
+                problems.append(f"Read error: {full} ({ex})")
+                continue
+            if header is None:
+                problems.append(f"Read error: {full} (empty file)")
+                continue
+            entry = {'area': area, 'date': date_str, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                     'md5': digest, 'rows': rows, 'bad_rows': bad_rows,
+                     'header': header, 'header_ok': header == expected}
+            if index is not None:
+                entry['days'], entry['index_mtime_ns'] = index
+            metrics.count('files_scanned')
+            metrics.count('bytes_scanned', st.st_size)
+            metrics.count('rows_scanned', rows)
+        else:
+            metrics.count('files_cached')
+        if not entry['header_ok']:
+            problems.append(f"Header mismatch in {full}: {entry['header']} != {expected}")
         # shape checks
-        width = len(expected)
-        bad_rows = 0
-        for i, row in enumerate(rows, 2):
-            if len(row) != width:
-                bad_rows += 1
-        if bad_rows:
-            problems.append(f"{full}: {bad_rows} row(s) with wrong column count (expected {width})")
-        # md5 & info
-        digest = md5_file(full)
-        infos.append(FileInfo(full, area, date_str, len(rows), digest, empty=(len(rows) == 0)))
-        by_date[date_str].append(full)
+        if entry['bad_rows']:
+            problems.append(f"{full}: {entry['bad_rows']} row(s) with wrong column count (expected {width})")
+        if index is None:
+            infos.append(FileInfo(full, area, date_str, entry['rows'], entry['md5'], empty=(entry['rows'] == 0),
+                                  entry=entry, cached=cached))
+            by_date[date_str].append(full)
+            continue
+        # partition: one info per indexed day
+        indexed_rows = sum(n for n, _ in entry['days'].values())
+        if indexed_rows != entry['rows']:
+            problems.append(f"Index mismatch in {full}: {indexed_rows} rows indexed, {entry['rows']} in file")
+        for day_str, (rows, digest) in sorted(entry['days'].items()):
+            if day_str[:7] != date_str:
+                problems.append(f"Index mismatch in {full}: day {day_str} outside {date_str}")
+                continue
+            infos.append(FileInfo(full, area, day_str, rows, digest, empty=(rows == 0), entry=entry, cached=cached))
+            by_date[day_str].append(full)
 
     # duplicate dates
     for d, files in by_date.items():
@@ -111,13 +277,14 @@ def audit_area(root: str, area: str):
 
     # continuity check
     if infos:
-        dates = sorted({datetime.strptime(fi.date_str, DATE_FMT) for fi in infos})
+        present = {fi.date_str for fi in infos}
+        dates = sorted(datetime.strptime(ds, DATE_FMT) for ds in present)
         missing = []
         cur = dates[0]
         end = dates[-1]
         while cur <= end:
             ds = cur.strftime(DATE_FMT)
-            if all(fi.date_str != ds for fi in infos):
+            if ds not in present:
                 missing.append(ds)
             cur += timedelta(days=1)
         if missing:
@@ -128,17 +295,69 @@ def audit_area(root: str, area: str):
 
 
 def main(argv=None):
-    argv = argv or sys.argv[1:]
-    root = argv[0] if argv else DEFAULT_LAKE
+    parser = argparse.ArgumentParser(description='Audit the local FICP lake folders.')
+    parser.add_argument('root', nargs='?', default=DEFAULT_LAKE, help='lake root (default: ficp_data_lake)')
+    parser.add_argument('--full', action='store_true', help='ignore the manifest and KPI aggregates, re-scan every file')
+    parser.add_argument('--workers', type=int, default=1, help='processes used to scan files (default: 1)')
+    parser.add_argument('--save-manifest', action='store_true',
+                        help='write the updated manifest (_manifest.json) for the next audits and other tools')
+    parser.add_argument('--save-kpi', action='store_true',
+                        help='write the updated KPI aggregates (_state/kpi.json)')
+    parser.add_argument('--metrics', nargs='?', const='-', metavar='FILE',
+                        help='emit per-phase metrics as JSON (METRICS line on stdout, or FILE)')
+    parser.add_argument('--profile', type=str, metavar='FILE', help='write a cProfile dump of the run (.prof)')
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('--workers must be >= 1')
 
+    with metrics.session('audit_lake', args.metrics, args.profile) as m:
+        m.exit_code = run(args)
+    return m.exit_code
+
+
+def run(args) -> int:
+    root = args.root
+    cache = {} if args.full else load_manifest(root)
     all_infos = []
     all_problems = []
 
-    for area in ('consultation','inscription','radiation'):
-        infos, problems = audit_area(root, area)
-        all_infos.extend(infos)
-        all_problems.extend(problems)
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        for area in AREAS:
+            with metrics.phase(f'scan_{area}'):
+                infos, problems = audit_area(root, area, cache, pool)
+            all_infos.extend(infos)
+            all_problems.extend(problems)
+    finally:
+        if pool:
+            pool.shutdown()
 
+    if args.save_manifest and os.path.isdir(root):
+        try:
+            with metrics.phase('manifest'):
+                save_manifest(root, {f'{fi.area}/{os.path.basename(fi.path)}': fi.entry for fi in all_infos})
+        except OSError as ex:
+            print(f"Warning: manifest not saved ({ex})", file=sys.stderr)
+
+    with metrics.phase('report'):
+        report(all_infos, all_problems)
+
+    # KPIs from the incremental aggregates (new files only)
+    if os.path.isdir(root):
+        try:
+            with metrics.phase('kpi'):
+                state, folded, rebuilt = kpi_lake.update(root, full=args.full, save=args.save_kpi)
+        except (OSError, ValueError) as ex:
+            print(f"\nKPI: not available ({ex})")
+        else:
+            print()
+            kpi_lake.print_summary(kpi_lake.summary(state), folded, rebuilt)
+
+    # return non-zero if problems found
+    return 1 if all_problems else 0
+
+
+def report(all_infos, all_problems):
     # duplicates across dates by md5 (same content reused)
     by_md5 = defaultdict(list)
     for fi in all_infos:
@@ -154,17 +373,23 @@ def main(argv=None):
             dup_mixed.append(group)
 
     # report
+    # a partition yields one info per day: files are counted once
+    files = {fi.path: fi.cached for fi in all_infos}
     print("AUDIT SUMMARY")
-    print("- files:", len(all_infos))
+    print("- files:", len(files))
     total_rows = sum(fi.rows for fi in all_infos)
     print("- total rows:", total_rows)
+    scanned = sum(1 for cached in files.values() if not cached)
+    print(f"- scanned: {scanned} (from manifest: {len(files) - scanned})")
 
     # per area stats
-    for area in ('consultation','inscription','radiation'):
+    for area in AREAS:
         subset = [fi for fi in all_infos if fi.area == area]
         if subset:
             dates = sorted({fi.date_str for fi in subset})
-            print(f"- {area}: {len(subset)} files, range {dates[0]}..{dates[-1]}")
+            nb_files = len({fi.path for fi in subset})
+            days = f" ({len(dates)} days)" if nb_files != len(dates) else ""
+            print(f"- {area}: {nb_files} files{days}, range {dates[0]}..{dates[-1]}")
 
     # problems
     if all_problems:
@@ -190,8 +415,5 @@ def main(argv=None):
     else:
         print("\nNo identical-content duplicates detected.")
 
-    # return non-zero if problems found
-    return 1 if all_problems else 0
-
 if __name__ == '__main__':
     raise SystemExit(main())
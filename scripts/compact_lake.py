@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Compaction des fichiers quotidiens du lake en partitions mensuelles.
+
+Chaque zone reçoit un petit fichier par jour (3 x 365 fichiers par an): chaque chargement
+d'historique ou audit paie l'ouverture et l'analyse de centaines de petits fichiers.
+La compaction regroupe les jours d'un mois clos dans <zone>/YYYY-MM.<format>, avec un
+index YYYY-MM.index.json (première ligne, nombre de lignes et MD5 du fichier d'origine
+de chaque jour, position en octets en csv; voir lake_io). Les lecteurs du lake
+(générateur, history_store, validate_lake, audit_lake, ficp_status) lisent indifféremment
+fichiers quotidiens et partitions.
+
+Un mois est clos s'il précède le mois du dernier jour présent dans le lake; --month
+force la compaction d'un mois précis. Ordre d'écriture: index, puis partition (fichier
+temporaire renommé), puis suppression des fichiers quotidiens. Une compaction
+interrompue se reprend en relançant la commande: les fichiers quotidiens déjà présents
+dans la partition (même MD5) sont alors simplement supprimés.
+
+Un jour compacté n'est plus regénéré par le générateur; --expand YYYY-MM restaure les
+fichiers quotidiens du mois (même contenu) et retire la partition. L'index de zones
+(_zonemap/, lake_index.py), s'il existe, est mis à jour pour les mois traités.
+
+Usage:
+    python scripts/compact_lake.py [--root DIR] [--format csv|csv.gz|parquet]
+    python scripts/compact_lake.py --month 2025-01 [--month 2025-02]
+    python scripts/compact_lake.py --expand 2025-01
+"""
+
+import io
+import os
+import csv
+import json
+import hashlib
+import argparse
+from collections import defaultdict
+
+import lake_io
+import lake_index
+
+AREAS = ('consultation', 'inscription', 'radiation')
+
+
+def file_md5(path: str) -> str:
+    h = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def latest_day(root: str):
+    """Dernier jour présent dans le lake, toutes zones confondues (None si vide)."""
+    last = [src.days[-1] for area in AREAS for src in lake_io.list_sources(os.path.join(root, area))]
+    return max(last) if last else None
+
+
+def closed_months(root: str):
+    """Mois ayant des fichiers quotidiens et antérieurs au mois du dernier jour du lake."""
+    last = latest_day(root)
+    if last is None:
+        return []
+    months = {day_str[:7] for area in AREAS
+              for day_str, _ in lake_io.list_day_files(os.path.join(root, area))}
+    return sorted(m for m in months if m < last[:7])
+
+
+def write_index(folder: str, month: str, fmt: str, days):
+    path = lake_io.index_path(folder, month)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': lake_io.INDEX_VERSION, 'month': month, 'format': fmt,
+                   'rows': sum(e['rows'] for e in days.values()), 'days': days},
+                  f, sort_keys=True, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def write_csv_partition(path: str, header, day_rows):
+    """Partition csv écrite jour par jour en relevant la position de chaque jour;
+    retourne {jour: (offset, longueur)}."""
+    positions = {}
+    with open(path, 'wb') as f:
+        f.write(csv_bytes([header]))
+        for day_str, rows in day_rows:
+            data = csv_bytes(rows)
+            positions[day_str] = (f.tell(), len(data))
+            f.write(data)
+    return positions
+
+
+def csv_bytes(rows) -> bytes:
+    buf = io.StringIO(newline='')
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode('utf-8')
+
+
+def compact_month(folder: str, month: str, fmt: str = None):
+    """Compacte les fichiers quotidiens de month dans folder.
+    Retourne (jours compactés, messages d'anomalie)."""
+    files = [(day_str, os.path.join(folder, name)) for day_str, name in lake_io.list_day_files(folder)
+             if day_str[:7] == month]
+    if not files:
+        return 0, []
+    for existing in lake_io.FORMATS:
+        if os.path.exists(os.path.join(folder, f'{month}.{existing}')):
+            return 0, resume(folder, month, files)
+
+    days = {}
+    day_rows = []
+    header = None
+    nb_rows = 0
+    for day_str, path in files:
+        if day_str in days:
+            return 0, [f'{folder}/{day_str}: plusieurs fichiers pour le jour, mois {month} non compacté']
+        with lake_io.open_rows(path) as (h, rows):
+            rows = [tuple(r) for r in rows]
+        if h is None or (header is not None and h != header):
+            return 0, [f'{path}: en-tête absent ou différent, mois {month} non compacté']
+        header = h
+        days[day_str] = {'row': nb_rows, 'rows': len(rows), 'md5': file_md5(path)}
+        day_rows.append((day_str, rows))
+        nb_rows += len(rows)
+
+    if fmt is None:
+        formats = {lake_io.format_of(path) for _, path in files}
+        fmt = formats.pop() if len(formats) == 1 else 'csv'
+    path = os.path.join(folder, f'{month}.{fmt}')
+    tmp = path + '.tmp'
+    if fmt == 'csv':
+        for day_str, (offset, length) in write_csv_partition(tmp, header, day_rows).items():
+            days[day_str].update(offset=offset, length=length)
+    else:
+        lake_io.write_rows(tmp, header, [r for _, rows in day_rows for r in rows], fmt)
+    write_index(folder, month, fmt, days)
+    os.replace(tmp, path)
+    for _, daily in files:
+        os.remove(daily)
+    return len(days), []
+
+
+def resume(folder: str, month: str, files):
+    """Partition déjà écrite: retire les fichiers quotidiens qu'elle contient (même MD5)."""
+    index = lake_io.read_index(folder, month)['days']
+    problems = []
+    for day_str, path in files:
+        if day_str in index and index[day_str]['md5'] == file_md5(path):
+            os.remove(path)
+        else:
+            problems.append(f'{path}: absent de la partition {month} ou différent, conservé')
+    return problems
+
+
+def expand_month(folder: str, month: str):
+    """Restaure les fichiers quotidiens d'une partition puis la retire. Retourne le nombre de jours."""
+    for fmt in lake_io.FORMATS:
+        path = os.path.join(folder, f'{month}.{fmt}')
+        if os.path.exists(path):
+            break
+    else:
+        return 0
+    days = lake_io.read_index(folder, month)['days']
+    for day_str in sorted(days):
+        header, rows = lake_io.read_day(path, day_str)
+        lake_io.write_rows(lake_io.day_file(folder, day_str, fmt), header, rows)
+    os.remove(path)
+    os.remove(lake_io.index_path(folder, month))
+    return len(days)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, default=os.path.join(os.path.dirname(__file__), '..', 'ficp_data_lake'))
+    parser.add_argument('--month', type=str, action='append', help='Mois YYYY-MM à compacter (defaut: mois clos)')
+    parser.add_argument('--format', type=str, choices=lake_io.FORMATS,
+                        help='Format des partitions (defaut: celui des fichiers du mois)')
+    parser.add_argument('--expand', type=str, metavar='YYYY-MM', help='Restaure les fichiers quotidiens du mois')
+    args = parser.parse_args(argv)
+    if args.format:
+        try:
+            lake_io.check_format(args.format)
+        except ValueError as ex:
+            print(ex)
+            return 2
+
+    if args.expand:
+        for area in AREAS:
+            n = expand_month(os.path.join(args.root, area), args.expand)
+            print(f'{area}/{args.expand}: {n} jours restaurés')
+        lake_index.maintain(args.root, {args.expand})
+        return 0
+
+    problems = []
+    months = args.month or closed_months(args.root)
+    counts = defaultdict(int)
+    for month in months:
+        for area in AREAS:
+            n, issues = compact_month(os.path.join(args.root, area), month, args.format)
+            counts[month] += n
+            problems.extend(issues)
+        print(f'{month}: {counts[month]} fichiers quotidiens compactés')
+    if not months:
+        print('Aucun mois clos à compacter')
+    lake_index.maintain(args.root, months)
+    for p in problems:
+        print('-', p)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Générateur FICP en service: l'historique reste chargé entre deux jours.
+
+Chaque exécution planifiée de generate_ficp_daily.py repart de zéro: interpréteur,
+imports, rechargement de l'historique (état _state/ ou relecture du lake) avant la
+première ligne. Ici le processus reste actif: l'historique (événements par client,
+échéancier, clients connus) est chargé une fois, puis chaque déclenchement génère les
+jours manquants et avance l'historique en mémoire avec les seules lignes de ces jours,
+exactement comme generate_range: les fichiers sont identiques à ceux des exécutions
+isolées.
+
+Déclenchements (combinables):
+- --interval N: toutes les N secondes, génère les jours manquants jusqu'à aujourd'hui;
+- --trigger-file F: dès que F apparaît, exécute la commande qu'il contient (défaut: run),
+  supprime F et écrit la réponse JSON dans F.out;
+- --port P: commandes sur une socket TCP locale (127.0.0.1), une ligne par connexion,
+  réponse JSON sur une ligne (client: --send "commande").
+Commandes: next (le jour suivant de l'historique), run [YYYY-MM-DD] (jusqu'à la date,
+défaut aujourd'hui), status, resync, stop.
+
+Resynchronisation: avant chaque déclenchement, l'empreinte des fichiers couverts par
+l'historique (lake_fingerprint), l'état sauvegardé et le dernier jour du lake sont
+comparés à ceux du déclenchement précédent; si le lake a changé sous le service (jour
+regénéré, compaction, exécution isolée), l'historique est rechargé (load_history).
+Une commande en échec (disque plein, fichier retiré, état corrompu, erreur d'un shard)
+répond {"ok": false} sans arrêter le service (trace sur stderr); l'historique, peut-être avancé à moitié, est rechargé au
+déclenchement suivant et n'est pas sauvegardé d'ici là.
+
+Mesures: chaque déclenchement renvoie sa latence, les jours et lignes produits, la mémoire
+résidente actuelle et le pic; status y ajoute les latences médiane et maximale depuis le
+démarrage et la durée du chargement initial. --metrics émet en plus, par déclenchement,
+la ligne METRICS de metrics.py (phases du générateur).
+
+Etat sur disque: --checkpoint N sauvegarde l'état (_state/) tous les N déclenchements qui
+ont produit des jours (défaut 1: une exécution isolée peut reprendre à tout moment; 0:
+seulement à l'arrêt).
+
+Usage:
+    python scripts/ficp_daemon.py --port 8766 [--interval 86400] [--trigger-file run.trigger] [--root DIR]
+    python scripts/ficp_daemon.py --send next [--port 8766]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import selectors
+import statistics
+import traceback
+from datetime import datetime, timedelta
+
+import metrics
+import registre
+import lake_index
+import generate_ficp_daily as gen
+from compact_lake import latest_day
+from key_registry import KeyRegistry
+
+DEFAULT_PORT = 8766
+
+
+def today() -> datetime:
+    now = datetime.today()
+    return datetime(now.year, now.month, now.day)
+
+
+class WarmGenerator:
+    """Historique du lake gardé en mémoire, avancé jour après jour."""
+
+    def __init__(self, start: datetime = None, checkpoint: int = 1):
+        self.start = start
+        self.checkpoint = checkpoint
+        self.history = None
+        self.reg = None
+        self.upto = None  # premier jour non couvert par l'historique
+        self.seen = None
+        self.pending_days = 0  # jours produits depuis la dernière sauvegarde
+        self.stale = False  # historique à recharger (commande en échec)
+        self.triggers_since_save = 0
+        self.latencies = []
+        self.stats = {'triggers': 0, 'resyncs': 0, 'days_generated': 0, 'days_existing': 0, 'rows_written': 0}
+        self.load_s = self.load()
+
+    def disk_view(self):
+        """Ce qui, sur disque, doit être inchangé pour que l'historique en mémoire reste valide."""
+        try:
+            st = os.stat(gen.STATE_PATH)
+            state = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            state = None
+        return gen.lake_fingerprint(self.upto), state, latest_day(gen.DATA_ROOT)
+
+    def load(self) -> float:
+        """(Re)charge l'historique jusqu'au dernier jour du lake; retourne la durée."""
+        t0 = time.perf_counter()
+        last = latest_day(gen.DATA_ROOT)
+        if last is not None:
+            self.upto = gen.parse_date(last) + timedelta(days=1)
+        else:
+            self.upto = self.start or today()
+        if self.history is not None:
+            self.history[1].close()
+        with metrics.phase('load_history'):
+            self.history = list(gen.load_history(self.upto))
+        if gen.REGISTRE:
+            with metrics.phase('registre'):
+                self.reg = registre.state_at(gen.DATA_ROOT, gen.str_date(self.upto - timedelta(days=1)))
+        self.pending_days = 0
+        self.seen = self.disk_view()
+        self.stale = False
+        return time.perf_counter() - t0
+
+    def invalidate(self):
+        """Après une erreur: rechargement au prochain déclenchement, pas de sauvegarde."""
+        self.stale = True
+
+    def save(self):
+        with metrics.phase('save_state'):
+            gen.save_history_snapshot(self.upto, *self.history)
+        if not self.history[1].folder:
+            # relecture complète: on continue sur le registre de cle tout juste créé
+            self.history[1] = KeyRegistry.open(gen.DIR_STATE)
+        self.pending_days = 0
+        self.triggers_since_save = 0
+
+    def advance(self, day: datetime):
+        """Génère day (ou intègre ses fichiers s'ils existent déjà) et avance l'historique."""
+        existing = gen.existing_day_files(day)
+        if any(existing):
+            gen.absorb_existing_day(day, existing, self.history, self.reg)
+            self.stats['days_existing'] += 1
+            return 0
+        rows = gen.generate_day(day, *self.history)
+        gen.write_day(day, *rows)
+        if self.reg is not None:
+            with metrics.phase('registre'):
+                gen.update_registre(day, self.reg, rows[1], rows[2])
+        n = sum(len(r) for r in rows)
+        metrics.count('rows_written', n)
+        metrics.count('days_generated')
+        self.stats['days_generated'] += 1
+        self.stats['rows_written'] += n
+        return n
+
+    def trigger(self, until: datetime = None) -> dict:
+        """Génère les jours manquants jusqu'à until inclus (défaut: le jour suivant)."""
+        t0 = time.perf_counter()
+        resynced = self.stale or self.disk_view() != self.seen
+        if resynced:
+            self.load()
+            self.stats['resyncs'] += 1
+        until = until or self.upto  # après le rechargement, qui peut déplacer upto
+        days, rows = [], 0
+        while self.upto <= until:
+            rows += self.advance(self.upto)
+            days.append(gen.str_date(self.upto))
+            self.upto += timedelta(days=1)
+        if days:
+            if gen.INDEX:
+                lake_index.update(gen.DATA_ROOT, months={d[:7] for d in days})
+            else:
+                lake_index.maintain(gen.DATA_ROOT, {d[:7] for d in days})
+            self.pending_days += len(days)
+            self.triggers_since_save += 1
+            if self.checkpoint and self.triggers_since_save >= self.checkpoint:
+                self.save()
+        self.seen = self.disk_view()
+        latency = time.perf_counter() - t0
+        self.latencies.append(latency)
+        self.stats['triggers'] += 1
+        return {'days': days, 'rows': rows, 'upto': gen.str_date(self.upto), 'resynced': resynced,
+                'latency_s': round(latency, 6), 'rss_kb': metrics.current_rss_kb(),
+                'peak_rss_kb': metrics.peak_rss_kb()}
+
+    def status(self) -> dict:
+        lat = self.latencies
+        return dict(self.stats, upto=gen.str_date(self.upto), load_s=round(self.load_s, 6),
+                    latency_s={'last': round(lat[-1], 6) if lat else None,
+                               'p50': round(statistics.median(lat), 6) if lat else None,
+                               'max': round(max(lat), 6) if lat else None},
+                    unsaved_days=self.pending_days, stale=self.stale, rss_kb=metrics.current_rss_kb(),
+                    peak_rss_kb=metrics.peak_rss_kb())
+
+    def close(self):
+        if self.pending_days and not self.stale:
+            self.save()
+
+
+class Service:
+    """Boucle de déclenchement: minuterie, fichier sentinelle et socket locale."""
+
+    def __init__(self, warm: WarmGenerator, port: int = None, interval: float = None, trigger_file: str = None,
+                 poll: float = 0.5, metrics_dest: str = None):
+        self.warm = warm
+        self.interval = interval
+        self.trigger_file = trigger_file
+        self.poll = poll
+        self.metrics_dest = metrics_dest
+        self.running = True
+        self.selector = selectors.DefaultSelector()
+        self.sock = None
+        if port is not None:
+            self.sock = socket.create_server(('127.0.0.1', port))
+            self.sock.setblocking(False)
+            self.selector.register(self.sock, selectors.EVENT_READ)
+
+    @property
+    def port(self):
+        return self.sock.getsockname()[1] if self.sock else None
+
+    def handle(self, command: str) -> dict:
+        verb, _, arg = command.strip().partition(' ')
+        try:
+            until = gen.parse_date(arg.strip()) if verb == 'run' and arg.strip() else None
+        except ValueError as ex:
+            return {'ok': False, 'error': str(ex)}
+        try:
+            if verb in ('next', 'run'):
+                if verb == 'run' and until is None:
+                    until = today()
+                with metrics.session('ficp_daemon', self.metrics_dest) as m:
+                    result = self.warm.trigger(until)
+                    m.exit_code = 0
+                    result['phases'] = m.to_dict('ficp_daemon')['phases']
+                if result['days']:
+                    print(f"[watch] {result['days'][0]}..{result['days'][-1]} - {result['rows']} lignes en "
+                          f"{result['latency_s']:.3f}s{' (resynchronise)' if result['resynced'] else ''}, "
+                          f"rss {result['rss_kb'] / 1024:.0f} Mo", flush=True)
+                return dict(result, ok=True)
+            if verb == 'status':
+                return dict(self.warm.status(), ok=True)
+            if verb == 'resync':
+                return {'ok': True, 'load_s': round(self.warm.load(), 6), 'upto': gen.str_date(self.warm.upto)}
+            if verb == 'stop':
+                self.running = False
+                return {'ok': True}
+        except Exception as ex:  # le service survit à toute commande en échec
+            self.warm.invalidate()
+            print(f'[watch] {command.strip()}: echec, historique recharge au prochain declenchement\n'
+                  f'{traceback.format_exc()}', file=sys.stderr, flush=True)
+            return {'ok': False, 'error': f'{type(ex).__name__}: {ex}', 'stale': True}
+        return {'ok': False, 'error': f'commande inconnue: {command.strip()}'}
+
+    def serve_client(self):
+        conn, _ = self.sock.accept()
+        with conn:
+            conn.settimeout(5.0)
+            try:
+                line = conn.makefile('r', encoding='utf-8').readline()
+            except OSError:
+                return
+            reply = self.handle(line)
+            try:
+                conn.sendall((json.dumps(reply) + '\n').encode('utf-8'))
+            except OSError:  # client parti avant la réponse
+                pass
+
+    def check_trigger_file(self):
+        if not self.trigger_file or not os.path.exists(self.trigger_file):
+            return
+        try:
+            with open(self.trigger_file, 'r', encoding='utf-8') as f:
+                command = f.read().strip() or 'run'
+            os.remove(self.trigger_file)
+        except OSError:  # retiré ou illisible: ignoré jusqu'au prochain passage
+            return
+        result = self.handle(command)
+        try:
+            with open(self.trigger_file + '.out', 'w', encoding='utf-8') as f:
+                f.write(json.dumps(result) + '\n')
+        except OSError as ex:
+            print(f'[watch] reponse non ecrite: {ex}', file=sys.stderr, flush=True)
+
+    def serve_forever(self):
+        next_tick = time.monotonic() + self.interval if self.interval else None
+        try:
+            while self.running:
+                timeouts = []
+                if self.trigger_file:
+                    timeouts.append(self.poll)
+                if next_tick is not None:
+                    timeouts.append(max(0.0, next_tick - time.monotonic()))
+                if self.sock:
+                    events = self.selector.select(min(timeouts) if timeouts else None)
+                    if events:
+                        self.serve_client()
+                elif timeouts:
+                    time.sleep(min(timeouts))
+                else:
+                    break
+                self.check_trigger_file()
+                if next_tick is not None and time.monotonic() >= next_tick:
+                    self.handle('run')
+                    next_tick += self.interval
+        finally:
+            self.close()
+
+    def close(self):
+        if self.sock:
+            self.selector.unregister(self.sock)
+            self.sock.close()
+            self.sock = None
+        self.warm.close()
+
+
+def send(command: str, port: int = DEFAULT_PORT, timeout: float = 600.0) -> dict:
+    """Envoie une commande au service et retourne sa réponse."""
+    with socket.create_connection(('127.0.0.1', port), timeout=timeout) as conn:
+        conn.sendall((command.strip() + '\n').encode('utf-8'))
+        return json.loads(conn.makefile('r', encoding='utf-8').readline())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, help='Racine du data lake (defaut: ficp_data_lake)')
+    parser.add_argument('--port', type=int, help=f'Port TCP local des commandes (client --send: defaut {DEFAULT_PORT})')
+    parser.add_argument('--interval', type=float, help='Genere les jours manquants toutes les N secondes')
+    parser.add_argument('--trigger-file', type=str, help='Fichier sentinelle: sa commande est executee a son apparition')
+    parser.add_argument('--start', type=str, help='Premier jour si le lake est vide YYYY-MM-DD (defaut: aujourd\'hui)')
+    parser.add_argument('--checkpoint', type=int, default=1,
+                        help='Sauvegarde l\'etat tous les N declenchements productifs (0: a l\'arret seulement)')
+    parser.add_argument('--config', type=str, help='Fichier JSON de volumes/ratios (voir generate_ficp_daily.py)')
+    parser.add_argument('--index', action='store_true', help='Met a jour l\'index de zones des mois ecrits')
+    parser.add_argument('--metrics', nargs='?', const='-', metavar='FICHIER',
+                        help='Emet les mesures de chaque declenchement (ligne METRICS sur stdout, ou FICHIER)')
+    parser.add_argument('--send', type=str, metavar='COMMANDE',
+                        help='Client: envoie next, run [YYYY-MM-DD], status, resync ou stop au service')
+    args = parser.parse_args(argv)
+
+    if args.send:
+        try:
+            reply = send(args.send, args.port or DEFAULT_PORT)
+        except OSError as ex:
+            print(f'Service injoignable sur le port {args.port or DEFAULT_PORT}: {ex}', file=sys.stderr)
+            return 1
+        print(json.dumps(reply, indent=2))
+        return 0 if reply.get('ok') else 1
+
+    if args.port is None and args.interval is None and args.trigger_file is None:
+        parser.error('indiquer au moins un declenchement: --port, --interval ou --trigger-file')
+    if args.root:
+        gen.set_data_root(args.root)
+    if args.config:
+        try:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                gen.configure(**json.load(f))
+        except (OSError, TypeError, ValueError) as ex:
+            print(f'Configuration invalide: {args.config} ({ex})', file=sys.stderr)
+            return 2
+    if args.index:
+        gen.configure(index=True)
+    try:
+        start = gen.parse_date(args.start) if args.start else None
+    except ValueError:
+        print('Date invalide, format attendu YYYY-MM-DD', file=sys.stderr)
+        return 2
+
+    warm = WarmGenerator(start, args.checkpoint)
+    service = Service(warm, args.port, args.interval, args.trigger_file, metrics_dest=args.metrics)
+    print(f'[watch] historique charge jusqu\'au {gen.str_date(warm.upto - timedelta(days=1))} en {warm.load_s:.3f}s, '
+          f'rss {metrics.current_rss_kb() / 1024:.0f} Mo'
+          + (f', port {service.port}' if service.port else ''), flush=True)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Règles métier FICP partagées par le générateur et les outils de contrôle du lake.
+
+Module sans effet de bord ni dépendance: kpi_lake.py (et donc audit_lake.py) lit ces
+valeurs sans importer le générateur.
+- PAIEMENT: une surveillance S devient inscription PAIEMENT à S + [SURV_TO_INS_DMIN,
+  SURV_TO_INS_DMAX] jours (délai déterministe par cle, voir payment_delay_days);
+- radiation: une inscription I d'un client radié (proportion RAD_PROBA) est radiée à
+  I + [RAD_DMIN, RAD_DMAX] jours.
+"""
+
+SURV_TO_INS_DMIN, SURV_TO_INS_DMAX = 31, 37
+RAD_PROBA = 0.70
+RAD_DMIN, RAD_DMAX = 18, 24
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Consultation du registre FICP: statut d'un ou plusieurs clients à une date.
+
+Lecture seule: l'historique est rechargé depuis l'état sauvegardé du générateur
+(_state/history.json.gz et history.bin) s'il est à jour, sinon depuis les CSV de
+inscription/ et consultation/ dans un HistoryStore compact (history_store.py). Dans les
+deux cas le statut à une date est une recherche dichotomique dans la chronologie triée du
+client.
+
+Avec --registre, le statut courant est lu dans l'instantané du registre du jour
+(registre/YYYY-MM-DD, voir registre.py): une recherche par cle, sans historique, et les
+radiations sont appliquées (statut RADIE). Sans --registre, le statut est celui que
+portent les consultations: la dernière inscription, radiée ou non.
+
+Sortie CSV sur stdout: cle_bdf, date, statut_ficp, date_surveillance, date_inscription
+
+Usage:
+    python scripts/ficp_status.py --cle ABCDEFGH12345 [--date YYYY-MM-DD] [--root DIR]
+    python scripts/ficp_status.py --keys cles.txt [--date YYYY-MM-DD]
+      (une cle par ligne, ou "cle,YYYY-MM-DD" pour une date propre à la ligne)
+    python scripts/ficp_status.py --cle ABCDEFGH12345 --registre [--date YYYY-MM-DD]
+"""
+
+import csv
+import sys
+import argparse
+from datetime import timedelta
+
+import generate_ficp_daily as gen
+import registre
+from history_store import HistoryStore
+
+
+def latest_day():
+    """Dernier jour présent dans inscription/ (None si le lake est vide)."""
+    sources = gen.lake_io.list_sources(gen.DIR_INSCR)
+    return gen.parse_date(max(src.days[-1] for src in sources)) if sources else None
+
+
+def read_keys(path: str, default_day):
+    pairs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line == 'cle_bdf' or line.startswith('cle_bdf,'):
+                continue
+            cle, _, d = line.partition(',')
+            pairs.append((cle.strip(), gen.parse_date(d.strip()) if d.strip() else default_day))
+    return pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cle', type=str, help='cle_bdf a consulter')
+    parser.add_argument('--keys', type=str, help='Fichier de cle_bdf (une par ligne, optionnellement "cle,date")')
+    parser.add_argument('--date', type=str, help='Date de consultation YYYY-MM-DD (defaut: dernier jour du lake)')
+    parser.add_argument('--root', type=str, help='Racine du data lake (defaut: ficp_data_lake)')
+    parser.add_argument('--registre', action='store_true',
+                        help='Statut courant lu dans l\'instantane du registre du jour (radiations appliquees)')
+    args = parser.parse_args(argv)
+
+    if not args.cle and not args.keys:
+        print('Indiquer --cle ou --keys', file=sys.stderr)
+        return 2
+    if args.root:
+        gen.set_data_root(args.root)
+
+    last = latest_day()
+    if last is None:
+        print(f'Lake vide: {gen.DIR_INSCR}', file=sys.stderr)
+        return 1
+    try:
+        day = gen.parse_date(args.date) if args.date else last
+        pairs = [(args.cle, day)] if args.cle else read_keys(args.keys, day)
+    except ValueError:
+        print('Date invalide, format attendu YYYY-MM-DD', file=sys.stderr)
+        return 2
+
+    if args.registre:
+        # une recherche par cle dans l'instantané de chaque date demandée
+        by_day = {}
+        for d in sorted({d for _, d in pairs}):
+            cles = [cle for cle, dd in pairs if dd == d]
+            found = registre.lookup(gen.DATA_ROOT, gen.str_date(d), cles)
+            if found is None:
+                print(f'Pas d\'instantane du registre pour {gen.str_date(d)} (scripts/registre.py --date)',
+                      file=sys.stderr)
+                return 1
+            by_day[d] = dict(zip(cles, found))
+        return write_statuses(pairs, [by_day[d][cle] for cle, d in pairs])
+
+    # historique complet du lake; les événements postérieurs à la date demandée sont ignorés.
+    # Etat du générateur s'il est à jour, sinon historique compact relu depuis les CSV.
+    upto = last + timedelta(days=1)
+    snapshot = gen.load_history_snapshot(upto)
+    if snapshot is not None:
+        store, known, _schedule = snapshot
+        known.close()
+    else:
+        store = HistoryStore.from_lake(gen.DATA_ROOT, upto.toordinal())
+    statuses = store.status_batch([(cle, d.toordinal()) for cle, d in pairs])
+    return write_statuses(pairs, statuses)
+
+
+def write_statuses(pairs, statuses):
+    w = csv.writer(sys.stdout, lineterminator='\n')
+    w.writerow(['cle_bdf', 'date', 'statut_ficp', 'date_surveillance', 'date_inscription'])
+    for (cle, d), (statut, d_surv, d_insc) in zip(pairs, statuses):
+        w.writerow([cle, gen.str_date(d), statut, d_surv, d_insc])
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
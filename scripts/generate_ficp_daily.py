@@ -2,55 +2,135 @@
 """
 Generation quotidienne FICP pour alimenter le data lake un jour à la fois.
 
-Principe clé pour l'incrémentalité sans état persistant:
+Principe clé pour l'incrémentalité, avec un état persistant et la relecture en secours:
 - Les delais (surveillance->inscription et inscription->radiation) sont déterminés par une
   fonction déterministe du cle_bdf pour garantir l'idempotence.
-- Pour un jour D, on relit l'historique existant des dossiers (inscription/surveillance)
-  et on calcule ce qui doit se produire à D:
+- Pour un jour D, on reprend l'historique arrêté à la veille (événements par client,
+  échéancier des PAIEMENT et radiations dus, clients connus) depuis l'instantané _state/
+  écrit après D-1: history.json.gz, history.bin et registre de cle keys.*.
+- L'instantané porte l'empreinte (taille, mtime) des fichiers du lake qu'il couvre; un
+  fichier ajouté, modifié ou retiré l'invalide. Sans instantané valide (ou --no-state), on
+  relit inscription/ et consultation/ et on reconstruit l'échéancier: les deux chemins
+  produisent des fichiers identiques octet pour octet.
+- On calcule ce qui doit se produire à D:
   - Inscriptions PAIEMENT planifiées: pour chaque surveillance passée S, si S + delay(cle) == D
   - Radiations: pour chaque inscription passée I, si I + rad_delay(cle) == D
   - On complète avec des nouveaux événements du jour pour atteindre 300 lignes
   - On génère 1000 consultations avec 60% de clients connus
+- --start/--end génère une plage en avançant l'historique en mémoire (generate_range).
 
 Usage:
-    python scripts/generate_ficp_daily.py --date YYYY-MM-DD [--overwrite]
+    python scripts/generate_ficp_daily.py --date YYYY-MM-DD [--overwrite] [--no-state] [--root DIR]
+    python scripts/generate_ficp_daily.py --start 2025-01-01 --end 2025-11-13 [--overwrite]
+    python scripts/generate_ficp_daily.py --start 2025-01-01 --days 30 [--workers 4] [--seed 42] [--registre]
+    python scripts/generate_ficp_daily.py --date YYYY-MM-DD --upload DEST   (envoi, voir upload_lake.py)
 """
 
 import os
-import csv
 import sys
 import argparse
+import gzip
+import json
 import hashlib
 import random
+import time
+from functools import lru_cache
 from datetime import datetime, timedelta
-from collections import defaultdict
-
-# Constantes métiers
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # moteur vectorisé optionnel (--engine numpy)
+    np = None
+
+import lake_io
+import metrics
+import registre
+import lake_index
+from key_registry import KeyRegistry
+from history_store import EventStore, HistoryStore, NO_DATE, iso_ordinal, ordinal_iso
+from ficp_rules import SURV_TO_INS_DMIN, SURV_TO_INS_DMAX, RAD_PROBA, RAD_DMIN, RAD_DMAX  # noqa: F401
+
+# Volumes et ratios quotidiens (surchargeables: configure, --config, --consultations ...);
+# délais et proportion de radiation: ficp_rules.py
 CONSULTATIONS_PAR_JOUR = 1000
 EVENEMENTS_PAR_JOUR = 300
 PART_SURDET = 0.30
-SURV_TO_INS_DMIN, SURV_TO_INS_DMAX = 31, 37
-RAD_PROBA = 0.70
-RAD_DMIN, RAD_DMAX = 18, 24
+PART_CONNUS = 0.60
 
 BASE_DIR = os.path.join(os.path.dirname(__file__), '..')
 DATA_ROOT = os.path.abspath(os.path.join(BASE_DIR, 'ficp_data_lake'))
 DIR_CONSULT = os.path.join(DATA_ROOT, 'consultation')
 DIR_INSCR = os.path.join(DATA_ROOT, 'inscription')
 DIR_RAD = os.path.join(DATA_ROOT, 'radiation')
-
-os.makedirs(DIR_CONSULT, exist_ok=True)
-os.makedirs(DIR_INSCR, exist_ok=True)
-os.makedirs(DIR_RAD, exist_ok=True)
-
-random.seed(42)
-
-
-def write_csv(path, header, rows):
-    with open(path, 'w', newline='', encoding='utf-8') as f:
-        w = csv.writer(f)
-        w.writerow(header)
-        w.writerows(rows)
+DIR_STATE = os.path.join(DATA_ROOT, '_state')
+STATE_PATH = os.path.join(DIR_STATE, 'history.json.gz')
+EVENTS_PATH = os.path.join(DIR_STATE, 'history.bin')
+STATE_VERSION = 5
+
+# Graine d'exécution: l'aléa de chaque jour en dérive avec la date (day_seed)
+RUN_SEED = 42
+# Moteur de génération: 'python' (historique) ou 'numpy' (vectorisé, gros volumes)
+ENGINE = 'python'
+ENGINES = ('python', 'numpy')
+# Format des fichiers écrits (les lecteurs reconnaissent les trois, voir lake_io)
+FORMAT = 'csv'
+FORMATS = lake_io.FORMATS
+REGISTRE = False  # instantané quotidien du registre (registre.py)
+INDEX = False  # index de zones des jours écrits (lake_index.py)
+
+
+def configure(consultations=None, evenements=None, part_surdet=None, part_connus=None, engine=None,
+              seed=None, format=None, registre=None, index=None):
+    """Surcharge les volumes quotidiens, les ratios, le moteur, la graine d'exécution, le
+    format des fichiers écrits, l'écriture du registre quotidien et la mise à jour de l'index.
+    Le moteur numpy tire clés, échantillons et délais par lots (generate_day_numpy). Le
+    format ne vaut que pour l'écriture: l'historique est relu quel que soit le format de
+    chaque fichier (lake_io)."""
+    global CONSULTATIONS_PAR_JOUR, EVENEMENTS_PAR_JOUR, PART_SURDET, PART_CONNUS, ENGINE, RUN_SEED, FORMAT, REGISTRE, \
+        INDEX
+    for name, val in (('consultations', consultations), ('evenements', evenements)):
+        if val is not None and val < 0:
+            raise ValueError(f'{name} doit etre >= 0')
+    for name, val in (('part_surdet', part_surdet), ('part_connus', part_connus)):
+        if val is not None and not 0.0 <= val <= 1.0:
+            raise ValueError(f'{name} doit etre dans [0, 1]')
+    if engine is not None:
+        if engine not in ENGINES:
+            raise ValueError(f'moteur inconnu: {engine} (attendu: {", ".join(ENGINES)})')
+        if engine == 'numpy' and np is None:
+            raise ValueError('le moteur numpy necessite le paquet numpy (pip install numpy)')
+        ENGINE = engine
+    if format is not None:
+        lake_io.check_format(format)
+        FORMAT = format
+    if consultations is not None:
+        CONSULTATIONS_PAR_JOUR = consultations
+    if evenements is not None:
+        EVENEMENTS_PAR_JOUR = evenements
+    if part_surdet is not None:
+        PART_SURDET = part_surdet
+    if part_connus is not None:
+        PART_CONNUS = part_connus
+    if seed is not None:
+        RUN_SEED = int(seed)
+    if registre is not None:
+        REGISTRE = bool(registre)
+    if index is not None:
+        INDEX = bool(index)
+
+
+def set_data_root(root: str):
+    """Redirige le générateur vers un autre data lake (tests, benchmarks)."""
+    global DATA_ROOT, DIR_CONSULT, DIR_INSCR, DIR_RAD, DIR_STATE, STATE_PATH, EVENTS_PATH
+    DATA_ROOT = os.path.abspath(root)
+    DIR_CONSULT = os.path.join(DATA_ROOT, 'consultation')
+    DIR_INSCR = os.path.join(DATA_ROOT, 'inscription')
+    DIR_RAD = os.path.join(DATA_ROOT, 'radiation')
+    DIR_STATE = os.path.join(DATA_ROOT, '_state')
+    STATE_PATH = os.path.join(DIR_STATE, 'history.json.gz')
+    EVENTS_PATH = os.path.join(DIR_STATE, 'history.bin')
 
 
 def md5_int(s: str) -> int:
@@ -74,190 +154,574 @@ def radiation_delay_days(cle: str) -> int:
     return RAD_DMIN + (md5_int('radd:' + cle) % (RAD_DMAX - RAD_DMIN + 1))
 
 
+@lru_cache(maxsize=65536)
 def parse_date(s: str) -> datetime:
-    return datetime.strptime(s, '%Y-%m-%d')
+    # décodage ISO direct (sans strptime), mémoïsé: peu de dates distinctes dans le lake
+    if len(s) != 10 or s[4] != '-' or s[7] != '-' or not (s[:4] + s[5:7] + s[8:]).isdigit():
+        raise ValueError(f'date invalide: {s!r}')
+    return datetime(int(s[:4]), int(s[5:7]), int(s[8:]))
 
 
+@lru_cache(maxsize=4096)
 def str_date(d: datetime) -> str:
+    # mémoïsé: les mêmes dates reviennent sur des millions de lignes
     return d.strftime('%Y-%m-%d')
 
 
-def load_history_upto(day: datetime):
-    """Charge l'historique nécessaire jusqu'à (exclu) day à partir de inscription/.
-    Retourne:
-      - surveillances: cle -> list of surveillance dates
-      - inscriptions: cle -> list of (insc_date, type_incident, surv_date_if_any)
-      - known_clients: set of cle connus (depuis inscription/)
+def new_schedule():
+    """Echéancier des événements planifiés, indexé par ordinal de la date d'échéance:
+      - paiement: ordinal -> set of (cle, surv_ordinal) inscriptions PAIEMENT attendues
+      - radiation: ordinal -> list of (cle, insc_ordinal, type_incident) radiations attendues
     """
-    surveillances = defaultdict(list)
-    inscriptions = defaultdict(list)
-    known = set()
+    return {'paiement': defaultdict(set), 'radiation': defaultdict(list)}
+
+
+def schedule_surveillance(schedule, cle: str, surv_o: int):
+    schedule['paiement'][surv_o + payment_delay_days(cle)].add((cle, surv_o))
 
-    if os.path.isdir(DIR_INSCR):
-        for name in os.listdir(DIR_INSCR):
-            if not name.endswith('.csv'):
-                continue
-            d = parse_date(name[:10])
-            if d >= day:
-                continue
-            with open(os.path.join(DIR_INSCR, name), 'r', encoding='utf-8') as f:
-                r = csv.reader(f)
-                header = next(r, None)
-                for cle, statut, type_inc, d_surv, d_insc in r:
-                    known.add(cle)
-                    if statut == 'SURVEILLANCE':
-                        if d_surv:
-                            surveillances[cle].append(parse_date(d_surv))
-                    elif statut == 'INSCRIT':
-                        insc_dt = parse_date(d_insc) if d_insc else None
-                        surv_dt = parse_date(d_surv) if d_surv else None
-                        if insc_dt:
-                            inscriptions[cle].append((insc_dt, type_inc, surv_dt))
-
-    # Compléter le pool de clients connus à partir de consultation/ (optionnel)
-    if os.path.isdir(DIR_CONSULT):
-        for name in os.listdir(DIR_CONSULT):
-            if not name.endswith('.csv'):
-                continue
-            d = parse_date(name[:10])
-            if d >= day:
-                continue
-            with open(os.path.join(DIR_CONSULT, name), 'r', encoding='utf-8') as f:
-                r = csv.reader(f)
-                header = next(r, None)
-                for cle, *_ in r:
-                    known.add(cle)
 
-    return surveillances, inscriptions, known
+def schedule_inscription(schedule, cle: str, insc_o: int, type_inc: str):
+    if will_radiate(cle):
+        schedule['radiation'][insc_o + radiation_delay_days(cle)].append((cle, insc_o, type_inc))
 
 
-def compute_status_for_date(cle: str, day: datetime, surveillances, inscriptions):
-    # INSCRIT si une inscription existe à date <= day
-    inscs = inscriptions.get(cle, [])
-    if inscs:
-        # prendre la plus recente <= day
-        inscs_sorted = sorted([x for x in inscs if x[0] <= day], key=lambda x: x[0])
-        if inscs_sorted:
-            last_insc_date, type_inc, surv_dt = inscs_sorted[-1]
-            return 'INSCRIT', str_date(surv_dt) if surv_dt else '', str_date(last_insc_date)
+def build_schedule(day: datetime, events: EventStore):
+    """Reconstruit l'échéancier des événements dus à partir de day (inclus): dernières
+    surveillances de moins de SURV_TO_INS_DMAX jours, inscriptions de moins de RAD_DMAX jours."""
+    schedule = new_schedule()
+    d_ord = day.toordinal()
+    for cle, last_surv in events.last_surveillances(d_ord - SURV_TO_INS_DMAX):
+        schedule_surveillance(schedule, cle, last_surv)
+    for cle, insc_o, type_inc in events.inscriptions_since(d_ord - RAD_DMAX):
+        schedule_inscription(schedule, cle, insc_o, type_inc)
+    prune_schedule(schedule, day)
+    return schedule
+
+
+def prune_schedule(schedule, day: datetime):
+    """Retire les échéances antérieures à day."""
+    d_ord = day.toordinal()
+    for due_map in schedule.values():
+        for o in [o for o in due_map if o < d_ord]:
+            del due_map[o]
+
+
+def apply_inscription_rows(rows, events: EventStore, known, schedule=None):
+    """Ajoute à l'historique (et à l'échéancier s'il est fourni) des lignes inscription/."""
+    for cle, statut, type_inc, d_surv, d_insc in rows:
+        known.add(cle)
+        if statut == 'SURVEILLANCE':
+            if d_surv:
+                events.add_surveillance(cle, iso_ordinal(d_surv))
+                if schedule is not None:
+                    schedule_surveillance(schedule, cle, events.last_surveillance(cle))
+        elif statut == 'INSCRIT':
+            if d_insc:
+                insc_o = iso_ordinal(d_insc)
+                events.add_inscription(cle, insc_o, type_inc, iso_ordinal(d_surv) if d_surv else NO_DATE)
+                if schedule is not None:
+                    schedule_inscription(schedule, cle, insc_o, type_inc)
+
+
+def apply_consultation_rows(rows, known):
+    """Ajoute au pool de clients connus les cle de lignes consultation/."""
+    for cle, *_ in rows:
+        known.add(cle)
+
+
+def load_history_upto(day: datetime):
+    """Relit l'historique jusqu'à (exclu) day dans inscription/ et consultation/ (fichiers
+    quotidiens et partitions mensuelles coupées à day). Retourne (events, known_clients, schedule):
+      - events: EventStore (history_store.py), surveillances et inscriptions par client, dates
+        en ordinaux et type_incident en codes
+      - known_clients: registre en mémoire (KeyRegistry.in_memory) de toutes les cle connues
+      - schedule: échéancier des PAIEMENT et radiations dus à partir de day (voir new_schedule)
+    """
+    events, keys = EventStore.from_lake(DATA_ROOT, day.toordinal())
+    return events, KeyRegistry.in_memory(keys), build_schedule(day, events)
+
+
+def lake_fingerprint(upto: datetime):
+    """Empreinte (taille, mtime) des fichiers lus par load_history_upto(upto), partitions
+    comprises (leur index change avec elles)."""
+    files = {}
+    for area, folder in (('inscription', DIR_INSCR), ('consultation', DIR_CONSULT)):
+        entries = {}
+        for src in lake_io.list_sources(folder):
+            if src.days[0] < str_date(upto):
+                st = os.stat(src.path)
+                entries[src.name] = [st.st_size, st.st_mtime_ns]
+        files[area] = entries
+    return files
+
+
+def save_history_snapshot(upto: datetime, events: EventStore, known, schedule):
+    """Sauvegarde l'historique couvrant les fichiers < upto.
+    La base de events va telle quelle dans _state/history.bin, réécrit seulement quand elle
+    change (relecture, fusion du delta au-delà du seuil de EventStore.needs_compact); le
+    delta, l'échéancier et l'empreinte du lake vont dans history.json.gz, écrit en dernier.
+    Les clients connus vont dans le registre de cle, créé s'il était en mémoire."""
+    prune_schedule(schedule, upto)
+    if known.folder:
+        known.save(str_date(upto))
+    else:
+        known = KeyRegistry.create(DIR_STATE, iter(known), str_date(upto))
+    os.makedirs(DIR_STATE, exist_ok=True)
+    if events.needs_compact():
+        events.compact()
+    if not events.saved:
+        tmp = EVENTS_PATH + '.tmp'
+        with open(tmp, 'wb') as f:
+            events.base.write(f)
+        metrics.count('files_written')
+        metrics.count('bytes_written', os.path.getsize(tmp))
+        os.replace(tmp, EVENTS_PATH)
+        events.saved = True
+    state = {
+        'version': STATE_VERSION,
+        'upto': str_date(upto),
+        'files': lake_fingerprint(upto),
+        'keys': len(known),
+        'events': dict(events.base.layout(), bytes=os.path.getsize(EVENTS_PATH)),
+        'surveillances': events.surv,
+        'inscriptions': events.insc,
+        'schedule': {
+            'paiement': {o: sorted(entries) for o, entries in schedule['paiement'].items() if entries},
+            'radiation': {o: entries for o, entries in schedule['radiation'].items() if entries},
+        },
+    }
+    tmp = STATE_PATH + '.tmp'
+    with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=1) as f:
+        f.write(json.dumps(state, separators=(',', ':')))
+    metrics.count('files_written')
+    metrics.count('bytes_written', os.path.getsize(tmp))
+    os.replace(tmp, STATE_PATH)
+
+
+def load_history_snapshot(day: datetime):
+    """Recharge l'état sauvegardé s'il couvre exactement les fichiers < day, sinon None."""
+    if not os.path.exists(STATE_PATH):
+        return None
+    try:
+        with gzip.open(STATE_PATH, 'rt', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    metrics.count('files_read')
+    metrics.count('bytes_read', os.path.getsize(STATE_PATH))
+    if state.get('version') != STATE_VERSION or state.get('upto') != str_date(day):
+        return None
+    if state.get('files') != lake_fingerprint(day):
+        return None
+    layout = state['events']
+    try:
+        if os.path.getsize(EVENTS_PATH) != layout['bytes']:
+            return None
+        with open(EVENTS_PATH, 'rb') as f:
+            events = EventStore(HistoryStore.read(f, layout))
+    except (OSError, EOFError):
+        return None
+    metrics.count('files_read')
+    metrics.count('bytes_read', layout['bytes'])
+    known = KeyRegistry.open(DIR_STATE)
+    if known is None or known.upto != str_date(day) or len(known) != state.get('keys'):
+        return None
+
+    events.saved = True
+    events.surv = state['surveillances']
+    events.insc = {cle: [tuple(e) for e in lst] for cle, lst in state['inscriptions'].items()}
+    events.pending = sum(map(len, events.surv.values())) + sum(map(len, events.insc.values()))
+    schedule = new_schedule()
+    for o, entries in state['schedule']['paiement'].items():
+        schedule['paiement'][int(o)] = {(cle, surv_o) for cle, surv_o in entries}
+    for o, entries in state['schedule']['radiation'].items():
+        schedule['radiation'][int(o)] = [(cle, i, t) for cle, i, t in entries]
+    return events, known, schedule
+
+
+def load_history(day: datetime):
+    """Historique jusqu'à (exclu) day: depuis l'état sauvegardé, ou reconstruit depuis les CSV.
+    Avec l'état, les clients connus restent dans le registre de cle projeté en mémoire
+    (key_registry.py: tirage par rang, filtre de Bloom pour les nouvelles cle), sans copie;
+    après une relecture, save_history_snapshot crée ce registre."""
+    snapshot = load_history_snapshot(day)
+    if snapshot is not None:
+        return snapshot
+    return load_history_upto(day)
+
+
+def day_seed(day: datetime, stream: str, run_seed: int = None) -> int:
+    """Graine d'un flux aléatoire du jour, dérivée de la graine d'exécution et de la date:
+    un jour peut être (re)généré seul ou en parallèle avec le même résultat."""
+    run_seed = RUN_SEED if run_seed is None else run_seed
+    return md5_int(f'seed:{run_seed}:{stream}:{str_date(day)}')
+
+
+KEY_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+KEY_DIGITS = '0123456789'
+
+
+def draw_key(rng) -> str:
+    return ''.join(rng.choices(KEY_LETTERS, k=8)) + ''.join(rng.choices(KEY_DIGITS, k=5))
+
+
+def key_candidates(day: datetime, count: int, run_seed: int):
+    """Tire à l'avance les count premières clés du flux 'keys' du jour (tâche de pool).
+    Retourne (candidats, état du RNG) pour que KeyStream poursuive le flux au-delà."""
+    rng = random.Random(day_seed(day, 'keys', run_seed))
+    return [draw_key(rng) for _ in range(count)], rng.getstate()
+
+
+def key_budget() -> int:
+    """Borne du nombre de nouvelles clés consommées par jour (hors collisions)."""
+    return EVENEMENTS_PAR_JOUR + CONSULTATIONS_PAR_JOUR
+
+
+class KeyStream:
+    """Flux déterministe des nouvelles clés d'un jour. Les candidats peuvent avoir été
+    tirés à l'avance (key_candidates): le résultat est le même que le tirage à la demande."""
+
+    def __init__(self, day: datetime, candidates=None, state=None):
+        self.rng = random.Random()
+        if state is None:
+            self.rng.seed(day_seed(day, 'keys'))
+        else:
+            self.rng.setstate(state)
+        self.pending = deque(candidates or ())
+
+    def new_key(self, existing) -> str:
+        while True:
+            cle = self.pending.popleft() if self.pending else draw_key(self.rng)
+            if cle not in existing:
+                return cle
 
-    # sinon SURVEILLANCE si une surveillance existe <= day
-    survs = surveillances.get(cle, [])
-    if survs:
-        survs_sorted = sorted([s for s in survs if s <= day])
-        if survs_sorted:
-            return 'SURVEILLANCE', str_date(survs_sorted[-1]), ''
 
-    return 'NON_INSCRIT', '', ''
+def day_paths(day: datetime):
+    day_str = str_date(day)
+    return tuple(lake_io.day_file(folder, day_str, FORMAT) for folder in (DIR_CONSULT, DIR_INSCR, DIR_RAD))
 
 
-def generate_daily(day: datetime, overwrite: bool = False):
+def existing_day_files(day: datetime):
+    """Fichiers déjà présents pour day, par zone (consultation, inscription, radiation),
+    quel que soit leur format: fichiers quotidiens et partition mensuelle qui contient day."""
     day_str = str_date(day)
+    found = []
+    for folder in (DIR_CONSULT, DIR_INSCR, DIR_RAD):
+        paths = lake_io.find_day_files(folder, day_str)
+        partition = lake_io.partition_for(folder, day_str)
+        found.append(paths + [partition] if partition else paths)
+    return tuple(found)
 
-    # Sortie du jour
-    consult_path = os.path.join(DIR_CONSULT, f'{day_str}.csv')
-    inscr_path = os.path.join(DIR_INSCR, f'{day_str}.csv')
-    rad_path = os.path.join(DIR_RAD, f'{day_str}.csv')
 
-    if not overwrite:
-        for p in (consult_path, inscr_path, rad_path):
-            if os.path.exists(p):
-                print(f"EXISTE: {p} (utiliser --overwrite pour regénérer)")
-                return 0
+def compacted_day(day: datetime):
+    """Partition mensuelle contenant day (première zone trouvée), ou None: un jour compacté
+    n'est pas regénéré (décompacter le mois d'abord, voir compact_lake.py)."""
+    day_str = str_date(day)
+    for folder in (DIR_CONSULT, DIR_INSCR, DIR_RAD):
+        partition = lake_io.partition_for(folder, day_str)
+        if partition:
+            return partition
+    return None
 
-    # Charger l'historique jusqu'à la veille
-    surveillances, inscriptions, known_clients = load_history_upto(day)
 
-    # 1) Inscriptions PAIEMENT programmées aujourd'hui
+def scheduled_paiements(day: datetime, events: EventStore, schedule):
+    """Inscriptions PAIEMENT dues à day (échéancier: S + delay(cle) == D).
+    Retourne (lignes inscription.csv, [(cle, surv_ordinal)]) en ordre canonique."""
+    day_str = str_date(day)
+    d_ord = day.toordinal()
     today_insc = []  # tuples pour inscription.csv
-    paiements_today = []  # (cle, surv_dt)
-    for cle, surv_list in surveillances.items():
-        if not surv_list:
+    paiements_today = []  # (cle, surv_ordinal)
+    for cle, surv_ord in schedule['paiement'].pop(d_ord, ()):
+        # utiliser la plus recente surveillance pour ce modèle simple: l'échéance d'une
+        # surveillance remplacée par une plus récente (ou sans surveillance) est ignorée
+        if events.last_surveillance(cle) != surv_ord:
             continue
-        # utiliser la plus recente surveillance pour ce modèle simple
-        last_surv = max(surv_list)
-        target = last_surv + timedelta(days=payment_delay_days(cle))
-        if target == day:
-            # éviter de créer doublon si déjà inscrit avant aujourd'hui
-            if not any(insc_dt <= day for (insc_dt, _, _) in inscriptions.get(cle, [])):
-                today_insc.append((cle, 'INSCRIT', 'PAIEMENT', str_date(last_surv), day_str))
-                paiements_today.append((cle, last_surv))
+        # éviter de créer doublon si déjà inscrit avant aujourd'hui
+        first_insc = events.first_inscription(cle)
+        if not (first_insc and first_insc <= d_ord):
+            today_insc.append((cle, 'INSCRIT', 'PAIEMENT', ordinal_iso(surv_ord), day_str))
+            paiements_today.append((cle, surv_ord))
+    # ordre canonique: indépendant de l'ordre de chargement de l'historique
+    today_insc.sort()
+    paiements_today.sort()
+    return today_insc, paiements_today
+
+
+def scheduled_radiations(day: datetime, schedule):
+    """Radiations dues à day (échéancier: I + rad_delay(cle) == D, si will_radiate(cle)),
+    triées: la sortie ne dépend pas de l'ordre de lecture (état ou relecture complète)."""
+    day_str = str_date(day)
+    today_rad = [(cle, ordinal_iso(insc_o), day_str, type_inc)
+                 for (cle, insc_o, type_inc) in schedule['radiation'].pop(day.toordinal(), ())]
+    today_rad.sort()
+    return today_rad
 
-    scheduled_count = len(today_insc)
 
-    # 2) Compléter avec SURENDETTEMENT directs et nouvelles SURVEILLANCES
+def split_new_events(scheduled_count: int):
+    """Nombre de SURENDETTEMENT directs et de nouvelles SURVEILLANCES pour compléter le jour."""
     remaining = max(0, EVENEMENTS_PAR_JOUR - scheduled_count)
     new_direct = int(round(remaining * PART_SURDET))
-    new_surv = remaining - new_direct
+    return new_direct, remaining - new_direct
 
-    # Générer des nouvelles clés uniques
-    def new_key(existing):
-        letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-        digits = '0123456789'
-        while True:
-            cle = ''.join(random.choice(letters) for _ in range(8)) + ''.join(random.choice(digits) for _ in range(5))
-            if cle not in existing:
-                return cle
 
-    existing_keys = set(known_clients)
-
-    # 2.a) Direct SURENDETTEMENT
-    for _ in range(new_direct):
-        cle = new_key(existing_keys)
-        existing_keys.add(cle)
-        today_insc.append((cle, 'INSCRIT', 'SURENDETTEMENT', '', day_str))
-        inscriptions[cle].append((day, 'SURENDETTEMENT', None))
-
-    # 2.b) Nouvelles SURVEILLANCES (PAIEMENT)
-    for _ in range(new_surv):
-        cle = new_key(existing_keys)
-        existing_keys.add(cle)
-        today_insc.append((cle, 'SURVEILLANCE', 'PAIEMENT', day_str, ''))
-        surveillances[cle].append(day)
-
-    # 3) Radiations du jour (pour toutes inscriptions <= day)
-    today_rad = []
-    for cle, inscs in inscriptions.items():
-        for (insc_dt, type_inc, _surv_dt) in inscs:
-            if insc_dt >= day:
-                continue
-            if will_radiate(cle):
-                rday = insc_dt + timedelta(days=radiation_delay_days(cle))
-                if rday == day:
-                    today_rad.append((cle, str_date(insc_dt), day_str, type_inc))
-
-    # 4) Consultations 1000/jour (60% connus)
-    consult_rows = []
-    known_pool = list(existing_keys)
-    nb_known = int(CONSULTATIONS_PAR_JOUR * 0.6)
-    nb_new = CONSULTATIONS_PAR_JOUR - nb_known
-
-    # connus
-    for _ in range(nb_known):
-        if known_pool:
-            cle = random.choice(known_pool)
-        else:
+def generate_day(day: datetime, events: EventStore, known_clients, schedule, keys: KeyStream = None):
+    """Calcule les 3 flux du jour à partir de l'historique arrêté à la veille.
+    L'historique (events, known_clients, schedule) est avancé en place
+    jusqu'à la fin de day, comme si les fichiers du jour avaient été relus.
+    L'aléa du jour vient de deux flux propres au jour (day_seed): 'keys' pour les nouvelles
+    clés (éventuellement pré-tirées: keys) et 'sample' pour l'échantillon de clients connus.
+    Retourne (consult_rows, today_insc, today_rad).
+    """
+    if ENGINE == 'numpy':
+        return generate_day_numpy(day, events, known_clients, schedule)
+
+    day_str = str_date(day)
+    d_ord = day.toordinal()
+    keys = keys or KeyStream(day)
+    new_key = keys.new_key
+    sample_rng = random.Random(day_seed(day, 'sample'))
+
+    # 1) Inscriptions PAIEMENT programmées aujourd'hui
+    with metrics.phase('paiement_scan'):
+        today_insc, paiements_today = scheduled_paiements(day, events, schedule)
+
+    # 2) Compléter avec SURENDETTEMENT directs et nouvelles SURVEILLANCES
+    new_direct, new_surv = split_new_events(len(today_insc))
+
+    existing_keys = known_clients
+
+    with metrics.phase('new_events'):
+        # 2.a) Direct SURENDETTEMENT
+        for _ in range(new_direct):
+            cle = new_key(existing_keys)
+            existing_keys.add(cle)
+            today_insc.append((cle, 'INSCRIT', 'SURENDETTEMENT', '', day_str))
+            events.add_inscription(cle, d_ord, 'SURENDETTEMENT')
+            schedule_inscription(schedule, cle, d_ord, 'SURENDETTEMENT')
+
+        # 2.b) Nouvelles SURVEILLANCES (PAIEMENT)
+        for _ in range(new_surv):
+            cle = new_key(existing_keys)
+            existing_keys.add(cle)
+            today_insc.append((cle, 'SURVEILLANCE', 'PAIEMENT', day_str, ''))
+            events.add_surveillance(cle, d_ord)
+            schedule_surveillance(schedule, cle, d_ord)
+
+    # 3) Radiations du jour
+    with metrics.phase('radiation_scan'):
+        today_rad = scheduled_radiations(day, schedule)
+
+    # 4) Consultations (CONSULTATIONS_PAR_JOUR, dont PART_CONNUS de clients connus)
+    with metrics.phase('consultation_status'):
+        consult_rows = []
+        known_pool = existing_keys  # registre de cle: liste triée indexable
+        nb_known = int(CONSULTATIONS_PAR_JOUR * PART_CONNUS)
+        nb_new = CONSULTATIONS_PAR_JOUR - nb_known
+
+        # connus
+        known_sample = []
+        for _ in range(nb_known):
+            if known_pool:
+                cle = sample_rng.choice(known_pool)
+            else:
+                cle = new_key(existing_keys)
+                existing_keys.add(cle)
+            known_sample.append(cle)
+        statuses = events.status_batch([(cle, d_ord) for cle in known_sample])
+        for cle, (statut, d_surv, d_insc) in zip(known_sample, statuses):
+            consult_rows.append((cle, day_str, statut, d_surv, d_insc))
+
+        # nouveaux
+        for _ in range(nb_new):
             cle = new_key(existing_keys)
             existing_keys.add(cle)
-        statut, d_surv, d_insc = compute_status_for_date(cle, day, surveillances, inscriptions)
-        consult_rows.append((cle, day_str, statut, d_surv, d_insc))
-
-    # nouveaux
-    for _ in range(nb_new):
-        cle = new_key(existing_keys)
-        existing_keys.add(cle)
-        consult_rows.append((cle, day_str, 'NON_INSCRIT', '', ''))
-
-    # 5) Écriture fichiers
-    write_csv(consult_path,
-              ['cle_bdf', 'date_consultation', 'statut_ficp', 'date_surveillance', 'date_inscription'],
-              consult_rows)
-    write_csv(inscr_path,
-              ['cle_bdf', 'statut_ficp', 'type_incident', 'date_surveillance', 'date_inscription'],
-              today_insc)
-    write_csv(rad_path,
-              ['cle_bdf', 'date_inscription', 'date_radiation', 'type_incident'],
-              today_rad)
+            consult_rows.append((cle, day_str, 'NON_INSCRIT', '', ''))
+
+    # 5) Etat arrêté au jour: les PAIEMENT du jour rejoignent l'historique
+    with metrics.phase('history_update'):
+        for cle, last_surv in paiements_today:
+            events.add_inscription(cle, d_ord, 'PAIEMENT', last_surv)
+            schedule_inscription(schedule, cle, d_ord, 'PAIEMENT')
+
+    return consult_rows, today_insc, today_rad
+
+
+def md5_mod_array(prefix: str, keys, m: int):
+    """md5_int(prefix + cle) % m pour un lot de cle (tableau numpy).
+    Le modulo est réduit octet par octet sur les condensats, sans passer par int(hex, 16)."""
+    md5 = hashlib.md5
+    raw = b''.join([md5((prefix + cle).encode('utf-8')).digest() for cle in keys])
+    digests = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 16).astype(np.uint64)
+    acc = np.zeros(len(keys), dtype=np.uint64)
+    for j in range(16):
+        acc = (acc * 256 + digests[:, j]) % m
+    return acc
+
+
+def schedule_surveillances_array(schedule, keys, s_ord: int):
+    """schedule_surveillance pour un lot de cle surveillées le même jour."""
+    dues = s_ord + SURV_TO_INS_DMIN + md5_mod_array('pay:', keys, SURV_TO_INS_DMAX - SURV_TO_INS_DMIN + 1)
+    paiement = schedule['paiement']
+    for cle, due in zip(keys, dues.tolist()):
+        paiement[due].add((cle, s_ord))
+
+
+def schedule_inscriptions_array(schedule, keys, insc_o: int, type_inc: str):
+    """schedule_inscription pour un lot de cle inscrites le même jour avec le même type."""
+    radiate = (md5_mod_array('radp:', keys, 10000) / 10000.0) < RAD_PROBA
+    dues = insc_o + RAD_DMIN + md5_mod_array('radd:', keys, RAD_DMAX - RAD_DMIN + 1)
+    radiation = schedule['radiation']
+    for cle, r, due in zip(keys, radiate.tolist(), dues.tolist()):
+        if r:
+            radiation[due].append((cle, insc_o, type_inc))
+
+
+def new_keys_array(rng, n: int, existing):
+    """n nouvelles cle (8 lettres + 5 chiffres) absentes de existing, tirées par lots."""
+    keys = []
+    fresh = set()
+    while len(keys) < n:
+        need = n - len(keys)
+        raw = np.empty((need, 13), dtype=np.uint8)
+        raw[:, :8] = rng.integers(65, 91, size=(need, 8), dtype=np.uint8)
+        raw[:, 8:] = rng.integers(48, 58, size=(need, 5), dtype=np.uint8)
+        for cle in raw.view('S13').ravel().astype('U13').tolist():
+            if cle not in existing and cle not in fresh:
+                fresh.add(cle)
+                keys.append(cle)
+    return keys
+
+
+def generate_day_numpy(day: datetime, events: EventStore, known_clients, schedule):
+    """Moteur vectorisé de generate_day (--engine numpy) pour les gros volumes.
+    Mêmes règles métier; clés, échantillon de clients connus et délais sont calculés par
+    lots. L'aléa vient d'un générateur numpy propre au jour (RUN_SEED, date): la sortie
+    est déterministe mais différente de celle du moteur python.
+    """
+    day_str = str_date(day)
+    d_ord = day.toordinal()
+    rng = np.random.default_rng(day_seed(day, 'numpy'))
+
+    # 1) Inscriptions PAIEMENT programmées aujourd'hui
+    with metrics.phase('paiement_scan'):
+        today_insc, paiements_today = scheduled_paiements(day, events, schedule)
+
+    # 2) SURENDETTEMENT directs puis nouvelles SURVEILLANCES, clés tirées en un lot
+    with metrics.phase('new_events'):
+        new_direct, new_surv = split_new_events(len(today_insc))
+        keys = new_keys_array(rng, new_direct + new_surv, known_clients)
+        known_clients.update(keys)
+        direct, surv = keys[:new_direct], keys[new_direct:]
+        today_insc.extend([(cle, 'INSCRIT', 'SURENDETTEMENT', '', day_str) for cle in direct])
+        today_insc.extend([(cle, 'SURVEILLANCE', 'PAIEMENT', day_str, '') for cle in surv])
+        for cle in direct:
+            events.add_inscription(cle, d_ord, 'SURENDETTEMENT')
+        for cle in surv:
+            events.add_surveillance(cle, d_ord)
+        schedule_inscriptions_array(schedule, direct, d_ord, 'SURENDETTEMENT')
+        schedule_surveillances_array(schedule, surv, d_ord)
+
+    # 3) Radiations du jour
+    with metrics.phase('radiation_scan'):
+        today_rad = scheduled_radiations(day, schedule)
+
+    # 4) Consultations: échantillon de connus par indices, puis nouveaux clients
+    with metrics.phase('consultation_status'):
+        nb_known = int(CONSULTATIONS_PAR_JOUR * PART_CONNUS)
+        nb_new = CONSULTATIONS_PAR_JOUR - nb_known
+        known_pool = known_clients
+        if known_pool:
+            known_sample = [known_pool[i] for i in rng.integers(0, len(known_pool), size=nb_known).tolist()]
+        else:
+            known_sample = new_keys_array(rng, nb_known, known_clients)
+            known_clients.update(known_sample)
+        statuses = events.status_batch([(cle, d_ord) for cle in known_sample])
+        consult_rows = [(cle, day_str, statut, d_surv, d_insc)
+                        for cle, (statut, d_surv, d_insc) in zip(known_sample, statuses)]
+        new_consult = new_keys_array(rng, nb_new, known_clients)
+        known_clients.update(new_consult)
+        consult_rows.extend([(cle, day_str, 'NON_INSCRIT', '', '') for cle in new_consult])
+
+    # 5) Etat arrêté au jour: les PAIEMENT du jour rejoignent l'historique
+    with metrics.phase('history_update'):
+        for cle, last_surv in paiements_today:
+            events.add_inscription(cle, d_ord, 'PAIEMENT', last_surv)
+        schedule_inscriptions_array(schedule, [cle for cle, _ in paiements_today], d_ord, 'PAIEMENT')
+
+    return consult_rows, today_insc, today_rad
+
+
+def write_day(day: datetime, consult_rows, today_insc, today_rad):
+    with metrics.phase('write'):
+        write_day_files(day_paths(day), consult_rows, today_insc, today_rad)
+
+
+def write_day_files(paths, consult_rows, today_insc, today_rad):
+    """Ecrit les 3 fichiers d'un jour (chemins explicites: utilisable dans un pool de processus).
+    Le format suit l'extension des chemins; une version du jour dans un autre format est
+    retirée une fois le nouveau fichier écrit. Les dossiers des zones sont créés au besoin
+    (pas à l'import: audit et lecteurs ne doivent pas créer un lake absent). Retourne les
+    octets écrits."""
+    consult_path, inscr_path, rad_path = paths
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    size = lake_io.write_rows(consult_path,
+                              ['cle_bdf', 'date_consultation', 'statut_ficp', 'date_surveillance', 'date_inscription'],
+                              consult_rows)
+    size += lake_io.write_rows(inscr_path,
+                               ['cle_bdf', 'statut_ficp', 'type_incident', 'date_surveillance', 'date_inscription'],
+                               today_insc)
+    size += lake_io.write_rows(rad_path,
+                               ['cle_bdf', 'date_inscription', 'date_radiation', 'type_incident'],
+                               today_rad)
+    for path in paths:
+        for other in lake_io.find_day_files(os.path.dirname(path), os.path.basename(path)[:10]):
+            if other != path:
+                os.remove(other)
+    return size
+
+
+def generate_daily(day: datetime, overwrite: bool = False, use_state: bool = True):
+    """Génère day à partir de l'historique de la veille (load_history, ou relecture seule
+    sans use_state) puis sauvegarde l'état pour le lendemain. Un jour existant n'est pas
+    regénéré sans overwrite, un jour compacté jamais.
+    Avec REGISTRE, écrit aussi l'instantané du registre du jour (registre.py); l'index de
+    zones des mois écrits est mis à jour avec INDEX, et tenu à jour sans INDEX s'il existe
+    (lake_index.py). Les temps par phase vont dans metrics (--metrics)."""
+    day_str = str_date(day)
+
+    # Sortie du jour
+    consult_path, inscr_path, rad_path = day_paths(day)
+
+    if not overwrite:
+        for existing in existing_day_files(day):
+            if existing:
+                print(f"EXISTE: {existing[0]} (utiliser --overwrite pour regénérer)")
+                return 0
+    elif compacted_day(day):
+        print(f"COMPACTE: {day_str} est dans {compacted_day(day)} (décompacter le mois pour le regénérer)")
+        return 2
+
+    # Charger l'historique jusqu'à la veille
+    with metrics.phase('load_history'):
+        history = load_history(day) if use_state else load_history_upto(day)
+
+    rows = generate_day(day, *history)
+    metrics.count('rows_written', sum(len(r) for r in rows))
+    metrics.count('days_generated')
+    write_day(day, *rows)
+    if REGISTRE:
+        with metrics.phase('registre'):
+            reg = registre.state_at(DATA_ROOT, str_date(day - timedelta(days=1)))
+            update_registre(day, reg, rows[1], rows[2])
+    if INDEX:
+        lake_index.update(DATA_ROOT, months={day_str[:7]})
+    else:
+        lake_index.maintain(DATA_ROOT, {day_str[:7]})
+
+    if use_state:
+        with metrics.phase('save_state'):
+            save_history_snapshot(day + timedelta(days=1), *history)
 
     print(f'OK - Fichiers generes pour {day_str}:')
     print(f'- {consult_path}')
@@ -266,24 +730,266 @@ def generate_daily(day: datetime, overwrite: bool = False):
     return 0
 
 
+def update_registre(day: datetime, reg, insc_rows, rad_rows):
+    """Avance le registre avec les lignes du jour et écrit son instantané."""
+    registre.apply_inscriptions(reg, insc_rows)
+    registre.apply_radiations(reg, rad_rows)
+    registre.write_snapshot(DATA_ROOT, str_date(day), reg, FORMAT)
+
+
+def absorb_existing_day(day: datetime, existing, history, reg=None):
+    """Intègre à l'historique (et au registre) les fichiers déjà présents de day, tels quels."""
+    day_str = str_date(day)
+    events, known_clients, schedule = history
+    consult_files, inscr_files, rad_files = existing
+    with metrics.phase('existing_days'):
+        for path in inscr_files:
+            apply_inscription_rows(lake_io.read_day(path, day_str)[1], events, known_clients, schedule)
+        for path in consult_files:
+            apply_consultation_rows(lake_io.read_day(path, day_str)[1], known_clients)
+    if reg is not None:
+        with metrics.phase('registre'):
+            update_registre(day, reg, [r for p in inscr_files for r in lake_io.read_day(p, day_str)[1]],
+                            [r for p in rad_files for r in lake_io.read_day(p, day_str)[1]])
+    metrics.count('days_existing')
+
+
+def collect_write(future):
+    """Attend l'écriture d'un jour confiée au pool; les compteurs de lake_io restent dans
+    le processus fils, les fichiers et octets écrits sont donc comptés ici."""
+    with metrics.phase('write_wait'):
+        size = future.result()
+    metrics.count('files_written', 3)
+    metrics.count('bytes_written', size)
+
+
+def generate_range(start: datetime, end: datetime, overwrite: bool = False, use_state: bool = True,
+                   workers: int = 1, shards: int = 1):
+    """Génère les jours start..end (inclus) dans un seul processus.
+    L'historique est chargé une fois puis avancé en mémoire jour après jour; le résultat
+    est identique à une suite d'appels generate_daily pour chaque jour.
+    Avec workers > 1, un pool de processus prend en charge ce qui ne dépend pas de la
+    veille: tirage à l'avance des clés candidates des jours suivants (moteur python) et
+    écriture des fichiers. L'avancement de l'historique reste séquentiel; la sortie est
+    identique quel que soit workers.
+    Avec shards > 1 (moteur python), l'historique des clients est réparti par cle entre
+    autant de processus qui calculent échéances et statuts de leurs clients (sharding.py);
+    la sortie est identique quel que soit shards.
+    """
+    if end < start:
+        print('Plage invalide: --end avant --start')
+        return 2
+
+    with metrics.phase('load_history'):
+        history = load_history(start) if use_state else load_history_upto(start)
+    reg = None
+    if REGISTRE:
+        with metrics.phase('registre'):
+            reg = registre.state_at(DATA_ROOT, str_date(start - timedelta(days=1)))
+
+    shard_set = None
+    if shards > 1:
+        import sharding  # import tardif: sharding importe ce module
+        shard_set = sharding.ShardSet(shards, history)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    prefetched = {}  # ordinal -> future(key_candidates)
+    writes = deque()
+    total_rows = 0
+    t_start = time.perf_counter()
+    try:
+        day = start
+        while day <= end:
+            day_str = str_date(day)
+            paths = day_paths(day)
+            if pool and ENGINE == 'python':
+                # clés candidates des prochains jours tirées en avance par le pool
+                ahead = day
+                while ahead <= min(end, day + timedelta(days=workers)):
+                    if ahead.toordinal() not in prefetched:
+                        prefetched[ahead.toordinal()] = pool.submit(key_candidates, ahead, key_budget(), RUN_SEED)
+                    ahead += timedelta(days=1)
+            keys_future = prefetched.pop(day.toordinal(), None)
+
+            existing = existing_day_files(day)
+            if any(existing) and (not overwrite or compacted_day(day)):
+                # jour déjà présent (quel que soit son format, compacté ou non: une partition
+                # n'est jamais regénérée): on l'intègre à l'historique tel quel
+                if overwrite:
+                    print(f"COMPACTE: {day_str} (non regénéré)")
+                else:
+                    print(f"EXISTE: {day_str} (utiliser --overwrite pour regénérer)")
+                if shard_set:
+                    shard_set.absorb_existing_day(day, existing, reg)
+                else:
+                    absorb_existing_day(day, existing, history, reg)
+                day += timedelta(days=1)
+                continue
+
+            t0 = time.perf_counter()
+            if keys_future:
+                with metrics.phase('prefetch_wait'):
+                    keys = KeyStream(day, *keys_future.result())
+            else:
+                keys = None
+            if shard_set:
+                rows = shard_set.generate_day(day, keys=keys)
+            else:
+                rows = generate_day(day, *history, keys=keys)
+            if pool:
+                writes.append(pool.submit(write_day_files, paths, *rows))
+                while len(writes) > workers:
+                    collect_write(writes.popleft())
+            else:
+                write_day(day, *rows)
+            if reg is not None:
+                with metrics.phase('registre'):
+                    update_registre(day, reg, rows[1], rows[2])
+            elapsed = time.perf_counter() - t0
+            n = sum(len(r) for r in rows)
+            total_rows += n
+            metrics.count('rows_written', n)
+            metrics.count('days_generated')
+            print(f'OK {day_str} - {n} lignes en {elapsed:.3f}s ({n / elapsed:.0f} lignes/s)')
+            day += timedelta(days=1)
+
+        while writes:
+            collect_write(writes.popleft())
+        if shard_set and use_state:
+            history = shard_set.history()
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        if shard_set:
+            shard_set.close()
+
+    months = {str_date(start + timedelta(days=i))[:7] for i in range((end - start).days + 1)}
+    if INDEX:
+        lake_index.update(DATA_ROOT, months=months)
+    else:
+        lake_index.maintain(DATA_ROOT, months)
+    if use_state:
+        with metrics.phase('save_state'):
+            save_history_snapshot(end + timedelta(days=1), *history)
+
+    total = time.perf_counter() - t_start
+    nb_days = (end - start).days + 1
+    print(f'TOTAL {str_date(start)}..{str_date(end)} - {nb_days} jours, {total_rows} lignes en {total:.3f}s '
+          f'({total_rows / total:.0f} lignes/s)')
+    return 0
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('--date', type=str, help='Jour au format YYYY-MM-DD (defaut: aujourd\'hui)')
+    parser.add_argument('--start', type=str, help='Premier jour d\'une plage YYYY-MM-DD (rattrapage)')
+    parser.add_argument('--end', type=str, help='Dernier jour (inclus) de la plage YYYY-MM-DD (defaut: aujourd\'hui)')
+    parser.add_argument('--days', type=int, help='Nombre de jours de la plage a partir de --start (ou jusqu\'a --end)')
     parser.add_argument('--overwrite', action='store_true', help='Ecrase les fichiers existants du jour')
+    parser.add_argument('--no-state', action='store_true', help='Relit tout le lake au lieu de l\'etat sauvegarde')
+    parser.add_argument('--root', type=str, help='Racine du data lake (defaut: ficp_data_lake)')
+    parser.add_argument('--config', type=str, help='Fichier JSON de volumes/ratios (cles: consultations, '
+                                                   'evenements, part_surdet, part_connus, engine, seed, format, '
+                                                   'registre, index)')
+    parser.add_argument('--consultations', type=int, help=f'Consultations par jour (defaut: {CONSULTATIONS_PAR_JOUR})')
+    parser.add_argument('--evenements', type=int, help=f'Evenements inscription par jour (defaut: {EVENEMENTS_PAR_JOUR})')
+    parser.add_argument('--part-surdet', type=float, help=f'Part de SURENDETTEMENT directs (defaut: {PART_SURDET})')
+    parser.add_argument('--part-connus', type=float, help=f'Part de consultations de clients connus (defaut: {PART_CONNUS})')
+    parser.add_argument('--engine', choices=ENGINES, help='Moteur de generation (defaut: python)')
+    parser.add_argument('--seed', type=int, help=f'Graine d\'execution (defaut: {RUN_SEED})')
+    parser.add_argument('--format', choices=FORMATS, help='Format des fichiers ecrits (defaut: csv)')
+    parser.add_argument('--workers', type=int, default=1, help='Processus pour le rattrapage --start/--end (defaut: 1)')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Processus se partageant les clients par cle pour --start/--end (defaut: 1, moteur python)')
+    parser.add_argument('--registre', action='store_true', default=None,
+                        help='Ecrit aussi l\'instantane quotidien du registre (registre/)')
+    parser.add_argument('--index', action='store_true', default=None,
+                        help='Met a jour l\'index de zones des mois ecrits (_zonemap/, voir lake_index.py)')
+    parser.add_argument('--metrics', nargs='?', const='-', metavar='FICHIER',
+                        help='Emet les mesures par phase en JSON (ligne METRICS sur stdout, ou FICHIER)')
+    parser.add_argument('--profile', type=str, metavar='FICHIER', help='Profil cProfile de l\'execution (.prof)')
+    parser.add_argument('--upload', type=str, metavar='DEST',
+                        help='Envoie ensuite le lake vers DEST (repertoire, http://... ou azure://conteneur, '
+                             'voir upload_lake.py)')
     args = parser.parse_args(argv)
 
-    if args.date:
+    with metrics.session('generate_ficp_daily', args.metrics, args.profile) as m:
+        m.exit_code = run(args)
+        if m.exit_code == 0 and args.upload:
+            m.exit_code = upload(args.upload)
+    return m.exit_code
+
+
+def upload(dest: str) -> int:
+    import upload_lake  # import tardif: upload_lake -> audit_lake -> kpi_lake importe ce module
+    summary = upload_lake.upload(DATA_ROOT, dest)
+    upload_lake.print_summary(summary, dest)
+    return 1 if summary['errors'] else 0
+
+
+def run(args) -> int:
+    if args.root:
+        set_data_root(args.root)
+
+    settings = {}
+    if args.config:
         try:
-            day = parse_date(args.date)
-        except ValueError:
-            print('Date invalide, format attendu YYYY-MM-DD')
+            with open(args.config, 'r', encoding='utf-8') as f:
+                settings = json.load(f)
+        except (OSError, ValueError) as ex:
+            print(f'Configuration illisible: {args.config} ({ex})')
             return 2
-    else:
-        day = datetime.today()
-        day = datetime(year=day.year, month=day.month, day=day.day)
+    for key in ('consultations', 'evenements', 'part_surdet', 'part_connus', 'engine', 'seed', 'format', 'registre',
+                'index'):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+    try:
+        configure(**settings)
+    except (TypeError, ValueError) as ex:
+        print(f'Configuration invalide: {ex}')
+        return 2
+
+    today = datetime.today()
+    today = datetime(year=today.year, month=today.month, day=today.day)
+
+    try:
+        day = parse_date(args.date) if args.date else None
+        start = parse_date(args.start) if args.start else None
+        end = parse_date(args.end) if args.end else None
+    except ValueError:
+        print('Date invalide, format attendu YYYY-MM-DD')
+        return 2
+
+    if start or end or args.days:
+        if day:
+            print('--date est incompatible avec --start/--end/--days')
+            return 2
+        if args.days is not None and args.days < 1:
+            print('--days doit etre >= 1')
+            return 2
+        if start is None:
+            end = end or today
+            start = end - timedelta(days=(args.days or 1) - 1)
+        elif end is None:
+            end = start + timedelta(days=args.days - 1) if args.days else today
+        elif args.days:
+            print('--days est incompatible avec --start et --end ensemble')
+            return 2
+        if args.workers < 1 or args.shards < 1:
+            print('--workers et --shards doivent etre >= 1')
+            return 2
+        if args.shards > 1 and ENGINE != 'python':
+            print('--shards requiert le moteur python')
+            return 2
+        return generate_range(start, end, overwrite=args.overwrite, use_state=not args.no_state,
+                              workers=args.workers, shards=args.shards)
+    if args.shards > 1:
+        print('--shards requiert une plage --start/--end/--days')
+        return 2
 
-    return generate_daily(day, overwrite=args.overwrite)
+    return generate_daily(day or today, overwrite=args.overwrite, use_state=not args.no_state)
 
 
 if __name__ == '__main__':
+    # les modules importés plus tard (sharding, upload_lake...) doivent voir ce module configuré
+    sys.modules.setdefault('generate_ficp_daily', sys.modules[__name__])
     raise SystemExit(main())
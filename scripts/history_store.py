@@ -0,0 +1,629 @@
+# -*- coding: utf-8 -*-
+"""
+Historique FICP compact en colonnes.
+
+Même contenu que la relecture du lake (surveillances, inscriptions, clients connus) mais
+sans objet par ligne:
+- cle_bdf triées et empaquetées en largeur fixe dans un seul bytearray; la recherche
+  d'une cle est dichotomique (pas de dict str -> id résident), en C par numpy s'il est
+  installé;
+- dates en ordinaux entiers (array 'i'), type_incident en codes (array 'B');
+- événements rangés par client (format CSR): les dates du client k sont
+  dates[start[k]:start[k + 1]], triées, ce qui donne le statut à une date par bisect.
+Le décodage des dates ISO passe par iso_ordinal (découpage direct, mémoïsé) au lieu
+de strptime.
+
+HistoryStore est figé (ficp_status.py le lit tel quel). Le générateur avance son
+historique dans un EventStore: un HistoryStore (base) plus les événements ajoutés depuis
+(delta), fusionnés dans une nouvelle base au-delà d'un seuil (compact, recopie par blocs
+des clients inchangés). La construction ne garde qu'un id entier par événement et range
+les événements par tri par comptage; son pic est l'ensemble des cle (une chaîne par
+client), libéré une fois les cle empaquetées.
+
+Usage:
+    python scripts/history_store.py [--root DIR] [--upto YYYY-MM-DD]
+"""
+
+import os
+import heapq
+import argparse
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from functools import lru_cache
+from itertools import accumulate, groupby
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:  # recherche des cle par bisect en Python sans numpy
+    np = None
+
+import lake_io
+
+STATUT_SURVEILLANCE = 'SURVEILLANCE'
+STATUT_INSCRIT = 'INSCRIT'
+NO_DATE = 0  # ordinal 0 n'existe pas: date absente
+# colonnes d'un store sauvegardé, dans l'ordre du fichier (write / read)
+COLUMNS = ('surv_start', 'surv_date', 'insc_start', 'insc_date', 'insc_type', 'insc_surv')
+# delta d'un EventStore fusionné au-delà de max(COMPACT_MIN, événements de la base / COMPACT_RATIO)
+COMPACT_MIN = 1 << 16
+COMPACT_RATIO = 32
+
+
+@lru_cache(maxsize=65536)
+def iso_ordinal(s: str) -> int:
+    """'YYYY-MM-DD' -> ordinal, sans strptime; ValueError si le format est invalide."""
+    if len(s) != 10 or s[4] != '-' or s[7] != '-' or not (s[:4] + s[5:7] + s[8:]).isdigit():
+        raise ValueError(f'date invalide: {s!r}')
+    return date(int(s[:4]), int(s[5:7]), int(s[8:])).toordinal()
+
+
+@lru_cache(maxsize=65536)
+def ordinal_iso(o: int) -> str:
+    return date.fromordinal(o).isoformat() if o else ''
+
+
+class PackedKeys:
+    """Séquence triée de cle en largeur fixe dans un bytearray (bisect-compatible).
+
+    data n'est plus modifié après la construction: la première recherche en prend une vue
+    numpy (searchsorted) qui le fige."""
+
+    def __init__(self, keys, width=None):
+        self.width = width or max(map(len, keys), default=0)
+        self.data = bytearray()
+        self._array = None
+        same = min(map(len, keys), default=self.width) == self.width  # cas courant: cle de 13 caractères
+        for i in range(0, len(keys), 4096):  # par tranches: pas de copie complète en octets
+            if same:
+                self.data += ''.join(keys[i:i + 4096]).encode('ascii')
+            else:
+                self.data += b''.join(k.encode('ascii').ljust(self.width, b'\0') for k in keys[i:i + 4096])
+
+    def __len__(self):
+        return len(self.data) // self.width if self.width else 0
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        w = self.width
+        return bytes(self.data[i * w:(i + 1) * w])
+
+    def __iter__(self):
+        w, data = self.width, self.data
+        for off in range(0, len(data) if w else 0, w or 1):
+            yield data[off:off + w].rstrip(b'\0').decode('ascii')
+
+    def key(self, i) -> str:
+        return self[i].rstrip(b'\0').decode('ascii')
+
+    def _bisect(self, k: bytes) -> int:
+        if np is None or len(k) != self.width:
+            return bisect_left(self, k)
+        if self._array is None:
+            self._array = np.frombuffer(self.data, dtype=f'S{self.width}')
+        return int(self._array.searchsorted(k))
+
+    def find(self, cle: str) -> int:
+        """Indice de cle, ou -1."""
+        if not self.width or len(cle) > self.width or not cle.isascii():
+            return -1  # une cle_bdf est ASCII: une saisie accentuée n'est pas dans le store
+        k = cle.encode('ascii').ljust(self.width, b'\0')
+        i = self._bisect(k)
+        return i if i < len(self) and self[i] == k else -1
+
+    def rank(self, cle: str) -> int:
+        """Nombre de cle inférieures à cle."""
+        k = cle.encode('ascii')
+        return self._bisect(k.ljust(self.width, b'\0') if len(k) <= self.width else k)
+
+    def close(self):
+        pass  # même interface que MappedKeys (key_registry.py)
+
+
+class HistoryStore:
+    """Historique compact: voir la docstring du module pour le format."""
+
+    def __init__(self):
+        self.keys = PackedKeys([])
+        self.types = []                 # code -> type_incident
+        self.surv_start = array('I', [0])
+        self.surv_date = array('i')
+        self.insc_start = array('I', [0])
+        self.insc_date = array('i')
+        self.insc_type = array('B')
+        self.insc_surv = array('i')
+
+    # -- construction -----------------------------------------------------------------
+
+    @classmethod
+    def from_lake(cls, root: str, upto_ordinal: int):
+        """Charge inscription/ et consultation/ pour les jours < upto_ordinal (fichiers
+        quotidiens et partitions mensuelles)."""
+        builder = _Builder()
+        builder.add_lake(root, upto_ordinal)
+        return builder.build(cls())
+
+    @classmethod
+    def read(cls, f, layout: dict):
+        """Store écrit par write dans le fichier binaire f (layout: voir layout).
+        EOFError si le fichier est tronqué."""
+        store = cls()
+        n = layout['clients']
+        store.keys = PackedKeys([], layout['width'])
+        store.keys.data = bytearray(f.read(layout['width'] * n))
+        if len(store.keys) != n:
+            raise EOFError('cle tronquées')
+        store.types = list(layout['types'])
+        counts = (n + 1, layout['surveillances'], n + 1) + (layout['inscriptions'],) * 3
+        for name, count in zip(COLUMNS, counts):
+            col = array(getattr(store, name).typecode)
+            col.fromfile(f, count)
+            setattr(store, name, col)
+        return store
+
+    def write(self, f):
+        """Ecrit cle et colonnes telles quelles dans le fichier binaire f (relu par read)."""
+        f.write(self.keys.data)
+        for name in COLUMNS:
+            getattr(self, name).tofile(f)
+
+    def layout(self) -> dict:
+        """Disposition du fichier écrit par write (à conserver pour read)."""
+        return {'width': self.keys.width, 'clients': len(self), 'surveillances': len(self.surv_date),
+                'inscriptions': len(self.insc_date), 'types': self.types}
+
+    # -- lecture ----------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, cle):
+        return self.keys.find(cle) >= 0
+
+    def surveillances(self, cle: str):
+        k = self.keys.find(cle)
+        return [] if k < 0 else list(self.surv_date[self.surv_start[k]:self.surv_start[k + 1]])
+
+    def inscriptions(self, cle: str):
+        """[(insc_ordinal, type_incident, surv_ordinal ou 0)] triées par date."""
+        k = self.keys.find(cle)
+        if k < 0:
+            return []
+        a, b = self.insc_start[k], self.insc_start[k + 1]
+        return [(self.insc_date[i], self.types[self.insc_type[i]], self.insc_surv[i]) for i in range(a, b)]
+
+    def status(self, cle: str, day_ordinal: int):
+        """Statut à une date: (statut, date_surveillance, date_inscription), comme les
+        consultations du générateur."""
+        k = self.keys.find(cle)
+        if k >= 0:
+            a, b = self.insc_start[k], self.insc_start[k + 1]
+            if a < b:
+                i = bisect_right(self.insc_date, day_ordinal, a, b)
+                if i > a:
+                    return STATUT_INSCRIT, ordinal_iso(self.insc_surv[i - 1]), ordinal_iso(self.insc_date[i - 1])
+            a, b = self.surv_start[k], self.surv_start[k + 1]
+            if a < b:
+                i = bisect_right(self.surv_date, day_ordinal, a, b)
+                if i > a:
+                    return STATUT_SURVEILLANCE, ordinal_iso(self.surv_date[i - 1]), ''
+        return 'NON_INSCRIT', '', ''
+
+    def status_batch(self, pairs):
+        """Statuts pour une liste de (cle, ordinal), dans l'ordre des paires."""
+        return [self.status(cle, o) for cle, o in pairs]
+
+    def events(self) -> int:
+        return len(self.surv_date) + len(self.insc_date)
+
+    def nbytes(self) -> int:
+        cols = (self.surv_start, self.surv_date, self.insc_start, self.insc_date, self.insc_type, self.insc_surv)
+        return len(self.keys.data) + sum(c.itemsize * len(c) for c in cols)
+
+    # -- découpage ----------------------------------------------------------------------
+
+    def take(self, clients):
+        """Store restreint aux clients d'indices clients (croissants)."""
+        out = HistoryStore()
+        w = self.keys.width
+        out.keys = PackedKeys([], w)
+        out.keys.data = bytearray(b''.join([self.keys.data[k * w:(k + 1) * w] for k in clients]))
+        out.types = list(self.types)
+        for k in clients:
+            a, b = self.surv_start[k], self.surv_start[k + 1]
+            out.surv_date.extend(self.surv_date[a:b])
+            out.surv_start.append(len(out.surv_date))
+            a, b = self.insc_start[k], self.insc_start[k + 1]
+            out.insc_date.extend(self.insc_date[a:b])
+            out.insc_type.extend(self.insc_type[a:b])
+            out.insc_surv.extend(self.insc_surv[a:b])
+            out.insc_start.append(len(out.insc_date))
+        return out
+
+    def split(self, n: int, part_of):
+        """Répartit les clients entre n stores selon part_of(cle), dans 0..n-1."""
+        clients = [[] for _ in range(n)]
+        for k in range(len(self)):
+            clients[part_of(self.keys.key(k))].append(k)
+        return [self.take(lst) for lst in clients]
+
+
+def merge_stores(stores):
+    """Réunit des HistoryStore; une cle présente dans plusieurs stores garde tous ses
+    événements, rangés par date (à date égale, dans l'ordre des stores)."""
+    out = HistoryStore()
+    width = max((s.keys.width for s in stores), default=0)
+    codes = {}
+    remap = [[codes.setdefault(t, len(codes)) for t in s.types] for s in stores]
+    out.types = list(codes)
+    keys = bytearray()
+
+    def clients(si, s):
+        for k in range(len(s)):
+            yield s.keys[k].rstrip(b'\0'), si, k
+
+    for key, group in groupby(heapq.merge(*(clients(si, s) for si, s in enumerate(stores))), key=itemgetter(0)):
+        keys += key.ljust(width, b'\0')
+        survs, inscs = [], []
+        for _, si, k in group:
+            s, codes_of = stores[si], remap[si]
+            survs.extend(s.surv_date[s.surv_start[k]:s.surv_start[k + 1]])
+            inscs.extend((s.insc_date[i], codes_of[s.insc_type[i]], s.insc_surv[i])
+                         for i in range(s.insc_start[k], s.insc_start[k + 1]))
+        out.surv_date.extend(sorted(survs))
+        out.surv_start.append(len(out.surv_date))
+        _append_inscriptions(out, inscs)
+    out.keys = PackedKeys([], width)
+    out.keys.data = keys
+    return out
+
+
+def _append_inscriptions(out, inscs):
+    """Ajoute les (date, code, surv) d'un client à out, par date (tri stable)."""
+    for d, t, sv in sorted(inscs, key=itemgetter(0)):
+        out.insc_date.append(d)
+        out.insc_type.append(t)
+        out.insc_surv.append(sv)
+    out.insc_start.append(len(out.insc_date))
+
+
+def _merge_delta(base: HistoryStore, delta: HistoryStore) -> HistoryStore:
+    """merge_stores([base, delta]) pour un delta petit devant la base: les clients de la
+    base sans événement dans le delta sont recopiés par blocs (cle, colonnes, offsets
+    décalés), comme la fusion de keys.bin dans key_registry.py."""
+    w = base.keys.width
+    if len(base) and delta.keys.width != w:
+        return merge_stores([base, delta])
+    w = w or delta.keys.width
+    out = HistoryStore()
+    codes = {t: c for c, t in enumerate(base.types)}
+    remap = [codes.setdefault(t, len(codes)) for t in delta.types]
+    out.types = list(codes)
+    keys = bytearray()
+
+    def copy_block(start, end):
+        """Clients start..end-1 de la base, tels quels."""
+        keys.extend(base.keys.data[start * w:end * w])
+        for in_start, out_start, pairs in (
+                (base.surv_start, out.surv_start, ((base.surv_date, out.surv_date),)),
+                (base.insc_start, out.insc_start, ((base.insc_date, out.insc_date), (base.insc_type, out.insc_type),
+                                                   (base.insc_surv, out.insc_surv)))):
+            a, b = in_start[start], in_start[end]
+            shift = len(pairs[0][1]) - a
+            for col_in, col_out in pairs:
+                col_out.extend(col_in[a:b])
+            out_start.extend(array('I', [x + shift for x in in_start[start + 1:end + 1]]))
+
+    prev = 0
+    for j in range(len(delta)):
+        key = delta.keys[j]
+        r = bisect_left(base.keys, key)
+        found = r < len(base) and base.keys[r] == key
+        copy_block(prev, r)
+        keys.extend(key)
+        survs = list(delta.surv_date[delta.surv_start[j]:delta.surv_start[j + 1]])
+        inscs = [(delta.insc_date[i], remap[delta.insc_type[i]], delta.insc_surv[i])
+                 for i in range(delta.insc_start[j], delta.insc_start[j + 1])]
+        if found:
+            survs = sorted(base.surv_date[base.surv_start[r]:base.surv_start[r + 1]].tolist() + survs)
+            inscs = [(base.insc_date[i], base.insc_type[i], base.insc_surv[i])
+                     for i in range(base.insc_start[r], base.insc_start[r + 1])] + inscs
+        out.surv_date.extend(survs)
+        out.surv_start.append(len(out.surv_date))
+        _append_inscriptions(out, inscs)
+        prev = r + 1 if found else r
+    copy_block(prev, len(base))
+    out.keys = PackedKeys([], w)
+    out.keys.data = keys
+    return out
+
+
+class EventStore:
+    """Historique modifiable du générateur: HistoryStore (base) + événements ajoutés (delta).
+
+    Les lectures réunissent base et delta; à date égale, un événement du delta est arrivé
+    après ceux de la base, comme à la relecture des fichiers dans l'ordre des dates."""
+
+    def __init__(self, base: HistoryStore = None):
+        self.base = HistoryStore() if base is None else base
+        self.surv = {}      # cle -> [ordinal] ajoutées depuis la base, triées
+        self.insc = {}      # cle -> [(ordinal, type_incident, surv_ordinal ou 0)] triées par date
+        self.pending = 0    # événements du delta
+        self.saved = False  # base déjà écrite dans l'état sauvegardé (generate_ficp_daily.py)
+
+    @classmethod
+    def from_lake(cls, root: str, upto_ordinal: int):
+        """Relecture de inscription/ et consultation/ pour les jours < upto_ordinal.
+        Retourne (EventStore des clients à événements, PackedKeys de tous les clients connus)."""
+        builder = _Builder()
+        builder.add_lake(root, upto_ordinal)
+        base = builder.build(HistoryStore(), with_known=False)
+        return cls(base), builder.known_keys
+
+    # -- mise à jour ------------------------------------------------------------------
+
+    def add_surveillance(self, cle: str, o: int):
+        insort(self.surv.setdefault(cle, []), o)
+        self.pending += 1
+
+    def add_inscription(self, cle: str, o: int, type_inc: str, surv_o: int = NO_DATE):
+        """Ajoute une inscription (à date égale, après celles déjà connues)."""
+        insort(self.insc.setdefault(cle, []), (o, type_inc, surv_o), key=itemgetter(0))
+        self.pending += 1
+
+    def needs_compact(self) -> bool:
+        return self.pending > max(COMPACT_MIN, self.base.events() // COMPACT_RATIO)
+
+    def compact(self):
+        """Fusionne le delta dans une nouvelle base."""
+        if not self.pending:
+            return
+        builder = _Builder()
+        for cle, lst in self.surv.items():
+            for o in lst:
+                builder.add_surveillance(cle, o)
+        for cle, lst in self.insc.items():
+            for o, type_inc, surv_o in lst:
+                builder.add_inscription(cle, o, type_inc, surv_o)
+        self.base = _merge_delta(self.base, builder.build(HistoryStore()))
+        self.surv, self.insc, self.pending = {}, {}, 0
+        self.saved = False
+
+    def split(self, n: int, part_of):
+        """n EventStore selon part_of(cle), dans 0..n-1 (shards); le delta est fusionné avant."""
+        self.compact()
+        return [EventStore(part) for part in self.base.split(n, part_of)]
+
+    @classmethod
+    def merge(cls, parts):
+        """Inverse de split."""
+        for part in parts:
+            part.compact()
+        return cls(merge_stores([part.base for part in parts]))
+
+    # -- lecture ----------------------------------------------------------------------
+
+    def __len__(self):
+        """Nombre de clients à événements."""
+        return len(self.base) + sum(1 for cle in self.surv.keys() | self.insc.keys() if cle not in self.base)
+
+    def keys(self):
+        """cle des clients à événements, dans l'ordre."""
+        extra = sorted(cle for cle in self.surv.keys() | self.insc.keys() if cle not in self.base)
+        return heapq.merge(self.base.keys, extra)
+
+    def __eq__(self, other):
+        if not isinstance(other, EventStore):
+            return NotImplemented
+        keys = list(self.keys())
+        return keys == list(other.keys()) and all(
+            self.surveillances(cle) == other.surveillances(cle) and self.inscriptions(cle) == other.inscriptions(cle)
+            for cle in keys)
+
+    def surveillances(self, cle: str):
+        """Ordinaux des surveillances de cle, triés."""
+        return list(heapq.merge(self.base.surveillances(cle), self.surv.get(cle, ())))
+
+    def inscriptions(self, cle: str):
+        """[(insc_ordinal, type_incident, surv_ordinal ou 0)] triées par date."""
+        return list(heapq.merge(self.base.inscriptions(cle), self.insc.get(cle, ()), key=itemgetter(0)))
+
+    def last_surveillance(self, cle: str) -> int:
+        """Dernière surveillance de cle (ordinal), NO_DATE sans surveillance."""
+        base = self.base
+        k = base.keys.find(cle)
+        last = NO_DATE
+        if k >= 0 and base.surv_start[k + 1] > base.surv_start[k]:
+            last = base.surv_date[base.surv_start[k + 1] - 1]
+        delta = self.surv.get(cle)
+        return max(last, delta[-1]) if delta else last
+
+    def first_inscription(self, cle: str) -> int:
+        """Première inscription de cle (ordinal), NO_DATE sans inscription."""
+        base = self.base
+        k = base.keys.find(cle)
+        first = NO_DATE
+        if k >= 0 and base.insc_start[k + 1] > base.insc_start[k]:
+            first = base.insc_date[base.insc_start[k]]
+        delta = self.insc.get(cle)
+        return delta[0][0] if delta and (not first or delta[0][0] < first) else first
+
+    def status(self, cle: str, day_ordinal: int):
+        """HistoryStore.status sur base et delta réunis."""
+        base = self.base
+        k = base.keys.find(cle)
+        insc = surv = None  # plus récentes <= day_ordinal: (date, date de surveillance) / date
+        if k >= 0:
+            a, b = base.insc_start[k], base.insc_start[k + 1]
+            i = bisect_right(base.insc_date, day_ordinal, a, b)
+            if i > a:
+                insc = base.insc_date[i - 1], base.insc_surv[i - 1]
+            a, b = base.surv_start[k], base.surv_start[k + 1]
+            i = bisect_right(base.surv_date, day_ordinal, a, b)
+            if i > a:
+                surv = base.surv_date[i - 1]
+        delta = self.insc.get(cle)
+        if delta:
+            i = bisect_right(delta, day_ordinal, key=itemgetter(0))
+            if i and (insc is None or delta[i - 1][0] >= insc[0]):
+                insc = delta[i - 1][0], delta[i - 1][2]
+        if insc is not None:
+            return STATUT_INSCRIT, ordinal_iso(insc[1]), ordinal_iso(insc[0])
+        delta = self.surv.get(cle)
+        if delta:
+            i = bisect_right(delta, day_ordinal)
+            if i and (surv is None or delta[i - 1] > surv):
+                surv = delta[i - 1]
+        if surv is not None:
+            return STATUT_SURVEILLANCE, ordinal_iso(surv), ''
+        return 'NON_INSCRIT', '', ''
+
+    def status_batch(self, pairs):
+        """Statuts pour une liste de (cle, ordinal), dans l'ordre des paires."""
+        return [self.status(cle, o) for cle, o in pairs]
+
+    def last_surveillances(self, since: int):
+        """(cle, dernière surveillance) des clients dont la dernière surveillance est >= since."""
+        base, delta = self.base, self.surv
+        start, dates = base.surv_start, base.surv_date
+        for k in range(len(base)):
+            b = start[k + 1]
+            if b > start[k] and dates[b - 1] >= since:
+                cle = base.keys.key(k)
+                if cle not in delta:
+                    yield cle, dates[b - 1]
+        for cle in delta:
+            last = self.last_surveillance(cle)
+            if last >= since:
+                yield cle, last
+
+    def inscriptions_since(self, since: int):
+        """(cle, ordinal, type_incident) des inscriptions datées >= since."""
+        base = self.base
+        start, dates, types = base.insc_start, base.insc_date, base.insc_type
+        for k in range(len(base)):
+            a, b = start[k], start[k + 1]
+            if b > a and dates[b - 1] >= since:
+                cle = base.keys.key(k)
+                for i in range(bisect_left(dates, since, a, b), b):
+                    yield cle, dates[i], base.types[types[i]]
+        for cle, lst in self.insc.items():
+            for o, type_inc, _ in lst[bisect_left(lst, since, key=itemgetter(0)):]:
+                yield cle, o, type_inc
+
+
+class _Builder:
+    """Accumule les lignes en colonnes (array) puis les range par client.
+
+    Les événements ne gardent qu'un id entier de leur cle (dict cle -> id des seuls clients
+    à événements), leur date et leur type, sans objet par ligne. Le rangement par client
+    est un tri par comptage (offsets CSR calculés directement) après un tri stable par
+    date: (client, date, ordre d'arrivée) sans tri par client."""
+
+    def __init__(self):
+        self.known = set()
+        self.known_keys = None
+        self.ids = {}
+        self.type_codes = {}
+        self.s_id, self.s_date = array('I'), array('i')
+        self.i_id, self.i_date, self.i_type, self.i_surv = array('I'), array('i'), array('B'), array('i')
+
+    def key_id(self, cle) -> int:
+        ids = self.ids
+        return ids.setdefault(cle, len(ids))
+
+    def add_surveillance(self, cle, d_ord):
+        self.s_id.append(self.key_id(cle))
+        self.s_date.append(d_ord)
+
+    def add_inscription(self, cle, d_ord, type_inc, surv_ord):
+        code = self.type_codes.get(type_inc)
+        if code is None:
+            code = self.type_codes[type_inc] = len(self.type_codes)
+        self.i_id.append(self.key_id(cle))
+        self.i_date.append(d_ord)
+        self.i_type.append(code)
+        self.i_surv.append(surv_ord)
+
+    def add_inscription_rows(self, rows):
+        for cle, statut, type_inc, d_surv, d_insc in rows:
+            if statut == STATUT_SURVEILLANCE and d_surv:
+                self.add_surveillance(cle, iso_ordinal(d_surv))
+            elif statut == STATUT_INSCRIT and d_insc:
+                self.add_inscription(cle, iso_ordinal(d_insc), type_inc, iso_ordinal(d_surv) if d_surv else NO_DATE)
+            else:
+                self.known.add(cle)
+
+    def add_consultation_rows(self, rows):
+        self.known.update(map(itemgetter(0), rows))
+
+    def add_lake(self, root: str, upto_ordinal: int):
+        """inscription/ et consultation/ de root pour les jours < upto_ordinal (fichiers
+        quotidiens et partitions mensuelles)."""
+        before = ordinal_iso(upto_ordinal)
+        for _path, rows in lake_io.iter_area(os.path.join(root, 'inscription'), before):
+            self.add_inscription_rows(rows)
+        for _path, rows in lake_io.iter_area(os.path.join(root, 'consultation'), before):
+            self.add_consultation_rows(rows)
+
+    def build(self, store, with_known=True):
+        """Range les événements dans store. with_known=False: store n'indexe que les clients
+        à événements et les cle de tous les clients connus vont dans self.known_keys."""
+        self.known.update(self.ids)
+        keys = sorted(self.known)
+        self.known = None
+        if not with_known:
+            self.known_keys = PackedKeys(keys)
+            keys = sorted(self.ids)
+        rank = array('I', bytes(4 * len(self.ids)))  # id -> rang de la cle triée
+        for cle, i in self.ids.items():
+            rank[i] = bisect_left(keys, cle)
+        self.ids = None
+        store.keys = PackedKeys(keys)
+        store.types = [t for t, _ in sorted(self.type_codes.items(), key=lambda kv: kv[1])]
+        n = len(keys)
+        del keys
+
+        store.surv_start, (store.surv_date,) = _by_client(rank, n, self.s_id, self.s_date)
+        self.s_id = self.s_date = None
+        store.insc_start, (store.insc_date, store.insc_type, store.insc_surv) = \
+            _by_client(rank, n, self.i_id, self.i_date, self.i_type, self.i_surv)
+        self.i_id = self.i_date = self.i_type = self.i_surv = None
+        return store
+
+
+def _by_client(rank, n, ids, dates, *cols):
+    """Range des événements (colonnes parallèles à ids) par client puis par date, l'ordre
+    d'arrivée départageant les dates égales. Retourne (offsets CSR, [dates, *cols] rangées)."""
+    counts = array('I', bytes(4 * (n + 1)))
+    for i in ids:
+        counts[rank[i] + 1] += 1
+    offsets = array('I', accumulate(counts))
+    slot = offsets[:-1]
+    order = array('I', bytes(4 * len(ids)))
+    for e in sorted(range(len(ids)), key=dates.__getitem__):  # tri stable par date
+        r = rank[ids[e]]
+        order[slot[r]] = e
+        slot[r] += 1
+    return offsets, [array(col.typecode, [col[e] for e in order]) for col in (dates,) + cols]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, default=os.path.join(os.path.dirname(__file__), '..', 'ficp_data_lake'))
+    parser.add_argument('--upto', type=str, help='Jour exclu YYYY-MM-DD (defaut: tout le lake)')
+    args = parser.parse_args(argv)
+
+    upto = iso_ordinal(args.upto) if args.upto else date.max.toordinal()
+    store = HistoryStore.from_lake(args.root, upto)
+    print(f'clients: {len(store)}')
+    print(f'surveillances: {len(store.surv_date)}')
+    print(f'inscriptions: {len(store.insc_date)}')
+    print(f'octets: {store.nbytes()}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
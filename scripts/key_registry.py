@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+Registre persistant des cle_bdf connues du lake (clients vus dans inscription/ ou consultation/).
+
+Remplace l'ensemble known_clients du générateur quand l'historique vient de l'état
+sauvegardé: ni relecture du lake, ni copie complète des cle en mémoire. Fichiers, dans
+_state/ du lake:
+- keys.bin: cle triées en largeur fixe (complétées par des \\0, comme PackedKeys de
+  history_store), projetées en mémoire (mmap): recherche dichotomique et accès par rang
+  sans chargement;
+- keys.delta: cle ajoutées depuis la dernière fusion, triées, avec leur rang dans keys.bin
+  ("cle,rang" par ligne). Au-delà de max(MERGE_MIN, base / MERGE_RATIO) cle, elles sont
+  fusionnées dans keys.bin par copie de blocs (keys.bin n'est jamais re-trié);
+- keys.bloom: filtre de Bloom de toutes les cle (double hachage blake2b, ~1 % de faux
+  positifs à capacité, reconstruit au double de l'effectif au-delà): une cle absente du
+  filtre est nouvelle sans lecture de keys.bin, ce qui est le cas de presque tous les
+  candidats de new_key;
+- keys.json: version, jour couvert (upto: cle des fichiers < upto), largeur, effectifs et
+  paramètres du filtre. Ecrit en dernier, il valide l'ensemble: des fichiers incohérents
+  avec lui (arrêt en cours d'écriture) rendent le registre invalide et le générateur le
+  reconstruit depuis le lake.
+
+KeyRegistry se comporte comme la liste triée des cle (len, [i], itération dans l'ordre) et
+comme un ensemble (in, add, update): random.choice(registre) tire la même cle que
+random.choice(sorted(known)), la sortie du générateur est inchangée.
+
+Sans état valide (relecture complète, --no-state), le générateur prend un registre en
+mémoire (in_memory): base PackedKeys (history_store.py) au lieu de keys.bin, sans filtre
+de Bloom, delta fusionné dans la base dès MEMORY_MERGE cle; il n'est écrit dans _state/
+que par create.
+
+Usage:
+    python scripts/key_registry.py [--root DIR] [--check]
+"""
+
+import os
+import math
+import mmap
+import json
+import heapq
+import hashlib
+import argparse
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:  # construction du filtre en lot plus lente sans numpy
+    np = None
+
+import metrics
+from history_store import PackedKeys
+
+REGISTRY_VERSION = 1
+BIN_NAME, DELTA_NAME, BLOOM_NAME, META_NAME = 'keys.bin', 'keys.delta', 'keys.bloom', 'keys.json'
+MERGE_MIN = 1 << 16
+MERGE_RATIO = 32
+MEMORY_MERGE = 4096
+BLOOM_FP = 0.01
+BLOOM_MIN_CAPACITY = 1 << 16
+MASK64 = (1 << 64) - 1
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    metrics.count('files_written')
+    metrics.count('bytes_written', len(data))
+
+
+class BloomFilter:
+    """Filtre de Bloom sur nbits bits (bytearray), nhashes positions par cle."""
+
+    def __init__(self, nbits: int, nhashes: int, bits=None):
+        self.nbits = nbits
+        self.nhashes = nhashes
+        self.bits = bytearray(nbits // 8) if bits is None else bits
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp: float = BLOOM_FP):
+        capacity = max(capacity, 1)
+        nbits = math.ceil(-capacity * math.log(fp) / math.log(2) ** 2 / 8) * 8
+        return cls(nbits, max(1, round(nbits / capacity * math.log(2))))
+
+    def capacity(self, fp: float = BLOOM_FP) -> int:
+        return int(-self.nbits * math.log(2) ** 2 / math.log(fp))
+
+    def _positions(self, cle: str):
+        h = hashlib.blake2b(cle.encode('ascii'), digest_size=16).digest()
+        h1 = int.from_bytes(h[:8], 'little')
+        h2 = int.from_bytes(h[8:], 'little') | 1
+        m = self.nbits
+        return [((h1 + j * h2) & MASK64) % m for j in range(self.nhashes)]
+
+    def add(self, cle: str):
+        bits = self.bits
+        for p in self._positions(cle):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, cle: str) -> bool:
+        bits = self.bits
+        for p in self._positions(cle):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def add_many(self, keys):
+        """add pour un lot de cle; mêmes positions, calculées par tableaux si numpy est là."""
+        if np is None:
+            for cle in keys:
+                self.add(cle)
+            return
+        batch = []
+        for cle in keys:
+            batch.append(hashlib.blake2b(cle.encode('ascii'), digest_size=16).digest())
+            if len(batch) == 1 << 18:
+                self._set_digests(batch)
+                batch = []
+        if batch:
+            self._set_digests(batch)
+
+    def _set_digests(self, digests):
+        h = np.frombuffer(b''.join(digests), dtype='<u8').reshape(-1, 2)
+        h1, h2 = h[:, 0].copy(), h[:, 1] | np.uint64(1)
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        for _ in range(self.nhashes):
+            p = h1 % np.uint64(self.nbits)  # h1 + j * h2 modulo 2**64, comme _positions
+            np.bitwise_or.at(bits, (p >> np.uint64(3)).astype(np.intp), (np.uint8(1) << (p & np.uint64(7)).astype(np.uint8)))
+            h1 += h2
+
+
+class MappedKeys:
+    """cle triées en largeur fixe lues dans un fichier projeté (même interface que PackedKeys)."""
+
+    def __init__(self, path: str, width: int, count: int):
+        self.width = width
+        self.count = count
+        self.file = self.data = None
+        if count:
+            self.file = open(path, 'rb')
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.file.close()
+            self.file = self.data = None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        w = self.width
+        return self.data[i * w:(i + 1) * w]
+
+    def key(self, i) -> str:
+        return self[i].rstrip(b'\0').decode('ascii')
+
+    def probe(self, cle: str) -> bytes:
+        k = cle.encode('ascii')
+        return k.ljust(self.width, b'\0') if len(k) <= self.width else k
+
+    def rank(self, cle: str) -> int:
+        """Nombre de cle de la base inférieures à cle."""
+        return bisect_left(self, self.probe(cle)) if self.count else 0
+
+    def find(self, cle: str) -> int:
+        if not self.count or len(cle) > self.width:
+            return -1
+        k = self.probe(cle)
+        i = bisect_left(self, k)
+        return i if i < self.count and self[i] == k else -1
+
+    def __iter__(self):
+        w = self.width
+        step = w * 65536
+        for off in range(0, self.count * w, step):
+            chunk = self.data[off:off + step]
+            for j in range(0, len(chunk), w):
+                yield chunk[j:j + w].rstrip(b'\0').decode('ascii')
+
+
+class KeyRegistry:
+    """Ensemble trié des cle connues: base projetée + delta en mémoire + filtre de Bloom."""
+
+    def __init__(self, folder: str, meta: dict, delta=(), bloom: BloomFilter = None, base=None):
+        self.folder = folder                        # None: registre en mémoire (in_memory)
+        self.upto = meta['upto']
+        self.base = base if base is not None else MappedKeys(os.path.join(folder, BIN_NAME), meta['width'],
+                                                             meta['base'])
+        self.delta = [cle for cle, _ in delta]      # cle ajoutées depuis la fusion, triées
+        self.delta_rank = [r for _, r in delta]     # leur rang dans la base
+        self.delta_set = set(self.delta)
+        self.bloom = bloom
+        self._merged = None                         # rang global de chaque cle du delta
+        self._bloom_dirty = False
+
+    # -- création / ouverture ------------------------------------------------------------
+
+    @classmethod
+    def create(cls, folder: str, keys, upto: str):
+        """Ecrit un registre neuf à partir de cle triées sans doublon (reconstruction)."""
+        keys = list(keys)
+        os.makedirs(folder, exist_ok=True)
+        width = max((len(k) for k in keys), default=13)
+        _write_atomic(os.path.join(folder, BIN_NAME), b''.join(k.encode('ascii').ljust(width, b'\0') for k in keys))
+        bloom = BloomFilter.for_capacity(max(2 * len(keys), BLOOM_MIN_CAPACITY))
+        bloom.add_many(keys)
+        registry = cls(folder, {'upto': upto, 'width': width, 'base': len(keys)}, bloom=bloom)
+        registry._bloom_dirty = True
+        registry.save(upto)
+        return registry
+
+    @classmethod
+    def in_memory(cls, keys: PackedKeys):
+        """Registre non sauvegardé sur des cle triées en mémoire (relecture du lake)."""
+        return cls(None, {'upto': None, 'width': keys.width, 'base': len(keys)}, base=keys)
+
+    @classmethod
+    def open(cls, folder: str):
+        """Registre sauvegardé dans folder, ou None s'il est absent ou incohérent."""
+        try:
+            with open(os.path.join(folder, META_NAME), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != REGISTRY_VERSION:
+                return None
+            if os.path.getsize(os.path.join(folder, BIN_NAME)) != meta['width'] * meta['base']:
+                return None
+            with open(os.path.join(folder, DELTA_NAME), 'r', encoding='ascii') as f:
+                delta = [(cle, int(r)) for cle, r in (line.rstrip('\n').split(',') for line in f)]
+            with open(os.path.join(folder, BLOOM_NAME), 'rb') as f:
+                bits = bytearray(f.read())
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(delta) != meta['delta'] or len(bits) * 8 != meta['bloom_bits']:
+            return None
+        metrics.count('files_read', 3)
+        metrics.count('bytes_read', len(bits))
+        return cls(folder, meta, delta, BloomFilter(meta['bloom_bits'], meta['bloom_hashes'], bits))
+
+    def close(self):
+        self.base.close()
+
+    # -- lecture ---------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.base) + len(self.delta)
+
+    def __contains__(self, cle) -> bool:
+        if cle in self.delta_set:
+            return True
+        if self.bloom is not None and cle not in self.bloom:
+            return False
+        return self.base.find(cle) >= 0
+
+    def __getitem__(self, i) -> str:
+        """i-ème cle dans l'ordre trié (base et delta confondus)."""
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        if self._merged is None:
+            self._merged = [r + m for m, r in enumerate(self.delta_rank)]
+        m = bisect_left(self._merged, i)
+        if m < len(self._merged) and self._merged[m] == i:
+            return self.delta[m]
+        return self.base.key(i - m)
+
+    def __iter__(self):
+        return heapq.merge(self.base, self.delta)
+
+    # -- mise à jour -----------------------------------------------------------------------
+
+    def add(self, cle: str):
+        if cle in self:
+            return
+        p = bisect_left(self.delta, cle)
+        self.delta.insert(p, cle)
+        self.delta_rank.insert(p, self.base.rank(cle))
+        self.delta_set.add(cle)
+        self._merged = None
+        if self.bloom is None:
+            if len(self.delta) > MEMORY_MERGE:
+                self._merge_memory()
+            return
+        self.bloom.add(cle)
+        self._bloom_dirty = True
+
+    def update(self, keys):
+        for cle in keys:
+            self.add(cle)
+
+    def save(self, upto: str):
+        """Persiste le registre couvrant les fichiers < upto; fusionne le delta et agrandit
+        le filtre si besoin."""
+        if len(self.delta) > max(MERGE_MIN, len(self.base) // MERGE_RATIO):
+            self._merge()
+        if len(self) > self.bloom.capacity():
+            self.bloom = BloomFilter.for_capacity(2 * len(self))
+            self.bloom.add_many(iter(self))
+            self._bloom_dirty = True
+        _write_atomic(os.path.join(self.folder, DELTA_NAME),
+                      ''.join(f'{cle},{r}\n' for cle, r in zip(self.delta, self.delta_rank)).encode('ascii'))
+        if self._bloom_dirty:
+            _write_atomic(os.path.join(self.folder, BLOOM_NAME), bytes(self.bloom.bits))
+            self._bloom_dirty = False
+        self.upto = upto
+        meta = {'version': REGISTRY_VERSION, 'upto': upto, 'width': self.base.width, 'base': len(self.base),
+                'delta': len(self.delta), 'bloom_bits': self.bloom.nbits, 'bloom_hashes': self.bloom.nhashes}
+        _write_atomic(os.path.join(self.folder, META_NAME), json.dumps(meta).encode('utf-8'))
+
+    def _merge(self):
+        """Réécrit keys.bin avec le delta inséré à son rang (copie par blocs de la base)."""
+        base = self.base
+        width = max([base.width] + [len(cle) for cle in self.delta])
+        path = os.path.join(self.folder, BIN_NAME)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            for chunk in self._merged_chunks(width):
+                f.write(chunk)
+        count = len(self)
+        base.close()
+        os.replace(tmp, path)
+        metrics.count('files_written')
+        metrics.count('bytes_written', count * width)
+        self.base = MappedKeys(path, width, count)
+        self.delta, self.delta_rank, self.delta_set = [], [], set()
+        self._merged = None
+
+    def _merge_memory(self):
+        """_merge d'un registre en mémoire: nouvelle base PackedKeys."""
+        width = max([self.base.width] + [len(cle) for cle in self.delta])
+        base = PackedKeys([], width)
+        base.data = bytearray(b''.join(self._merged_chunks(width)))
+        self.base = base
+        self.delta, self.delta_rank, self.delta_set = [], [], set()
+        self._merged = None
+
+    def _merged_chunks(self, width: int):
+        """Base et delta réunis en largeur width, par blocs de la base et cle du delta."""
+        prev = 0
+        for cle, r in zip(self.delta, self.delta_rank):
+            if r > prev:
+                yield self._base_bytes(prev, r, width)
+            yield cle.encode('ascii').ljust(width, b'\0')
+            prev = r
+        if len(self.base) > prev:
+            yield self._base_bytes(prev, len(self.base), width)
+
+    def _base_bytes(self, start: int, end: int, width: int) -> bytes:
+        w = self.base.width
+        raw = self.base.data[start * w:end * w]
+        if width == w:
+            return raw
+        return b''.join(raw[j:j + w].ljust(width, b'\0') for j in range(0, len(raw), w))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, default=os.path.join(os.path.dirname(__file__), '..', 'ficp_data_lake'))
+    parser.add_argument('--check', action='store_true', help='Verifie l\'ordre des cle et le filtre de Bloom')
+    args = parser.parse_args(argv)
+
+    folder = os.path.join(args.root, '_state')
+    registry = KeyRegistry.open(folder)
+    if registry is None:
+        print(f'Pas de registre de cle valide dans {folder}')
+        return 1
+    print(f'cle: {len(registry)} (base {len(registry.base)}, delta {len(registry.delta)}), upto {registry.upto}')
+    print(f'filtre de Bloom: {registry.bloom.nbits // 8} octets, {registry.bloom.nhashes} hachages, '
+          f'capacite {registry.bloom.capacity()}')
+    if args.check:
+        prev = None
+        for cle in registry:
+            if (prev is not None and cle <= prev) or cle not in registry.bloom:
+                print(f'Registre invalide a la cle {cle}')
+                return 1
+            prev = cle
+        print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
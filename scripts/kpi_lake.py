@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Daily KPIs of the FICP lake, aggregated incrementally.
+
+Per day (date of the lake file):
+- consultations by statut_ficp (NON_INSCRIT, SURVEILLANCE, INSCRIT)
+- new surveillances, new inscriptions by type_incident (PAIEMENT, SURENDETTEMENT)
+- radiations
+- delays: surveillance -> PAIEMENT inscription and inscription -> radiation (daily mean,
+  cumulative distribution)
+- radiation rate of the matured inscriptions (dated at least RAD_DMAX days before the
+  day, so every radiation due has been written) against RAD_PROBA (ficp_rules.py)
+
+Running aggregates live in <root>/_state/kpi.json together with the (size, mtime) of every
+file already folded in. A run folds in only the files it has not seen: rows are streamed
+(no file is held in memory) into per-day counters and cumulative histograms, which are
+plain sums, so the result is the same as a from-scratch recomputation. If a file already
+folded in has changed or disappeared (regenerated day, compaction), the aggregates are
+rebuilt from scratch. Monthly partitions are split per day through their index.
+
+Outputs: a daily KPI CSV (one row per day) and a JSON summary, under <root>/kpi/ unless
+--csv / --json say otherwise. audit_lake.py prints the summary after its report (and saves the
+aggregates only with --save-kpi).
+
+Usage (from repo root):
+  python scripts/kpi_lake.py [ficp_data_lake] [--csv kpi_daily.csv] [--json kpi.json] [--full]
+"""
+import os
+import csv
+import json
+import argparse
+from collections import Counter
+
+import lake_io
+import ficp_rules
+from history_store import iso_ordinal, ordinal_iso
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_LAKE = os.path.join(ROOT, 'ficp_data_lake')
+AREAS = ('consultation', 'inscription', 'radiation')
+STATE_NAME = os.path.join('_state', 'kpi.json')
+STATE_VERSION = 1
+STATUTS = ('NON_INSCRIT', 'SURVEILLANCE', 'INSCRIT')
+TYPES = ('PAIEMENT', 'SURENDETTEMENT')
+CSV_COLUMNS = ['date', 'consultations'] + [f'consult_{s.lower()}' for s in STATUTS] + \
+              ['surveillances'] + [f'insc_{t.lower()}' for t in TYPES] + \
+              ['radiations', 'paiement_delay_mean', 'radiation_delay_mean', 'radiation_rate', 'rad_proba']
+
+
+def state_path(root: str) -> str:
+    return os.path.join(root, STATE_NAME)
+
+
+def empty_state():
+    return {'version': STATE_VERSION, 'sources': {area: {} for area in AREAS}, 'days': {},
+            'paiement_delay': {}, 'radiation_delay': {}, 'insc_by_date': {}, 'rad_by_insc_date': {}}
+
+
+def load_state(root: str):
+    try:
+        with open(state_path(root), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if state.get('version') == STATE_VERSION else None
+
+
+def save_state(root: str, state):
+    path = state_path(root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, sort_keys=True, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def bump(d: dict, key, n=1):
+    d[key] = d.get(key, 0) + n
+
+
+# -- folding rows -----------------------------------------------------------------------
+
+def fold_consultations(counters: dict, rows):
+    for row in rows:
+        if len(row) == 5:
+            bump(counters, 'consult:' + row[2])
+
+
+def fold_inscriptions(state, counters: dict, rows):
+    for row in rows:
+        if len(row) != 5:
+            continue
+        _cle, statut, type_inc, d_surv, d_insc = row
+        try:
+            if statut == 'SURVEILLANCE':
+                bump(counters, 'surveillance')
+            elif statut == 'INSCRIT' and d_insc:
+                o = iso_ordinal(d_insc)
+                bump(counters, 'insc:' + type_inc)
+                bump(state['insc_by_date'], d_insc)
+                if type_inc == 'PAIEMENT' and d_surv:
+                    delay = o - iso_ordinal(d_surv)
+                    bump(counters, 'paiement_delay_sum', delay)
+                    bump(counters, 'paiement_delay_n')
+                    bump(state['paiement_delay'], str(delay))
+        except ValueError:
+            bump(counters, 'bad_rows')
+
+
+def fold_radiations(state, counters: dict, rows):
+    for row in rows:
+        if len(row) != 4:
+            continue
+        _cle, d_insc, d_rad, _type_inc = row
+        try:
+            delay = iso_ordinal(d_rad) - iso_ordinal(d_insc)
+        except ValueError:
+            bump(counters, 'bad_rows')
+            continue
+        bump(counters, 'radiation')
+        bump(counters, 'radiation_delay_sum', delay)
+        bump(counters, 'radiation_delay_n')
+        bump(state['radiation_delay'], str(delay))
+        bump(state['rad_by_insc_date'], d_insc)
+
+
+def fold_source(state, area: str, src):
+    for day_str, rows in lake_io.iter_days(src):
+        counters = state['days'].setdefault(day_str, {})
+        if area == 'consultation':
+            fold_consultations(counters, rows)
+        elif area == 'inscription':
+            fold_inscriptions(state, counters, rows)
+        else:
+            fold_radiations(state, counters, rows)
+
+
+def update(root: str, full: bool = False, save: bool = True):
+    """Fold the files not seen yet into the aggregates of root and save them (unless save
+    is False: the caller only reads the lake). Returns (state, number of files folded in,
+    True if rebuilt from scratch)."""
+    state = None if full else load_state(root)
+    current = {}
+    for area in AREAS:
+        entries = {}
+        for src in lake_io.list_sources(os.path.join(root, area)):
+            st = os.stat(src.path)
+            entries[src.name] = (src, [st.st_size, st.st_mtime_ns])
+        current[area] = entries
+    rebuilt = state is None or any(
+        current[area].get(name, (None, None))[1] != stat
+        for area in AREAS for name, stat in state['sources'][area].items())
+    if rebuilt:
+        state = empty_state()
+    folded = 0
+    for area in AREAS:
+        for name, (src, stat) in sorted(current[area].items()):
+            if name not in state['sources'][area]:
+                fold_source(state, area, src)
+                state['sources'][area][name] = stat
+                folded += 1
+    if save and (folded or rebuilt):
+        save_state(root, state)
+    return state, folded, rebuilt
+
+
+# -- reports ----------------------------------------------------------------------------
+
+def mean(total, n):
+    return round(total / n, 3) if n else ''
+
+
+def daily_rows(state):
+    """One KPI row per day (CSV_COLUMNS), in date order."""
+    insc = sorted(state['insc_by_date'].items())
+    rads = sorted(state['rad_by_insc_date'].items())
+    i = j = matured = radiated = 0
+    out = []
+    for day_str in sorted(state['days']):
+        c = state['days'][day_str]
+        cutoff = ordinal_iso(iso_ordinal(day_str) - ficp_rules.RAD_DMAX)
+        while i < len(insc) and insc[i][0] <= cutoff:
+            matured += insc[i][1]
+            i += 1
+        while j < len(rads) and rads[j][0] <= cutoff:
+            radiated += rads[j][1]
+            j += 1
+        consult = [c.get('consult:' + s, 0) for s in STATUTS]
+        out.append([day_str, sum(v for k, v in c.items() if k.startswith('consult:'))] + consult +
+                   [c.get('surveillance', 0)] + [c.get('insc:' + t, 0) for t in TYPES] +
+                   [c.get('radiation', 0),
+                    mean(c.get('paiement_delay_sum', 0), c.get('paiement_delay_n', 0)),
+                    mean(c.get('radiation_delay_sum', 0), c.get('radiation_delay_n', 0)),
+                    round(radiated / matured, 4) if matured else '', ficp_rules.RAD_PROBA])
+    return out
+
+
+def summary(state):
+    """Lake-wide KPIs (JSON-ready)."""
+    totals = Counter()
+    for counters in state['days'].values():
+        totals.update(counters)
+    rows = daily_rows(state)
+    days = sorted(state['days'])
+    return {
+        'days': len(days),
+        'range': [days[0], days[-1]] if days else None,
+        'consultations_by_statut': {k[8:]: v for k, v in sorted(totals.items()) if k.startswith('consult:')},
+        'surveillances': totals['surveillance'],
+        'inscriptions_by_type': {k[5:]: v for k, v in sorted(totals.items()) if k.startswith('insc:')},
+        'radiations': totals['radiation'],
+        'radiation_rate': rows[-1][-2] if rows else '',
+        'rad_proba': ficp_rules.RAD_PROBA,
+        'paiement_delay_mean': mean(totals['paiement_delay_sum'], totals['paiement_delay_n']),
+        'radiation_delay_mean': mean(totals['radiation_delay_sum'], totals['radiation_delay_n']),
+        'paiement_delay': {k: state['paiement_delay'][k] for k in sorted(state['paiement_delay'], key=int)},
+        'radiation_delay': {k: state['radiation_delay'][k] for k in sorted(state['radiation_delay'], key=int)},
+        'bad_rows': totals['bad_rows'],
+    }
+
+
+def write_csv(path: str, state):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(CSV_COLUMNS)
+        w.writerows(daily_rows(state))
+
+
+def write_json(path: str, state):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary(state), f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Aggregate daily KPIs of the FICP lake incrementally.')
+    parser.add_argument('root', nargs='?', default=DEFAULT_LAKE, help='lake root (default: ficp_data_lake)')
+    parser.add_argument('--csv', type=str, help='daily KPI CSV (default: <root>/kpi/kpi_daily.csv)')
+    parser.add_argument('--json', type=str, help='KPI summary JSON (default: <root>/kpi/kpi_summary.json)')
+    parser.add_argument('--full', action='store_true', help='ignore the saved aggregates and recompute')
+    args = parser.parse_args(argv)
+
+    state, folded, rebuilt = update(args.root, args.full)
+    out_dir = os.path.join(args.root, 'kpi')
+    if not (args.csv and args.json):
+        os.makedirs(out_dir, exist_ok=True)
+    csv_path = args.csv or os.path.join(out_dir, 'kpi_daily.csv')
+    json_path = args.json or os.path.join(out_dir, 'kpi_summary.json')
+    write_csv(csv_path, state)
+    write_json(json_path, state)
+    print_summary(summary(state), folded, rebuilt)
+    print(f"- written: {csv_path}, {json_path}")
+    return 0
+
+
+def print_summary(s, folded, rebuilt):
+    print(f"KPI: {s['days']} days, {folded} file(s) folded in{' (recomputed)' if rebuilt else ''}")
+    print(f"- consultations by statut: {s['consultations_by_statut']}")
+    print(f"- inscriptions by type: {s['inscriptions_by_type']}, surveillances: {s['surveillances']}")
+    print(f"- radiations: {s['radiations']}, rate of matured inscriptions: {s['radiation_rate']} "
+          f"(RAD_PROBA {s['rad_proba']})")
+    print(f"- mean delays: surveillance -> PAIEMENT {s['paiement_delay_mean']} d, "
+          f"inscription -> radiation {s['radiation_delay_mean']} d")
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Index de zones (zone map) du lake et requêtes par cle ou par dates.
+
+Retrouver "tous les événements du client X" ou "tout ce qui s'est passé entre deux
+dates" oblige sinon à ouvrir chaque fichier des trois zones. L'index, rangé à côté des
+données dans _zonemap/<zone>/YYYY-MM.json, décrit chaque bloc du lake (un fichier
+quotidien, ou un jour d'une partition mensuelle):
+  {"version": 1, "files": {"2025-01-01.csv": {"size": 45000, "mtime_ns": ...,
+     "blocks": {"2025-01-01": {"rows": 1000, "cle": ["AAB...", "ZZX..."],
+                               "dates": {"date_consultation": ["2025-01-01", "2025-01-01"], ...},
+                               "bloom": [nbits, nhashes, "base64"]}}}}}
+- cle min/max et filtre de Bloom des cle du bloc (1 % de faux positifs, BloomFilter de
+  key_registry.py): une recherche par cle n'ouvre que les blocs qui peuvent la contenir;
+- min/max de chaque colonne date_*: une recherche sur une colonne de date n'ouvre que les
+  blocs dont l'intervalle recoupe celui demandé.
+Les cle étant tirées au hasard, leurs min/max couvrent presque tout l'alphabet: c'est le
+filtre de Bloom qui écarte les blocs.
+
+Mise à jour incrémentale (update): un fichier n'est relu que si sa taille ou son mtime a
+changé (jour écrit, regénéré, mois compacté); seuls les mois touchés sont réécrits.
+L'index est tenu à jour par ceux qui écrivent le lake, pour les seuls mois écrits: le
+générateur (et le service) dès que _zonemap/ existe ou avec --index, compact_lake.py après
+compaction ou restauration (maintain). Une requête s'en sert donc tel quel, sans relire
+l'état de tout le lake; un fichier absent de l'index est lu en entier. Après une
+écriture hors de ces outils: --update, ou --refresh avec la requête.
+
+Requêtes (sortie CSV sur stdout: zone, puis les colonnes de la zone; bilan sur stderr):
+    python scripts/lake_index.py --cle ABCDEFGH12345 [--root DIR]
+    python scripts/lake_index.py --from 2025-03-01 --to 2025-03-07 --area radiation
+    python scripts/lake_index.py --area radiation --column date_inscription --from 2025-01-01 --to 2025-01-31
+    python scripts/lake_index.py --update            (mise à jour seule)
+    python scripts/lake_index.py --cle X --full-scan (sans l'index, pour comparer)
+Sans --column, --from/--to portent sur le jour du lake où la ligne est rangée.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import base64
+import shutil
+import argparse
+from datetime import datetime
+from itertools import islice
+
+import lake_io
+import metrics
+from key_registry import BloomFilter
+
+AREAS = ('consultation', 'inscription', 'radiation')
+INDEX_DIR = '_zonemap'
+ZONEMAP_VERSION = 1
+DEFAULT_LAKE = os.path.join(os.path.dirname(__file__), '..', 'ficp_data_lake')
+
+
+def source_month(src) -> str:
+    return src.days[0][:7]
+
+
+def month_path(root: str, area: str, month: str) -> str:
+    return os.path.join(root, INDEX_DIR, area, f'{month}.json')
+
+
+def load_month(root: str, area: str, month: str) -> dict:
+    """Entrées du mois (nom de fichier -> entrée); {} si absent, illisible ou périmé."""
+    try:
+        with open(month_path(root, area, month), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get('files', {}) if data.get('version') == ZONEMAP_VERSION else {}
+
+
+def save_month(root: str, area: str, month: str, files: dict):
+    path = month_path(root, area, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': ZONEMAP_VERSION, 'files': files}, f, sort_keys=True, separators=(',', ':'))
+    metrics.count('index_bytes_written', os.path.getsize(tmp))
+    os.replace(tmp, path)
+
+
+def block_zone(header, rows) -> dict:
+    """Zone d'un bloc de lignes: nombre, cle min/max, min/max des colonnes date_*, Bloom."""
+    if header is None:
+        return {'rows': 0, 'cle': None, 'dates': {}, 'bloom': None}
+    ci = header.index('cle_bdf')
+    date_cols = [(i, name) for i, name in enumerate(header) if name.startswith('date_')]
+    keys = []
+    lo, hi = {}, {}
+    for row in rows:
+        keys.append(row[ci])
+        for i, name in date_cols:
+            v = row[i]
+            if v:
+                if name not in lo or v < lo[name]:
+                    lo[name] = v
+                if name not in hi or v > hi[name]:
+                    hi[name] = v
+    if not keys:
+        return {'rows': 0, 'cle': None, 'dates': {}, 'bloom': None}
+    bloom = BloomFilter.for_capacity(len(keys))
+    bloom.add_many(keys)
+    return {'rows': len(keys), 'cle': [min(keys), max(keys)], 'dates': {name: [lo[name], hi[name]] for name in lo},
+            'bloom': [bloom.nbits, bloom.nhashes, base64.b64encode(bytes(bloom.bits)).decode('ascii')]}
+
+
+def index_source(src) -> dict:
+    """Entrée d'un fichier quotidien (un bloc) ou d'une partition (un bloc par jour)."""
+    st = os.stat(src.path)
+    blocks = {}
+    with lake_io.open_rows(src.path) as (header, rows):
+        if src.index is None:
+            blocks[src.days[0]] = block_zone(header, rows)
+        else:
+            for day_str in src.days:
+                blocks[day_str] = block_zone(header, islice(rows, src.index['days'][day_str]['rows']))
+    metrics.count('files_indexed')
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'blocks': blocks}
+
+
+def update(root: str, months=None) -> dict:
+    """Met l'index à jour pour les mois donnés (YYYY-MM; tous si None). Seuls les fichiers
+    nouveaux ou modifiés sont relus. Retourne {'files', 'indexed', 'months_written'}."""
+    stats = {'files': 0, 'indexed': 0, 'months_written': 0}
+    with metrics.phase('index_update'):
+        for area in AREAS:
+            by_month = {}
+            for src in lake_io.list_sources(os.path.join(root, area)):
+                by_month.setdefault(source_month(src), []).append(src)
+            index_dir = os.path.join(root, INDEX_DIR, area)
+            indexed_months = {name[:-5] for name in os.listdir(index_dir)
+                              if name.endswith('.json')} if os.path.isdir(index_dir) else set()
+            for month in sorted(set(by_month) | indexed_months):
+                if months is not None and month not in months:
+                    continue
+                old = load_month(root, area, month)
+                files = {}
+                for src in by_month.get(month, []):
+                    stats['files'] += 1
+                    entry = old.get(src.name)
+                    st = os.stat(src.path)
+                    if entry is None or entry['size'] != st.st_size or entry['mtime_ns'] != st.st_mtime_ns:
+                        entry = index_source(src)
+                        stats['indexed'] += 1
+                    files[src.name] = entry
+                if not files:
+                    os.remove(month_path(root, area, month))  # mois disparu du lake
+                    stats['months_written'] += 1
+                elif files != old:
+                    save_month(root, area, month, files)
+                    stats['months_written'] += 1
+    return stats
+
+
+def exists(root: str) -> bool:
+    return os.path.isdir(os.path.join(root, INDEX_DIR))
+
+
+def maintain(root: str, months):
+    """Après une écriture du lake: met à jour les mois donnés si le lake a un index."""
+    if months and exists(root):
+        return update(root, set(months))
+    return None
+
+
+def drop(root: str):
+    shutil.rmtree(os.path.join(root, INDEX_DIR), ignore_errors=True)
+
+
+# -- requêtes --------------------------------------------------------------------------
+
+def block_may_match(zone: dict, cle=None, date_from=None, date_to=None, column=None) -> bool:
+    if not zone['rows']:
+        return False
+    if cle is not None:
+        lo, hi = zone['cle']
+        if not lo <= cle <= hi:
+            return False
+        nbits, nhashes, bits = zone['bloom']
+        if cle not in BloomFilter(nbits, nhashes, bytearray(base64.b64decode(bits))):
+            return False
+    if column is not None and (date_from or date_to):
+        rng = zone['dates'].get(column)
+        if rng is None or (date_from and rng[1] < date_from) or (date_to and rng[0] > date_to):
+            return False
+    return True
+
+
+def row_filter(header, cle=None, date_from=None, date_to=None, column=None):
+    """Prédicat sur les lignes d'un bloc (None: toutes les lignes du bloc conviennent)."""
+    tests = []
+    if cle is not None:
+        ci = header.index('cle_bdf')
+        tests.append(lambda row: row[ci] == cle)
+    if column is not None and (date_from or date_to):
+        if column not in header:
+            return lambda row: False
+        di = header.index(column)
+        lo, hi = date_from or '0000-00-00', date_to or '9999-99-99'
+        tests.append(lambda row: row[di] and lo <= row[di] <= hi)
+    if not tests:
+        return None
+    return lambda row: all(t(row) for t in tests)
+
+
+def read_block(src, day_str: str):
+    """(en-tête, lignes) d'un bloc: le fichier quotidien, ou le jour dans la partition."""
+    if src.index is None:
+        with lake_io.open_rows(src.path) as (header, rows):
+            return header, [list(r) for r in rows]
+    return lake_io.read_day(src.path, day_str)
+
+
+def query(root: str, cle: str = None, date_from: str = None, date_to: str = None, column: str = None,
+          areas=AREAS, use_index: bool = True, refresh: bool = False, stats: dict = None):
+    """(zone, jour, ligne) des lignes qui correspondent, zone par zone dans l'ordre des jours.
+    Sans column, date_from/date_to (inclus) portent sur le jour du bloc. Avec use_index, seuls
+    les blocs dont la zone peut correspondre sont lus; sinon tout le lake est parcouru.
+    refresh met d'abord tout l'index à jour (relit l'état de chaque fichier du lake).
+    stats (dict optionnel) reçoit blocks, blocks_read, files_opened."""
+    stats = {} if stats is None else stats
+    for key in ('blocks', 'blocks_read', 'files_opened'):
+        stats.setdefault(key, 0)
+    # sur le seul jour du lake, les noms de fichiers suffisent: l'index n'apporte rien
+    use_index = use_index and (cle is not None or column is not None)
+    if use_index and refresh:
+        update(root)
+    day_lo, day_hi = (date_from, date_to) if column is None else (None, None)
+    for area in areas:
+        index = {}
+        for src in lake_io.list_sources(os.path.join(root, area)):
+            if (day_hi and src.days[0] > day_hi) or (day_lo and src.days[-1] < day_lo):
+                continue
+            days = [d for d in src.days if (not day_lo or d >= day_lo) and (not day_hi or d <= day_hi)]
+            stats['blocks'] += len(days)
+            if use_index:
+                month = source_month(src)
+                if month not in index:
+                    index[month] = load_month(root, area, month)
+                entry = index[month].get(src.name)
+                if entry is not None:
+                    days = [d for d in days if d in entry['blocks']
+                            and block_may_match(entry['blocks'][d], cle, date_from, date_to, column)]
+                # fichier absent de l'index (--no-refresh): lu en entier
+            if days:
+                stats['files_opened'] += 1
+            for day_str in days:
+                stats['blocks_read'] += 1
+                header, rows = read_block(src, day_str)
+                if header is None:
+                    continue
+                keep = row_filter(header, cle, date_from, date_to, column)
+                for row in rows:
+                    if keep is None or keep(row):
+                        yield area, day_str, row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Index de zones du lake et requetes par cle ou par dates')
+    parser.add_argument('--root', type=str, default=DEFAULT_LAKE, help='Racine du data lake (defaut: ficp_data_lake)')
+    parser.add_argument('--cle', type=str, help='cle_bdf recherchee')
+    parser.add_argument('--from', dest='date_from', type=str, help='Premiere date incluse YYYY-MM-DD')
+    parser.add_argument('--to', dest='date_to', type=str, help='Derniere date incluse YYYY-MM-DD')
+    parser.add_argument('--column', type=str, help='Colonne date_* filtree par --from/--to (defaut: jour du lake)')
+    parser.add_argument('--area', action='append', choices=AREAS, help='Zone interrogee (repetable; defaut: toutes)')
+    parser.add_argument('--update', action='store_true', help='Met l\'index a jour et s\'arrete')
+    parser.add_argument('--rebuild', action='store_true', help='Reconstruit l\'index entierement')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Met l\'index a jour avant la requete (apres une ecriture hors generateur/compaction)')
+    parser.add_argument('--full-scan', action='store_true', help='Parcourt tout le lake sans l\'index')
+    parser.add_argument('--count', action='store_true', help='Affiche seulement le nombre de lignes par zone')
+    parser.add_argument('--metrics', nargs='?', const='-', metavar='FICHIER',
+                        help='Emet les mesures en JSON (ligne METRICS sur stdout, ou FICHIER)')
+    args = parser.parse_args(argv)
+
+    try:
+        for d in (args.date_from, args.date_to):
+            if d is not None:
+                datetime.strptime(d, '%Y-%m-%d')
+    except ValueError:
+        print('Date invalide, format attendu YYYY-MM-DD', file=sys.stderr)
+        return 2
+    if args.column is not None and not args.column.startswith('date_'):
+        print('--column attend une colonne date_* (date_consultation, date_inscription...)', file=sys.stderr)
+        return 2
+    querying = args.cle or args.date_from or args.date_to
+    if not querying and not (args.update or args.rebuild):
+        parser.error('indiquer --cle et/ou --from/--to, ou --update')
+
+    with metrics.session('lake_index', args.metrics) as m:
+        t0 = time.perf_counter()
+        if args.rebuild:
+            drop(args.root)
+        if args.update or args.rebuild:
+            res = update(args.root)
+            print(f"[index] {res['files']} fichiers, {res['indexed']} indexes, {res['months_written']} mois ecrits "
+                  f"en {time.perf_counter() - t0:.3f}s", file=sys.stderr)
+        if querying:
+            if not args.full_scan and not exists(args.root):
+                print('[query] pas d\'index (_zonemap/): fichiers lus en entier, voir --update', file=sys.stderr)
+            stats = {}
+            counts = {}
+            out = csv.writer(sys.stdout, lineterminator='\n')
+            for area, _day, row in query(args.root, args.cle, args.date_from, args.date_to, args.column,
+                                         args.area or AREAS, use_index=not args.full_scan,
+                                         refresh=args.refresh and not (args.update or args.rebuild), stats=stats):
+                counts[area] = counts.get(area, 0) + 1
+                if not args.count:
+                    out.writerow([area] + list(row))
+            if args.count:
+                for area in args.area or AREAS:
+                    print(f'{area},{counts.get(area, 0)}')
+            print(f"[query] {sum(counts.values())} lignes, {stats['blocks_read']}/{stats['blocks']} blocs lus "
+                  f"({stats['files_opened']} fichiers) en {time.perf_counter() - t0:.3f}s", file=sys.stderr)
+        m.exit_code = 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
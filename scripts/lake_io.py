@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture / écriture des fichiers quotidiens du lake dans les trois formats supportés.
+
+Le format d'un fichier se déduit de son extension:
+- YYYY-MM-DD.csv      texte (format historique)
+- YYYY-MM-DD.csv.gz   même texte compressé gzip (en-tête gzip sans nom ni date: octets
+                      identiques d'une exécution à l'autre)
+- YYYY-MM-DD.parquet  colonnes typées: date_* en date32, statut_ficp et type_incident
+                      encodés en dictionnaire, cle_bdf en chaîne (pyarrow, optionnel)
+
+Les lecteurs voient toujours des lignes de chaînes, comme csv.reader: les dates Parquet
+reviennent en 'YYYY-MM-DD' et les valeurs absentes en ''.
+
+Partitions mensuelles (compact_lake.py): les jours d'un mois clos peuvent être regroupés
+dans area/YYYY-MM.<format> (un seul en-tête, jours dans l'ordre), accompagné de
+area/YYYY-MM.index.json qui donne pour chaque jour sa première ligne, son nombre de
+lignes, le MD5 du fichier quotidien d'origine et, en csv, sa position en octets:
+  {"version": 1, "month": "YYYY-MM", "format": "csv", "rows": N,
+   "days": {"YYYY-MM-DD": {"row": 0, "rows": 1000, "md5": "...", "offset": 70, "length": 45000}}}
+list_sources / iter_area / read_day présentent indifféremment fichiers quotidiens et
+partitions, jour par jour.
+"""
+
+import os
+import io
+import csv
+import gzip
+import json
+from bisect import bisect_left
+from itertools import islice
+from contextlib import contextmanager
+
+import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # format parquet optionnel
+    pa = pc = pq = None
+
+FORMATS = ('csv', 'csv.gz', 'parquet')
+DICT_COLUMNS = ('statut_ficp', 'type_incident')
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 1
+
+
+def format_of(name: str):
+    """Format d'un fichier du lake d'après son extension, None si ce n'en est pas un."""
+    for fmt in ('csv.gz', 'csv', 'parquet'):
+        if name.endswith('.' + fmt):
+            return fmt
+    return None
+
+
+def check_format(fmt: str):
+    if fmt not in FORMATS:
+        raise ValueError(f'format inconnu: {fmt} (attendu: {", ".join(FORMATS)})')
+    if fmt == 'parquet' and pa is None:
+        raise ValueError('le format parquet necessite le paquet pyarrow (pip install pyarrow)')
+
+
+def day_file(folder: str, day_str: str, fmt: str = 'csv') -> str:
+    return os.path.join(folder, f'{day_str}.{fmt}')
+
+
+def is_day_name(name: str) -> bool:
+    """YYYY-MM-DD.<format>"""
+    return len(name) > 11 and name[10] == '.' and name[4] == name[7] == '-' and bool(format_of(name))
+
+
+def partition_month(name: str):
+    """'YYYY-MM' pour un nom de partition YYYY-MM.<format>, sinon None."""
+    if len(name) > 8 and name[7] == '.' and name[4] == '-' and (name[:4] + name[5:7]).isdigit() and format_of(name):
+        return name[:7]
+    return None
+
+
+def list_day_files(folder: str):
+    """[(YYYY-MM-DD, nom)] des fichiers quotidiens du lake dans folder, triés par nom."""
+    if not os.path.isdir(folder):
+        return []
+    return [(name[:10], name) for name in sorted(os.listdir(folder)) if is_day_name(name)]
+
+
+def index_path(folder: str, month: str) -> str:
+    return os.path.join(folder, month + INDEX_SUFFIX)
+
+
+def read_index(folder: str, month: str) -> dict:
+    """Index d'une partition; ValueError s'il est absent ou illisible."""
+    path = index_path(folder, month)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError) as ex:
+        raise ValueError(f'index de partition illisible: {path} ({ex})')
+    if index.get('version') != INDEX_VERSION or not index.get('days'):
+        raise ValueError(f'index de partition invalide: {path}')
+    return index
+
+
+class Source:
+    """Fichier du lake couvrant un jour (quotidien) ou plusieurs (partition + index)."""
+
+    def __init__(self, folder: str, name: str, days, index=None):
+        self.folder = folder
+        self.name = name
+        self.path = os.path.join(folder, name)
+        self.days = days  # YYYY-MM-DD triés
+        self.index = index  # None pour un fichier quotidien
+
+    def rows_before(self, day_str: str) -> int:
+        """Nombre de lignes des jours < day_str (partition)."""
+        i = bisect_left(self.days, day_str)
+        return self.index['days'][self.days[i]]['row'] if i < len(self.days) else self.index['rows']
+
+
+def list_sources(folder: str):
+    """Fichiers quotidiens et partitions de folder, triés par premier jour couvert."""
+    if not os.path.isdir(folder):
+        return []
+    sources = []
+    for name in os.listdir(folder):
+        if is_day_name(name):
+            sources.append(Source(folder, name, [name[:10]]))
+        elif partition_month(name):
+            index = read_index(folder, partition_month(name))
+            sources.append(Source(folder, name, sorted(index['days']), index))
+    sources.sort(key=lambda src: (src.days[0], src.name))
+    return sources
+
+
+def iter_area(folder: str, before: str = None, since: str = None):
+    """(chemin, lignes) des jours since <= jour < before (YYYY-MM-DD; bornes ouvertes si None)
+    de folder, dans l'ordre des dates. Une partition à cheval sur une borne n'est lue que
+    pour les jours retenus. Les lignes d'une source doivent être consommées avant de
+    passer à la suivante."""
+    for src in list_sources(folder):
+        if (before is not None and src.days[0] >= before) or (since is not None and src.days[-1] < since):
+            continue
+        with open_rows(src.path) as (_header, rows):
+            cut_before = before is not None and src.days[-1] >= before
+            cut_since = since is not None and src.days[0] < since
+            if cut_before or cut_since:
+                rows = islice(rows, src.rows_before(since) if cut_since else 0,
+                              src.rows_before(before) if cut_before else None)
+            yield src.path, rows
+
+
+def iter_days(src: Source):
+    """(jour, lignes) de chaque jour d'une source, dans l'ordre: un seul jour pour un fichier
+    quotidien, découpage par l'index pour une partition. Les lignes d'un jour doivent être
+    consommées entièrement avant de passer au jour suivant."""
+    with open_rows(src.path) as (_header, rows):
+        if src.index is None:
+            yield src.days[0], rows
+            return
+        for day_str in src.days:
+            yield day_str, islice(rows, src.index['days'][day_str]['rows'])
+
+
+def partition_for(folder: str, day_str: str):
+    """Chemin de la partition qui contient day_str, ou None."""
+    month = day_str[:7]
+    for fmt in FORMATS:
+        path = os.path.join(folder, f'{month}.{fmt}')
+        if os.path.exists(path) and day_str in read_index(folder, month)['days']:
+            return path
+    return None
+
+
+def read_day(path: str, day_str: str):
+    """(en-tête, [lignes]) du jour day_str dans un fichier quotidien ou une partition.
+    En csv, le jour est lu directement à sa position (index), sans parcourir le mois."""
+    folder, name = os.path.split(path)
+    month = partition_month(name)
+    if month is None:
+        with open_rows(path) as (header, rows):
+            return header, [list(r) for r in rows]
+    entry = read_index(folder, month)['days'][day_str]
+    if 'offset' in entry:
+        with open(path, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8')]))
+            f.seek(entry['offset'])
+            text = f.read(entry['length']).decode('utf-8')
+        return header, [list(r) for r in csv.reader(io.StringIO(text, newline=''))]
+    with open_rows(path) as (header, rows):
+        return header, [list(r) for r in islice(rows, entry['row'], entry['row'] + entry['rows'])]
+
+
+def find_day_files(folder: str, day_str: str):
+    """Fichiers quotidiens existants du jour dans folder, tous formats confondus."""
+    return [p for p in (day_file(folder, day_str, fmt) for fmt in FORMATS) if os.path.exists(p)]
+
+
+def write_rows(path: str, header, rows, fmt: str = None):
+    """Ecrit en-tête + lignes dans le format donné par l'extension de path (ou par fmt,
+    pour un fichier temporaire). Retourne la taille écrite en octets."""
+    fmt = fmt or format_of(path)
+    if fmt == 'parquet':
+        check_format(fmt)
+        pq.write_table(to_table(header, rows), path)
+    else:
+        with open(path, 'wb') as raw:
+            if fmt == 'csv.gz':
+                with gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=6, mtime=0) as gz, \
+                        io.TextIOWrapper(gz, encoding='utf-8', newline='') as f:
+                    _write_csv(f, header, rows)
+            else:
+                with io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+                    _write_csv(f, header, rows)
+    size = os.path.getsize(path)
+    metrics.count('files_written')
+    metrics.count('bytes_written', size)
+    return size
+
+
+def _write_csv(f, header, rows):
+    w = csv.writer(f)
+    w.writerow(header)
+    w.writerows(rows)
+
+
+def to_table(header, rows):
+    columns = list(zip(*rows)) if rows else [()] * len(header)
+    arrays = []
+    for name, values in zip(header, columns):
+        if name.startswith('date_'):
+            arrays.append(pa.array([v or None for v in values], type=pa.string()).cast(pa.date32()))
+        elif name in DICT_COLUMNS:
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=list(header))
+
+
+def parquet_shape(path: str):
+    """(noms de colonnes, nombre de lignes) d'un fichier Parquet, lus dans son pied de page."""
+    check_format('parquet')
+    meta = pq.read_metadata(path)
+    return meta.schema.to_arrow_schema().names, meta.num_rows
+
+
+@contextmanager
+def open_rows(path: str):
+    """(en-tête, itérateur de lignes) d'un fichier du lake, quel que soit son format.
+    En-tête None si le fichier est vide."""
+    fmt = format_of(path)
+    metrics.count('files_read')
+    metrics.count('bytes_read', os.path.getsize(path))
+    if fmt == 'parquet':
+        check_format(fmt)
+        table = pq.read_table(path)
+        columns = [pc.cast(col, pa.string()).fill_null('').to_pylist() for col in table.columns]
+        yield table.column_names, zip(*columns)
+        return
+    if fmt == 'csv.gz':
+        f = gzip.open(path, 'rt', encoding='utf-8', newline='')
+    else:
+        f = open(path, 'r', encoding='utf-8', newline='')
+    with f:
+        r = csv.reader(f)
+        yield next(r, None), r
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation des scripts du lake: temps par phase, compteurs et profil.
+
+Les scripts découpent leur travail en phases (with phase('load_history'): ...) et
+incrémentent des compteurs (count('rows_written', n)); lake_io compte lui-même les
+fichiers et octets lus et écrits. Le coût est de deux appels perf_counter par phase,
+jamais par ligne: la collecte reste active en permanence.
+
+session() encadre une exécution: remise à zéro, profil cProfile optionnel, puis émission
+d'une ligne JSON:
+  {"script": "...", "wall_s": 1.234, "exit_code": 0, "peak_rss_kb": 51200,
+   "phases": {"load_history": {"s": 0.412, "calls": 1}, ...},
+   "counters": {"files_read": 951, "bytes_read": 23456789, ...}}
+sur stdout préfixée par "METRICS " (--metrics), ou dans un fichier (--metrics out.json).
+peak_rss_kb est le pic de mémoire résidente du processus (None hors Unix); le travail des
+processus d'un pool n'y figure pas.
+
+Usage (dans un script):
+    with metrics.session('audit_lake', args.metrics, args.profile) as m:
+        m.exit_code = run(args)
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: pas de ru_maxrss
+    resource = None
+
+
+class Metrics:
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.exit_code = None
+        self.t0 = time.perf_counter()
+
+    def add_phase(self, name: str, seconds: float):
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = [0.0, 0]
+        entry[0] += seconds
+        entry[1] += 1
+
+    def to_dict(self, script: str) -> dict:
+        return {
+            'script': script,
+            'wall_s': round(time.perf_counter() - self.t0, 6),
+            'exit_code': self.exit_code,
+            'peak_rss_kb': peak_rss_kb(),
+            'phases': {name: {'s': round(s, 6), 'calls': n} for name, (s, n) in self.phases.items()},
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+
+CURRENT = Metrics()
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss  # octets sous macOS
+
+
+def current_rss_kb():
+    """Mémoire résidente actuelle (Linux: /proc/self/statm), à défaut le pic."""
+    try:
+        with open('/proc/self/statm', 'r', encoding='ascii') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return peak_rss_kb()
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+@contextmanager
+def phase(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        CURRENT.add_phase(name, time.perf_counter() - t0)
+
+
+def count(name: str, n: int = 1):
+    CURRENT.counters[name] = CURRENT.counters.get(name, 0) + n
+
+
+@contextmanager
+def session(script: str, dest: str = None, profile: str = None):
+    """Remet les mesures à zéro, profile si profile (fichier .prof pour pstats/snakeviz)
+    et émet le JSON si dest ('-': ligne METRICS sur stdout, sinon chemin de fichier)."""
+    global CURRENT
+    CURRENT = Metrics()
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield CURRENT
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if dest:
+            emit(CURRENT.to_dict(script), dest)
+
+
+def emit(data: dict, dest: str):
+    line = json.dumps(data, separators=(',', ':'))
+    if dest == '-':
+        print('METRICS ' + line, flush=True)
+        return
+    parent = os.path.dirname(os.path.abspath(dest))
+    os.makedirs(parent, exist_ok=True)
+    with open(dest, 'w', encoding='utf-8') as f:
+        f.write(line + '\n')
+
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Registre FICP matérialisé: statut courant de chaque client, un instantané par jour.
+
+registre/YYYY-MM-DD.<format> contient, pour l'état arrêté à la fin du jour D (fichiers du
+lake datés <= D), une ligne par client ayant au moins une surveillance ou une inscription,
+triée par cle_bdf:
+  cle_bdf, statut_ficp, type_incident, date_surveillance, date_inscription, date_radiation
+- INSCRIT: dernière inscription du client (date_inscription la plus récente);
+- RADIE: cette dernière inscription a été radiée (date_radiation: première radiation de
+  cette inscription); une radiation d'une inscription plus ancienne est sans effet;
+- SURVEILLANCE: pas d'inscription, dernière surveillance du client.
+Les clients actuellement fichés sont les lignes INSCRIT et SURVEILLANCE; un statut à D
+est une seule recherche par cle (lookup) au lieu d'une relecture de l'historique.
+
+Mise à jour incrémentale: l'instantané de D est celui du dernier jour disponible avant D,
+complété des lignes inscription/ puis radiation/ des jours suivants jusqu'à D (deltas).
+Le générateur l'écrit avec ses fichiers du jour (--registre), sans relire le lake.
+--check compare un instantané à une relecture complète et indépendante de inscription/
+et radiation/ (replay). Un jour regénéré (--overwrite) rend périmés les instantanés
+suivants: les reconstruire avec --date, --check les signale.
+
+Usage:
+    python scripts/registre.py [--root DIR] [--date YYYY-MM-DD] [--format csv]
+    python scripts/registre.py --check [--date YYYY-MM-DD] [--limit 20]
+"""
+
+import os
+import argparse
+
+import lake_io
+from history_store import iso_ordinal, ordinal_iso
+
+AREA = 'registre'
+HEADER = ['cle_bdf', 'statut_ficp', 'type_incident', 'date_surveillance', 'date_inscription', 'date_radiation']
+STATUT_SURVEILLANCE, STATUT_INSCRIT, STATUT_RADIE = 'SURVEILLANCE', 'INSCRIT', 'RADIE'
+
+
+def registre_dir(root: str) -> str:
+    return os.path.join(root, AREA)
+
+
+# -- deltas ------------------------------------------------------------------------------
+# reg: cle -> [statut, type_incident, date_surveillance, date_inscription, date_radiation]
+
+def apply_inscriptions(reg: dict, rows):
+    """Applique des lignes inscription/ (cle, statut, type, date_surveillance, date_inscription)."""
+    for row in rows:
+        if len(row) != 5:
+            continue
+        cle, statut, type_inc, d_surv, d_insc = row
+        cur = reg.get(cle)
+        if statut == STATUT_SURVEILLANCE and d_surv:
+            if cur is None or (cur[0] == STATUT_SURVEILLANCE and (d_surv, type_inc) >= (cur[2], cur[1])):
+                reg[cle] = [STATUT_SURVEILLANCE, type_inc, d_surv, '', '']
+        elif statut == STATUT_INSCRIT and d_insc:
+            if cur is None or cur[0] == STATUT_SURVEILLANCE:
+                reg[cle] = [STATUT_INSCRIT, type_inc, d_surv, d_insc, '']
+            elif (d_insc, type_inc, d_surv) >= (cur[3], cur[1], cur[2]):
+                # même inscription déjà radiée: elle le reste
+                radiated = cur[0] == STATUT_RADIE and cur[3] == d_insc
+                reg[cle] = [cur[0] if radiated else STATUT_INSCRIT, type_inc, d_surv, d_insc, cur[4] if radiated else '']
+
+
+def apply_radiations(reg: dict, rows):
+    """Applique des lignes radiation/ (cle, date_inscription, date_radiation, type)."""
+    for row in rows:
+        if len(row) != 4:
+            continue
+        cle, d_insc, d_rad, _type_inc = row
+        cur = reg.get(cle)
+        if cur is None or cur[0] == STATUT_SURVEILLANCE or cur[3] != d_insc:
+            continue
+        if cur[0] == STATUT_INSCRIT or d_rad < cur[4]:
+            cur[0], cur[4] = STATUT_RADIE, d_rad
+
+
+def apply_days(reg: dict, root: str, since: str = None, upto: str = None):
+    """Applique les fichiers datés since <= jour <= upto: inscriptions puis radiations."""
+    before = ordinal_iso(iso_ordinal(upto) + 1) if upto else None
+    for _path, rows in lake_io.iter_area(os.path.join(root, 'inscription'), before, since):
+        apply_inscriptions(reg, rows)
+    for _path, rows in lake_io.iter_area(os.path.join(root, 'radiation'), before, since):
+        apply_radiations(reg, rows)
+    return reg
+
+
+# -- instantanés -------------------------------------------------------------------------
+
+def snapshot_path(root: str, day_str: str, fmt: str = 'csv') -> str:
+    return lake_io.day_file(registre_dir(root), day_str, fmt)
+
+
+def find_snapshot(root: str, day_str: str):
+    """Instantané existant du jour (tout format), ou None."""
+    found = lake_io.find_day_files(registre_dir(root), day_str)
+    return found[0] if found else None
+
+
+def read_snapshot(path: str) -> dict:
+    with lake_io.open_rows(path) as (_header, rows):
+        return {cle: list(rest) for cle, *rest in rows}
+
+
+def write_snapshot(root: str, day_str: str, reg: dict, fmt: str = 'csv') -> str:
+    """Ecrit l'instantané du jour (trié par cle) et retire une version dans un autre format."""
+    os.makedirs(registre_dir(root), exist_ok=True)
+    path = snapshot_path(root, day_str, fmt)
+    lake_io.write_rows(path, HEADER, [(cle, *vals) for cle, vals in sorted(reg.items())])
+    for other in lake_io.find_day_files(registre_dir(root), day_str):
+        if other != path:
+            os.remove(other)
+    return path
+
+
+def state_at(root: str, day_str: str) -> dict:
+    """Registre à la fin de day_str: dernier instantané <= day_str plus les deltas suivants."""
+    snapshots = [d for d, _ in lake_io.list_day_files(registre_dir(root)) if d <= day_str]
+    if not snapshots:
+        return apply_days({}, root, upto=day_str)
+    last = snapshots[-1]
+    reg = read_snapshot(find_snapshot(root, last))
+    if last == day_str:
+        return reg
+    return apply_days(reg, root, since=ordinal_iso(iso_ordinal(last) + 1), upto=day_str)
+
+
+def _line_at(f, start: int, pos: int):
+    """(début, ligne) de la première ligne commençant à pos ou après (b'' en fin de fichier)."""
+    if pos > start:
+        f.seek(pos - 1)
+        f.readline()  # fin de la ligne qui contient l'octet pos - 1
+    else:
+        f.seek(start)
+    at = f.tell()
+    return at, f.readline()
+
+
+def _csv_find(f, start: int, size: int, cle: bytes):
+    """Ligne de cle dans un CSV trié par cle (octets start..size), par dichotomie sur les
+    positions: O(log taille) lectures au lieu d'un chargement du fichier."""
+    lo, hi = start, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        _, line = _line_at(f, start, mid)
+        if not line or line.split(b',', 1)[0] >= cle:
+            hi = mid
+        else:
+            lo = mid + 1
+    _, line = _line_at(f, start, lo)
+    if not line:
+        return None
+    fields = line.rstrip(b'\r\n').decode('utf-8').split(',')
+    return fields[1:] if fields[0] == cle.decode('ascii') else None
+
+
+def lookup(root: str, day_str: str, cles):
+    """[(statut, date_surveillance, date_inscription)] des cle à la fin de day_str, lus dans
+    l'instantané du jour (NON_INSCRIT si absent du registre). None sans instantané.
+    L'instantané étant trié par cle, un CSV est parcouru par dichotomie (quelques lectures
+    par cle, sans le charger); csv.gz et parquet sont lus en flux jusqu'à la plus grande
+    cle demandée, sans dictionnaire du registre."""
+    path = find_snapshot(root, day_str)
+    if path is None:
+        return None
+    found = {}
+    wanted = {cle for cle in cles if cle.isascii()}  # une cle_bdf est ASCII
+    if wanted and lake_io.format_of(path) == 'csv':
+        with open(path, 'rb') as f:
+            f.readline()  # en-tête
+            start, size = f.tell(), os.path.getsize(path)
+            for cle in wanted:
+                vals = _csv_find(f, start, size, cle.encode('ascii'))
+                if vals is not None:
+                    found[cle] = vals
+    elif wanted:
+        last = max(wanted)
+        with lake_io.open_rows(path) as (_header, rows):
+            for cle, *vals in rows:
+                if cle > last:
+                    break
+                if cle in wanted:
+                    found[cle] = vals
+    out = []
+    for cle in cles:
+        vals = found.get(cle)
+        out.append((vals[0], vals[2], vals[3]) if vals else ('NON_INSCRIT', '', ''))
+    return out
+
+
+# -- validation --------------------------------------------------------------------------
+
+def replay(root: str, day_str: str) -> dict:
+    """Registre recalculé depuis tout l'historique, sans instantané ni mise à jour en place:
+    événements regroupés par client puis règles appliquées une fois (max des dates)."""
+    before = ordinal_iso(iso_ordinal(day_str) + 1)
+    survs, inscs, rads = {}, {}, {}
+    for _path, rows in lake_io.iter_area(os.path.join(root, 'inscription'), before):
+        for row in rows:
+            if len(row) != 5:
+                continue
+            cle, statut, type_inc, d_surv, d_insc = row
+            if statut == STATUT_SURVEILLANCE and d_surv:
+                survs.setdefault(cle, []).append((d_surv, type_inc))
+            elif statut == STATUT_INSCRIT and d_insc:
+                inscs.setdefault(cle, []).append((d_insc, type_inc, d_surv))
+    for _path, rows in lake_io.iter_area(os.path.join(root, 'radiation'), before):
+        for row in rows:
+            if len(row) == 4:
+                key = (row[0], row[1])
+                rads[key] = min(rads.get(key, row[2]), row[2])
+    reg = {}
+    for cle, events in inscs.items():
+        d_insc, type_inc, d_surv = max(events)
+        d_rad = rads.get((cle, d_insc), '')
+        reg[cle] = [STATUT_RADIE if d_rad else STATUT_INSCRIT, type_inc, d_surv, d_insc, d_rad]
+    for cle, events in survs.items():
+        if cle not in reg:
+            d_surv, type_inc = max(events)
+            reg[cle] = [STATUT_SURVEILLANCE, type_inc, d_surv, '', '']
+    return reg
+
+
+def compare(snapshot: dict, expected: dict):
+    """[(cle, ligne de l'instantané ou None, ligne attendue ou None)] des écarts, triés par cle."""
+    return [(cle, snapshot.get(cle), expected.get(cle)) for cle in sorted(snapshot.keys() | expected.keys())
+            if snapshot.get(cle) != expected.get(cle)]
+
+
+def latest_day(root: str):
+    sources = lake_io.list_sources(os.path.join(root, 'inscription'))
+    return max(src.days[-1] for src in sources) if sources else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', type=str, default=os.path.join(os.path.dirname(__file__), '..', 'ficp_data_lake'))
+    parser.add_argument('--date', type=str, help='Jour de l\'instantane YYYY-MM-DD (defaut: dernier jour du lake)')
+    parser.add_argument('--format', type=str, choices=lake_io.FORMATS, default='csv', help='Format de l\'instantane')
+    parser.add_argument('--check', action='store_true', help='Compare l\'instantane a une relecture complete')
+    parser.add_argument('--limit', type=int, default=20, help='Ecarts affiches avec --check (0 = tous)')
+    args = parser.parse_args(argv)
+
+    day_str = args.date or latest_day(args.root)
+    if day_str is None:
+        print(f'Lake vide: {args.root}')
+        return 1
+    try:
+        iso_ordinal(day_str)
+    except ValueError:
+        print('Date invalide, format attendu YYYY-MM-DD')
+        return 2
+
+    if args.check:
+        path = find_snapshot(args.root, day_str)
+        if path is None:
+            print(f'Pas d\'instantane pour {day_str} dans {registre_dir(args.root)}')
+            return 1
+        diffs = compare(read_snapshot(path), replay(args.root, day_str))
+        print(f'{path}: {len(diffs)} ecart(s) avec la relecture complete')
+        for cle, got, want in diffs if args.limit == 0 else diffs[:args.limit]:
+            print(f'- {cle}: instantane {got} / relecture {want}')
+        return 1 if diffs else 0
+
+    try:
+        lake_io.check_format(args.format)
+    except ValueError as ex:
+        print(ex)
+        return 2
+    reg = state_at(args.root, day_str)
+    path = write_snapshot(args.root, day_str, reg, args.format)
+    counts = {}
+    for vals in reg.values():
+        counts[vals[0]] = counts.get(vals[0], 0) + 1
+    print(f'{path}: {len(reg)} clients ({", ".join(f"{k} {v}" for k, v in sorted(counts.items()))})')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Génération partitionnée par cle_bdf: l'historique des clients réparti entre N processus.
+
+Les délais (PAIEMENT, radiation) et le statut d'un client ne dépendent que de sa cle et
+de sa propre chronologie: les clients sont indépendants. Le shard d'un client est
+crc32(cle) % N; chaque processus shard détient la part de l'historique de ses clients
+(EventStore.split, history_store.py) et de l'échéancier, et calcule pour eux, chaque jour:
+- les inscriptions PAIEMENT dues (scheduled_paiements);
+- les radiations dues (scheduled_radiations);
+- les statuts des consultations de clients connus (EventStore.status_batch);
+puis avance sa part de l'historique avec les événements du jour.
+
+Le processus principal garde ce qui est global: les clients connus (tirage des nouvelles
+cle et de l'échantillon de consultations, dans l'ordre de generate_day), l'écriture des
+fichiers et le registre. Deux échanges par jour avec tous les shards (échéances PAIEMENT,
+puis le reste du jour); les lignes des shards sont fusionnées dans l'ordre canonique
+(tri pour inscriptions et radiations, rang dans l'échantillon pour les statuts): les
+fichiers sont identiques à ceux de generate_day, quel que soit N.
+
+L'historique est chargé par le processus principal (load_history: état ou relecture),
+réparti entre les shards au démarrage (colonnes par shard, envoyées telles quelles) et
+rassemblé à la fin pour sauvegarder l'état.
+
+Usage:
+    python scripts/generate_ficp_daily.py --start 2025-01-01 --end 2025-12-31 --shards 4
+"""
+
+import zlib
+import random
+import traceback
+import multiprocessing
+from datetime import datetime
+
+import metrics
+import generate_ficp_daily as gen
+from history_store import EventStore
+
+
+def shard_of(cle: str, n: int) -> int:
+    return zlib.crc32(cle.encode('ascii')) % n
+
+
+def split_history(history, n: int):
+    """Répartit (events, _, schedule) en n parts (events, schedule) par shard de cle."""
+    events, _known, schedule = history
+    parts = [(part, gen.new_schedule()) for part in events.split(n, lambda cle: shard_of(cle, n))]
+    for o, entries in schedule['paiement'].items():
+        for entry in entries:
+            parts[shard_of(entry[0], n)][1]['paiement'][o].add(entry)
+    for o, entries in schedule['radiation'].items():
+        for entry in entries:
+            parts[shard_of(entry[0], n)][1]['radiation'][o].append(entry)
+    return parts
+
+
+def merge_parts(parts, known):
+    """Inverse de split_history: l'historique complet à partir des parts des shards."""
+    schedule = gen.new_schedule()
+    for _events, part_sched in parts:
+        for o, entries in part_sched['paiement'].items():
+            schedule['paiement'][o] |= entries
+        for o, entries in part_sched['radiation'].items():
+            schedule['radiation'][o].extend(entries)
+    return EventStore.merge([events for events, _ in parts]), known, schedule
+
+
+# -- processus shard -------------------------------------------------------------------
+
+def shard_main(conn):
+    """Boucle d'un shard: une commande (op, args...) reçue, une réponse ('ok'|'error', ...)."""
+    events = schedule = None
+    while True:
+        msg = conn.recv()
+        op = msg[0]
+        try:
+            if op == 'load':
+                events, schedule = msg[1]
+                result = None
+            elif op == 'paiements':
+                result = gen.scheduled_paiements(msg[1], events, schedule)
+            elif op == 'day':
+                result = shard_day(events, schedule, *msg[1:])
+            elif op == 'absorb':
+                gen.apply_inscription_rows(msg[1], events, set(), schedule)
+                result = None
+            elif op == 'dump':
+                result = (events, schedule)
+            elif op == 'stop':
+                conn.send(('ok', None))
+                return
+            else:
+                raise ValueError(f'commande inconnue: {op}')
+        except Exception:  # renvoyé au processus principal, qui la relève
+            conn.send(('error', traceback.format_exc()))
+            continue
+        conn.send(('ok', result))
+
+
+def shard_day(events: EventStore, schedule, day: datetime, directs, survs, status_keys, paiements_today):
+    """Part d'un shard dans generate_day, après le tirage des cle du jour par le principal.
+    Retourne (radiations du jour triées, statuts de status_keys dans leur ordre)."""
+    d_ord = day.toordinal()
+    for cle in directs:
+        events.add_inscription(cle, d_ord, 'SURENDETTEMENT')
+        gen.schedule_inscription(schedule, cle, d_ord, 'SURENDETTEMENT')
+    for cle in survs:
+        events.add_surveillance(cle, d_ord)
+        gen.schedule_surveillance(schedule, cle, d_ord)
+    today_rad = gen.scheduled_radiations(day, schedule)
+    statuses = events.status_batch([(cle, d_ord) for cle in status_keys])
+    for cle, last_surv in paiements_today:
+        events.add_inscription(cle, d_ord, 'PAIEMENT', last_surv)
+        gen.schedule_inscription(schedule, cle, d_ord, 'PAIEMENT')
+    return today_rad, statuses
+
+
+# -- processus principal ---------------------------------------------------------------
+
+class ShardSet:
+    """N processus shards détenant chacun l'historique de ses clients."""
+
+    def __init__(self, n: int, history):
+        self.n = n
+        self.known = history[1]
+        self.conns, self.procs = [], []
+        for _ in range(n):
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=shard_main, args=(child,), daemon=True)
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+        with metrics.phase('shard_load'):
+            self.call([('load', part) for part in split_history(history, n)])
+
+    def call(self, messages):
+        """Envoie messages[i] au shard i (tous avant la première réponse), puis rassemble."""
+        for conn, msg in zip(self.conns, messages):
+            conn.send(msg)
+        results = []
+        errors = []
+        for i, conn in enumerate(self.conns):
+            status, result = conn.recv()
+            if status == 'error':
+                errors.append(f'shard {i}: {result}')
+            results.append(result)
+        if errors:
+            raise RuntimeError('\n'.join(errors))
+        return results
+
+    def split(self, keys):
+        """[cle par shard] en conservant l'ordre de keys."""
+        out = [[] for _ in range(self.n)]
+        for cle in keys:
+            out[shard_of(cle, self.n)].append(cle)
+        return out
+
+    def generate_day(self, day: datetime, keys=None):
+        """Equivalent de generate_ficp_daily.generate_day (moteur python), réparti."""
+        day_str = gen.str_date(day)
+        known_clients = self.known
+        keys = keys or gen.KeyStream(day)
+        new_key = keys.new_key
+        sample_rng = random.Random(gen.day_seed(day, 'sample'))
+
+        # 1) Inscriptions PAIEMENT programmées aujourd'hui, fusionnées dans l'ordre canonique
+        with metrics.phase('paiement_scan'):
+            parts = self.call([('paiements', day)] * self.n)
+            today_insc = sorted(row for insc, _ in parts for row in insc)
+            paiements_today = sorted(p for _, pay in parts for p in pay)
+
+        # 2) Nouveaux événements et échantillon de consultations: tirages dans l'ordre de generate_day
+        new_direct, new_surv = gen.split_new_events(len(today_insc))
+        with metrics.phase('new_events'):
+            directs = []
+            for _ in range(new_direct):
+                cle = new_key(known_clients)
+                known_clients.add(cle)
+                directs.append(cle)
+                today_insc.append((cle, 'INSCRIT', 'SURENDETTEMENT', '', day_str))
+            survs = []
+            for _ in range(new_surv):
+                cle = new_key(known_clients)
+                known_clients.add(cle)
+                survs.append(cle)
+                today_insc.append((cle, 'SURVEILLANCE', 'PAIEMENT', day_str, ''))
+
+        with metrics.phase('consultation_sample'):
+            known_pool = known_clients
+            nb_known = int(gen.CONSULTATIONS_PAR_JOUR * gen.PART_CONNUS)
+            nb_new = gen.CONSULTATIONS_PAR_JOUR - nb_known
+            known_sample = []
+            for _ in range(nb_known):
+                if known_pool:
+                    cle = sample_rng.choice(known_pool)
+                else:
+                    cle = new_key(known_clients)
+                    known_clients.add(cle)
+                known_sample.append(cle)
+            new_consult = []
+            for _ in range(nb_new):
+                cle = new_key(known_clients)
+                known_clients.add(cle)
+                new_consult.append(cle)
+
+        # 3) Radiations, statuts et avancement de l'historique dans les shards
+        with metrics.phase('shard_day'):
+            by_shard = [self.split(lst) for lst in (directs, survs, known_sample)]
+            pay_by_shard = [[] for _ in range(self.n)]
+            for p in paiements_today:
+                pay_by_shard[shard_of(p[0], self.n)].append(p)
+            parts = self.call([('day', day, by_shard[0][s], by_shard[1][s], by_shard[2][s], pay_by_shard[s])
+                               for s in range(self.n)])
+            today_rad = sorted(row for rad, _ in parts for row in rad)
+            statuses = [iter(st) for _, st in parts]
+
+        consult_rows = []
+        for cle in known_sample:
+            statut, d_surv, d_insc = next(statuses[shard_of(cle, self.n)])
+            consult_rows.append((cle, day_str, statut, d_surv, d_insc))
+        consult_rows.extend((cle, day_str, 'NON_INSCRIT', '', '') for cle in new_consult)
+        return consult_rows, today_insc, today_rad
+
+    def absorb_existing_day(self, day: datetime, existing, reg=None):
+        """Equivalent de generate_ficp_daily.absorb_existing_day: fichiers déjà présents de day."""
+        day_str = gen.str_date(day)
+        consult_files, inscr_files, rad_files = existing
+        with metrics.phase('existing_days'):
+            insc_rows = [r for p in inscr_files for r in gen.lake_io.read_day(p, day_str)[1]]
+            per_shard = [[] for _ in range(self.n)]
+            for row in insc_rows:
+                self.known.add(row[0])
+                per_shard[shard_of(row[0], self.n)].append(row)
+            self.call([('absorb', rows) for rows in per_shard])
+            for path in consult_files:
+                gen.apply_consultation_rows(gen.lake_io.read_day(path, day_str)[1], self.known)
+        if reg is not None:
+            with metrics.phase('registre'):
+                gen.update_registre(day, reg, insc_rows,
+                                    [r for p in rad_files for r in gen.lake_io.read_day(p, day_str)[1]])
+        metrics.count('days_existing')
+
+    def history(self):
+        """Historique complet rassemblé depuis les shards (pour save_history_snapshot)."""
+        with metrics.phase('shard_collect'):
+            return merge_parts(self.call([('dump',)] * self.n), self.known)
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(('stop',))
+                conn.recv()
+            except (OSError, EOFError):
+                pass
+            conn.close()
+        for proc in self.procs:
+            proc.join(5)
+            if proc.is_alive():
+                proc.terminate()
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Envoi du data lake local vers un stockage objet, en parallèle et par contenu.
+
+Chaque fichier du lake est envoyé sous son chemin relatif ("consultation/2025-01-01.csv"):
+les zones, les partitions mensuelles et leur .index.json (sans lequel une partition ne se
+relit pas), registre/ et kpi/. Ne sont pas envoyés les fichiers propres à la machine ou
+reconstructibles: _state/ (état du générateur), _zonemap/ (index de lake_index.py, à
+reconstruire côté destination avec --update), _manifest.json (audit). --skip DIR écarte
+d'autres dossiers de premier niveau (ex. --skip kpi --skip registre).
+- MD5 local repris du manifest de audit_lake.py (--save-manifest) si taille et mtime correspondent,
+  calculé sinon; un fichier dont le MD5 distant est identique n'est pas renvoyé, si bien
+  qu'un rattrapage ou une regénération --overwrite n'envoie que les fichiers modifiés;
+- envoi par blocs de --chunk-size octets (déposés puis validés en une fois avec le MD5,
+  comme les blocs d'un blob Azure): un fichier n'est visible qu'entier;
+- chaque appel au stockage est retenté --retries fois sur erreur transitoire (réseau,
+  HTTP 429/5xx), avec une attente doublée à chaque essai (--backoff, plafonnée à 30 s);
+- --workers fichiers au plus sont traités en même temps (pool de threads).
+
+Destinations (backends, voir backend_for):
+- un répertoire local (chemin ou file://...): le MD5 de chaque objet est rangé à part
+  dans .md5/ (l'équivalent du Content-MD5 d'un blob);
+- http://hote:port/prefixe: serveur HTTP minimal, dont --serve DIR est le bouchon local
+  (HEAD -> Content-MD5, PUT ?offset= pour un bloc, PUT ?commit= pour valider), pour
+  tester le débit hors ligne (--latency simule l'aller-retour réseau);
+- azure://conteneur: Azure Blob Storage (paquet azure-storage-blob, chaîne de connexion
+  dans AZURE_STORAGE_CONNECTION_STRING).
+
+Usage:
+    python scripts/upload_lake.py DEST [--root DIR] [--workers 8] [--chunk-size 4194304] [--dry-run]
+    python scripts/upload_lake.py --serve DIR [--port 8765] [--latency 0.02]
+    python scripts/generate_ficp_daily.py --date YYYY-MM-DD --upload DEST
+"""
+
+import os
+import time
+import base64
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from azure.core.exceptions import AzureError, HttpResponseError
+    from azure.storage.blob import ContainerClient, ContentSettings
+except ImportError:  # backend azure:// optionnel
+    ContainerClient = None
+
+import metrics
+import audit_lake
+import lake_index
+from compact_lake import file_md5
+
+CHUNK_SIZE = 4 << 20
+BACKOFF_MAX = 30.0
+SKIPPED_DIRS = ('_state', lake_index.INDEX_DIR)
+SKIPPED_FILES = (audit_lake.MANIFEST_NAME,)
+
+RETRY_LOCK = threading.Lock()  # metrics n'est pas prévu pour les threads
+
+
+class TransientError(Exception):
+    """Erreur du stockage qui vaut d'être retentée (surcharge, coupure)."""
+
+
+# -- backends --------------------------------------------------------------------------
+# remote_md5(name) -> MD5 hexa de l'objet ou None; stage(name, offset, data);
+# commit(name, size, md5): rend visible l'objet assemblé à partir des blocs déposés.
+
+class LocalBackend:
+    """Répertoire local tenant lieu de stockage objet."""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, *parts) -> str:
+        path = os.path.abspath(os.path.join(self.root, *parts))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f'nom d\'objet invalide: {parts[-1]}')
+        return path
+
+    def remote_md5(self, name: str):
+        try:
+            with open(self._path('.md5', name), 'r', encoding='ascii') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def stage(self, name: str, offset: int, data: bytes):
+        path = self._path('.partial', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'r+b' if offset else 'wb') as f:
+            f.seek(offset)
+            f.write(data)
+
+    def commit(self, name: str, size: int, md5: str):
+        partial, final, sidecar = self._path('.partial', name), self._path(name), self._path('.md5', name)
+        if size == 0:
+            open(partial, 'wb').close()
+        if os.path.getsize(partial) != size or file_md5(partial) != md5:
+            raise TransientError(f'{name}: blocs incomplets')
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(partial, final)
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        with open(sidecar, 'w', encoding='ascii') as f:
+            f.write(md5)
+
+
+class HttpBackend:
+    """Stockage derrière le protocole du bouchon --serve (voir StandInHandler)."""
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method: str, name: str, query: str = '', data: bytes = None, headers=None):
+        url = f'{self.url}/{urllib.parse.quote(name)}' + (f'?{query}' if query else '')
+        req = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                resp.read()
+                return resp.status, resp.headers
+        except urllib.error.HTTPError as ex:
+            if ex.code == 404:
+                return 404, ex.headers
+            if ex.code == 429 or ex.code >= 500:
+                raise TransientError(f'{method} {name}: HTTP {ex.code}') from ex
+            raise ValueError(f'{method} {name}: HTTP {ex.code}') from ex
+
+    def remote_md5(self, name: str):
+        status, headers = self._request('HEAD', name)
+        if status == 404 or not headers.get('Content-MD5'):
+            return None
+        return base64.b64decode(headers['Content-MD5']).hex()
+
+    def stage(self, name: str, offset: int, data: bytes):
+        self._request('PUT', name, f'offset={offset}', data)
+
+    def commit(self, name: str, size: int, md5: str):
+        self._request('PUT', name, f'commit={size}', b'',
+                      {'Content-MD5': base64.b64encode(bytes.fromhex(md5)).decode('ascii')})
+
+
+class AzureBlobBackend:
+    """Conteneur Azure Blob Storage: blocs stage_block puis commit_block_list avec le MD5.
+    Les exceptions du SDK sont traduites comme les codes HTTP de HttpBackend (_call)."""
+
+    def __init__(self, container: str):
+        if ContainerClient is None:
+            raise ValueError('azure:// necessite le paquet azure-storage-blob (pip install azure-storage-blob)')
+        conn = os.environ.get('AZURE_STORAGE_CONNECTION_STRING')
+        if not conn:
+            raise ValueError('azure:// necessite AZURE_STORAGE_CONNECTION_STRING')
+        self.container = ContainerClient.from_connection_string(conn, container)
+        self.blocks = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _call(what: str, fn, *args, **kwargs):
+        """fn(*args, **kwargs); HTTP 429/5xx et erreurs réseau -> TransientError, le reste
+        des erreurs du SDK -> ValueError."""
+        try:
+            return fn(*args, **kwargs)
+        except HttpResponseError as ex:
+            status = ex.status_code or 0
+            if status == 429 or status >= 500:
+                raise TransientError(f'{what}: HTTP {status}') from ex
+            raise ValueError(f'{what}: HTTP {status} {ex.reason or ""}'.rstrip()) from ex
+        except AzureError as ex:  # ServiceRequestError, ServiceResponseError: connexion, délai
+            raise TransientError(f'{what}: {type(ex).__name__}') from ex
+
+    def remote_md5(self, name: str):
+        blob = self.container.get_blob_client(name)
+        if not self._call(f'HEAD {name}', blob.exists):
+            return None
+        md5 = self._call(f'HEAD {name}', blob.get_blob_properties).content_settings.content_md5
+        return bytes(md5).hex() if md5 else None
+
+    def stage(self, name: str, offset: int, data: bytes):
+        block_id = f'{offset:020d}'
+        self._call(f'PUT {name}', self.container.get_blob_client(name).stage_block, block_id, data)
+        with self.lock:
+            ids = self.blocks.setdefault(name, [])
+            if block_id not in ids:
+                ids.append(block_id)
+
+    def commit(self, name: str, size: int, md5: str):
+        with self.lock:
+            ids = sorted(self.blocks.pop(name, []))
+        settings = ContentSettings(content_md5=bytearray(bytes.fromhex(md5)))
+        try:
+            self._call(f'PUT {name}', self.container.get_blob_client(name).commit_block_list, ids,
+                       content_settings=settings)
+        except TransientError:
+            with self.lock:  # blocs à nouveau disponibles pour la tentative suivante
+                self.blocks[name] = ids
+            raise
+
+
+def backend_for(dest: str):
+    if dest.startswith(('http://', 'https://')):
+        return HttpBackend(dest)
+    if dest.startswith('azure://'):
+        return AzureBlobBackend(dest[len('azure://'):].strip('/'))
+    if dest.startswith('file://'):
+        dest = urllib.parse.urlparse(dest).path
+    return LocalBackend(dest)
+
+
+# -- envoi -----------------------------------------------------------------------------
+
+def lake_files(root: str, skip=SKIPPED_DIRS):
+    """[(nom relatif posix, chemin)] des fichiers à envoyer, triés (hors dossiers skip)."""
+    out = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root)
+        dirnames[:] = sorted(d for d in dirnames if not (rel_dir == '.' and d in skip) and not d.startswith('.'))
+        for name in filenames:
+            if (rel_dir == '.' and name in SKIPPED_FILES) or name.endswith('.tmp') or name.startswith('.'):
+                continue
+            rel = name if rel_dir == '.' else f'{rel_dir}/{name}'.replace(os.sep, '/')
+            out.append((rel, os.path.join(dirpath, name)))
+    return sorted(out)
+
+
+def local_md5(path: str, rel: str, manifest: dict) -> str:
+    """MD5 du fichier: celui du manifest de l'audit s'il est à jour, sinon calculé."""
+    entry = manifest.get(rel)
+    if entry is not None:
+        st = os.stat(path)
+        if entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['md5']
+    return file_md5(path)
+
+
+def with_retry(fn, *args, retries: int = 5, backoff: float = 0.5, sleep=time.sleep):
+    """fn(*args), retenté sur TransientError ou OSError avec une attente doublée à chaque essai."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except (TransientError, OSError):
+            if attempt == retries:
+                raise
+            with RETRY_LOCK:
+                metrics.count('upload_retries')
+            sleep(min(backoff * 2 ** attempt, BACKOFF_MAX))
+
+
+def upload_file(backend, rel: str, path: str, manifest: dict, chunk_size: int = CHUNK_SIZE, retries: int = 5,
+                backoff: float = 0.5, dry_run: bool = False):
+    """Envoie un fichier s'il diffère de l'objet distant. Retourne (état, octets envoyés),
+    état parmi 'skipped' (identique), 'pending' (à envoyer, --dry-run) et 'sent'."""
+    md5 = local_md5(path, rel, manifest)
+    if with_retry(backend.remote_md5, rel, retries=retries, backoff=backoff) == md5:
+        return 'skipped', 0
+    if dry_run:
+        return 'pending', 0
+    size = 0
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(chunk_size), b''):
+            with_retry(backend.stage, rel, size, data, retries=retries, backoff=backoff)
+            size += len(data)
+    with_retry(backend.commit, rel, size, md5, retries=retries, backoff=backoff)
+    return 'sent', size
+
+
+def upload(root: str, dest, workers: int = 8, chunk_size: int = CHUNK_SIZE, retries: int = 5,
+           backoff: float = 0.5, dry_run: bool = False, skip=SKIPPED_DIRS):
+    """Envoie le lake root vers dest (chemin, URL ou backend), hors dossiers skip. Retourne un résumé:
+    {'files', 'sent', 'skipped', 'bytes', 'pending': [nom], 'errors': [(nom, message)],
+    'retries', 'seconds'}."""
+    backend = backend_for(dest) if isinstance(dest, str) else dest
+    manifest = audit_lake.load_manifest(root)
+    files = lake_files(root, skip)
+    summary = {'files': len(files), 'sent': 0, 'skipped': 0, 'bytes': 0, 'errors': [], 'pending': []}
+    retries_before = metrics.CURRENT.counters.get('upload_retries', 0)
+    t0 = time.perf_counter()
+    with metrics.phase('upload'), ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(rel, pool.submit(upload_file, backend, rel, path, manifest, chunk_size, retries, backoff, dry_run))
+                   for rel, path in files]
+        for rel, future in futures:
+            try:
+                state, sent = future.result()
+            except (TransientError, OSError, ValueError) as ex:
+                summary['errors'].append((rel, str(ex)))
+                continue
+            if state == 'pending':
+                summary['pending'].append(rel)
+            else:
+                summary[state] += 1
+                summary['bytes'] += sent
+    summary['seconds'] = time.perf_counter() - t0
+    summary['retries'] = metrics.CURRENT.counters.get('upload_retries', 0) - retries_before
+    metrics.count('files_uploaded', summary['sent'])
+    metrics.count('bytes_uploaded', summary['bytes'])
+    metrics.count('files_skipped', summary['skipped'])
+    return summary
+
+
+# -- bouchon HTTP ----------------------------------------------------------------------
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Stockage objet minimal au-dessus d'un LocalBackend (self.server.backend)."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _name(self):
+        url = urllib.parse.urlparse(self.path)
+        return urllib.parse.unquote(url.path).lstrip('/'), urllib.parse.parse_qs(url.query)
+
+    def _reply(self, status: int, headers=None, body: bytes = b''):
+        time.sleep(self.server.latency)
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        name, _ = self._name()
+        try:
+            md5 = self.server.backend.remote_md5(name)
+        except ValueError:
+            return self._reply(400)
+        if md5 is None:
+            return self._reply(404)
+        self._reply(200, {'Content-MD5': base64.b64encode(bytes.fromhex(md5)).decode('ascii')})
+
+    def do_GET(self):
+        name, _ = self._name()
+        try:
+            with open(self.server.backend._path(name), 'rb') as f:
+                body = f.read()
+        except (ValueError, OSError):
+            return self._reply(404)
+        self._reply(200, {'Content-Type': 'application/octet-stream'}, body)
+
+    def do_PUT(self):
+        name, query = self._name()
+        data = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        backend = self.server.backend
+        try:
+            if 'offset' in query:
+                backend.stage(name, int(query['offset'][0]), data)
+            elif 'commit' in query:
+                md5 = base64.b64decode(self.headers.get('Content-MD5', '')).hex()
+                backend.commit(name, int(query['commit'][0]), md5)
+            else:
+                return self._reply(400)
+        except TransientError:
+            return self._reply(503)
+        except (ValueError, OSError):
+            return self._reply(400)
+        self._reply(201)
+
+
+def make_server(folder: str, port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Bouchon HTTP servant folder sur 127.0.0.1:port (0: port libre, voir server_address)."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    server.daemon_threads = True
+    server.backend = LocalBackend(folder)
+    server.latency = latency
+    return server
+
+
+def print_summary(summary: dict, dest: str):
+    mb = summary['bytes'] / 1e6
+    rate = mb / summary['seconds'] if summary['seconds'] else 0.0
+    print(f"[upload] {dest}: {summary['files']} fichiers, {summary['sent']} envoyes ({mb:.1f} Mo, {rate:.1f} Mo/s), "
+          f"{summary['skipped']} identiques, {len(summary['pending'])} a envoyer, {len(summary['errors'])} en erreur, "
+          f"{summary['retries']} nouvelles tentatives en {summary['seconds']:.2f}s")
+    for rel, message in summary['errors']:
+        print(f'  ERREUR {rel}: {message}')
+    for rel in summary['pending']:
+        print(f'  a envoyer: {rel}')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Envoi du data lake FICP vers un stockage objet")
+    parser.add_argument('dest', nargs='?', help='Destination: repertoire, http://hote:port/prefixe ou azure://conteneur')
+    parser.add_argument('--root', type=str, help='Racine du lake (defaut: ficp_data_lake/)')
+    parser.add_argument('--workers', type=int, default=8, help='Fichiers envoyes en parallele')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Taille des blocs envoyes (octets)')
+    parser.add_argument('--retries', type=int, default=5, help='Nouvelles tentatives par appel sur erreur transitoire')
+    parser.add_argument('--backoff', type=float, default=0.5, help='Attente avant la 1re nouvelle tentative (s), doublee ensuite')
+    parser.add_argument('--dry-run', action='store_true', help='Liste les fichiers a envoyer sans rien envoyer')
+    parser.add_argument('--skip', action='append', default=[], metavar='DIR',
+                        help=f'Dossier de premier niveau a ne pas envoyer, en plus de {", ".join(SKIPPED_DIRS)}')
+    parser.add_argument('--serve', type=str, metavar='DIR', help='Lance le bouchon HTTP servant DIR')
+    parser.add_argument('--port', type=int, default=8765, help='Port du bouchon HTTP')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latence ajoutee a chaque requete du bouchon (s)')
+    parser.add_argument('--metrics', nargs='?', const='-', metavar='FICHIER',
+                        help='Compteurs et durees par phase (JSON sur stdout, ou dans FICHIER)')
+    parser.add_argument('--profile', type=str, metavar='FICHIER', help='Profil cProfile de l\'execution (pstats)')
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        server = make_server(args.serve, args.port, args.latency)
+        print(f'[serve] http://127.0.0.1:{server.server_address[1]}/ -> {os.path.abspath(args.serve)}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+    if not args.dest:
+        parser.error('destination requise (ou --serve DIR)')
+
+    root = args.root or audit_lake.DEFAULT_LAKE
+    with metrics.session('upload_lake', args.metrics, args.profile) as m:
+        summary = upload(root, args.dest, args.workers, args.chunk_size, args.retries, args.backoff, args.dry_run,
+                         SKIPPED_DIRS + tuple(args.skip))
+        print_summary(summary, args.dest)
+        m.exit_code = 1 if summary['errors'] else 0
+    return m.exit_code
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Validate the FICP business rules across the whole lake.
+
+One pass over the three areas, each file read once in date order:
+- inscription/: builds the indexes (surveillance dates per cle, set of (cle, inscription
+  date), set of inscribed cle) and checks rules that only need the row itself;
+- radiation/: checked against the inscription indexes (hash lookups);
+- consultation/: row-level chronology checks.
+
+Rules (violation codes):
+- paiement_delay: an INSCRIT PAIEMENT row has a surveillance of the same cle 31..37 days
+  before its date_inscription
+- surveillance_type: a SURVEILLANCE row has type_incident PAIEMENT (never SURENDETTEMENT)
+- radiation_order: date_radiation is after date_inscription
+- radiation_orphan: the radiated cle has an inscription
+- radiation_mismatch: the cle has an inscription at the radiated date_inscription
+- duplicate_event: the same surveillance (cle, date), inscription (cle, date) or
+  radiation (cle, inscription date, radiation date) appears only once in the lake, even
+  across daily files (the file-level MD5 check of audit_lake.py cannot see these)
+- consultation_chronology: date_surveillance and date_inscription are not after
+  date_consultation
+- consultation_status: SURVEILLANCE has date_surveillance and no date_inscription,
+  INSCRIT has date_inscription
+- shape / bad_date: unparsable rows (wrong column count, invalid date)
+
+Every violation is reported with its file and line; nothing stops at the first one.
+
+External-memory mode (--memory-budget ROWS), for lakes whose clients do not fit in
+memory: instead of the indexes, every surveillance, inscription and radiation is spilled
+as a record keyed by cle_bdf into sorted runs of at most ROWS records (temporary files
+under --spill-dir). The runs are merged, at most MERGE_FAN_IN files at a time, and the
+cross-file rules are checked per cle on the merged stream. Same violations as the
+in-memory mode, sorted by file and line.
+
+Usage (from repo root):
+  python scripts/validate_lake.py [ficp_data_lake] [--limit 50]
+  python scripts/validate_lake.py --memory-budget 1000000 [--spill-dir /mnt/tmp]
+"""
+import os
+import heapq
+import shutil
+import argparse
+import tempfile
+from itertools import groupby
+from collections import Counter
+
+import lake_io
+from history_store import iso_ordinal, ordinal_iso
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_LAKE = os.path.join(ROOT, 'ficp_data_lake')
+
+PAIEMENT_DMIN, PAIEMENT_DMAX = 31, 37
+MERGE_FAN_IN = 64
+
+# record kinds of the external mode: for one cle, surveillances sort before
+# inscriptions and inscriptions before radiations
+KIND_SURVEILLANCE, KIND_INSCRIPTION, KIND_RADIATION = '0', '1', '2'
+
+
+class Violation:
+    def __init__(self, rule, path, line, message):
+        self.rule = rule
+        self.path = path
+        self.line = line
+        self.message = message
+
+    def __str__(self):
+        return f"{self.path}:{self.line}: [{self.rule}] {self.message}"
+
+
+def iter_rows(folder: str, width: int, violations: list):
+    """Yield (path, line number, row) for every well-formed row of the lake files in
+    folder (any format, daily files and monthly partitions, see lake_io), in date order.
+    The line number counts the header as line 1. Rows of the wrong width are reported as
+    'shape'."""
+    for path, rows in lake_io.iter_area(folder):
+        for line, row in enumerate(rows, 2):
+            if len(row) != width:
+                violations.append(Violation('shape', path, line, f"{len(row)} columns, expected {width}"))
+                continue
+            yield path, line, row
+
+
+def in_paiement_window(surv_ordinal, insc_ordinal):
+    return PAIEMENT_DMIN <= insc_ordinal - surv_ordinal <= PAIEMENT_DMAX
+
+
+def paiement_delay_message(cle, insc_ordinal, surveillance_ordinals):
+    if not surveillance_ordinals:
+        return f"{cle}: PAIEMENT inscription without surveillance"
+    return (f"{cle}: no surveillance {PAIEMENT_DMIN}..{PAIEMENT_DMAX} days before {ordinal_iso(insc_ordinal)} "
+            f"(surveillances: {', '.join(map(ordinal_iso, sorted(surveillance_ordinals)))})")
+
+
+def duplicate_message(cle, kind, a, b=0):
+    if kind == KIND_SURVEILLANCE:
+        return f"{cle}: surveillance {ordinal_iso(a)} repeated"
+    if kind == KIND_INSCRIPTION:
+        return f"{cle}: inscription {ordinal_iso(a)} repeated"
+    return f"{cle}: radiation {ordinal_iso(b)} of inscription {ordinal_iso(a)} repeated"
+
+
+class LakeValidator:
+    """Row-level checks while reading the areas; cross-file rules on in-memory indexes
+    fed by the add_* hooks, completed in finish()."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.violations = []
+        self.rows = Counter()  # area -> rows checked
+        self.surveillances = {}  # cle -> [ordinal]
+        self.inscribed = set()  # cle with at least one INSCRIT row
+        self.inscription_dates = set()  # (cle, inscription ordinal)
+        self.radiations = set()  # (cle, inscription ordinal, radiation ordinal)
+        self.pending = []  # PAIEMENT rows whose surveillance is not indexed yet
+
+    def report(self, rule, path, line, message):
+        self.violations.append(Violation(rule, path, line, message))
+
+    def run(self):
+        self.check_inscriptions()
+        self.check_radiations()
+        self.check_consultations()
+        self.finish()
+        return self.violations
+
+    def check_inscriptions(self):
+        n = 0
+        for path, line, (cle, statut, type_inc, d_surv, d_insc) in iter_rows(
+                os.path.join(self.root, 'inscription'), 5, self.violations):
+            n += 1
+            try:
+                if statut == 'SURVEILLANCE':
+                    if type_inc != 'PAIEMENT':
+                        self.report('surveillance_type', path, line, f"{cle}: SURVEILLANCE with type_incident {type_inc}")
+                    self.add_surveillance(cle, iso_ordinal(d_surv), path, line)
+                elif statut == 'INSCRIT':
+                    self.add_inscription(cle, iso_ordinal(d_insc), type_inc, path, line)
+            except ValueError as ex:
+                self.report('bad_date', path, line, f"{cle}: {ex}")
+        self.rows['inscription'] = n
+
+    def check_radiations(self):
+        n = 0
+        for path, line, (cle, d_insc, d_rad, _type_inc) in iter_rows(
+                os.path.join(self.root, 'radiation'), 4, self.violations):
+            n += 1
+            try:
+                oi, orad = iso_ordinal(d_insc), iso_ordinal(d_rad)
+            except ValueError as ex:
+                self.report('bad_date', path, line, f"{cle}: {ex}")
+                continue
+            if orad <= oi:
+                self.report('radiation_order', path, line, f"{cle}: radiation {d_rad} not after inscription {d_insc}")
+            self.add_radiation(cle, oi, orad, path, line)
+        self.rows['radiation'] = n
+
+    def check_consultations(self):
+        n = 0
+        for path, line, (cle, d_cons, statut, d_surv, d_insc) in iter_rows(
+                os.path.join(self.root, 'consultation'), 5, self.violations):
+            n += 1
+            try:
+                oc = iso_ordinal(d_cons)
+                if d_surv and iso_ordinal(d_surv) > oc:
+                    self.report('consultation_chronology', path, line, f"{cle}: surveillance {d_surv} after consultation {d_cons}")
+                if d_insc and iso_ordinal(d_insc) > oc:
+                    self.report('consultation_chronology', path, line, f"{cle}: inscription {d_insc} after consultation {d_cons}")
+            except ValueError as ex:
+                self.report('bad_date', path, line, f"{cle}: {ex}")
+            if statut == 'SURVEILLANCE' and not (d_surv and not d_insc):
+                self.report('consultation_status', path, line, f"{cle}: SURVEILLANCE with dates ({d_surv!r}, {d_insc!r})")
+            elif statut == 'INSCRIT' and not d_insc:
+                self.report('consultation_status', path, line, f"{cle}: INSCRIT without date_inscription")
+        self.rows['consultation'] = n
+
+    # -- cross-file rules on in-memory indexes ------------------------------------------
+
+    def add_surveillance(self, cle, o, path, line):
+        dates = self.surveillances.setdefault(cle, [])
+        if o in dates:
+            self.report('duplicate_event', path, line, duplicate_message(cle, KIND_SURVEILLANCE, o))
+        dates.append(o)
+
+    def add_inscription(self, cle, o, type_inc, path, line):
+        if (cle, o) in self.inscription_dates:
+            self.report('duplicate_event', path, line, duplicate_message(cle, KIND_INSCRIPTION, o))
+        self.inscribed.add(cle)
+        self.inscription_dates.add((cle, o))
+        if type_inc == 'PAIEMENT' and not self.has_paiement_surveillance(cle, o):
+            self.pending.append((path, line, cle, o))
+
+    def add_radiation(self, cle, oi, orad, path, line):
+        if (cle, oi, orad) in self.radiations:
+            self.report('duplicate_event', path, line, duplicate_message(cle, KIND_RADIATION, oi, orad))
+        self.radiations.add((cle, oi, orad))
+        if cle not in self.inscribed:
+            self.report('radiation_orphan', path, line, f"{cle}: radiation without inscription")
+        elif (cle, oi) not in self.inscription_dates:
+            self.report('radiation_mismatch', path, line, f"{cle}: no inscription dated {ordinal_iso(oi)}")
+
+    def has_paiement_surveillance(self, cle, insc_ordinal):
+        return any(in_paiement_window(s, insc_ordinal) for s in self.surveillances.get(cle, ()))
+
+    def finish(self):
+        # surveillance read after its inscription (files out of chronological order)
+        for path, line, cle, o in self.pending:
+            if not self.has_paiement_surveillance(cle, o):
+                self.report('paiement_delay', path, line, paiement_delay_message(cle, o, self.surveillances.get(cle)))
+
+
+class ExternalValidator(LakeValidator):
+    """Same rules in bounded memory: events spilled to sorted runs, merge-joined by cle."""
+
+    def __init__(self, root: str, budget_rows: int, spill_dir: str = None):
+        super().__init__(root)
+        self.budget_rows = max(1, budget_rows)
+        self.spill_dir = spill_dir
+        self.tmp = None
+        self.buffer = []
+        self.runs = []
+        self.nb_runs_written = 0
+        self.paths = []  # file id -> path
+        self.path_ids = {}
+
+    def run(self):
+        self.tmp = tempfile.mkdtemp(prefix='ficp_validate_', dir=self.spill_dir)
+        try:
+            super().run()
+        finally:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+        self.violations.sort(key=lambda v: (v.path, v.line))
+        return self.violations
+
+    # -- sorted runs ----------------------------------------------------------------------
+
+    def spill(self, cle, kind, a, b, path, line, type_inc=''):
+        """Fixed-width numbers: the text order of the records is the order of
+        (cle, kind, a, b, file, line), so runs are sorted and merged as plain strings."""
+        file_id = self.path_ids.get(path)
+        if file_id is None:
+            file_id = self.path_ids[path] = len(self.paths)
+            self.paths.append(path)
+        self.buffer.append(f"{cle}\t{kind}\t{a:07d}\t{b:07d}\t{file_id:06d}\t{line:09d}\t{type_inc}\n")
+        if len(self.buffer) >= self.budget_rows:
+            self.flush_run()
+
+    def flush_run(self):
+        if self.buffer:
+            self.buffer.sort()
+            self.runs.append(self.write_run(self.buffer))
+            self.buffer = []
+
+    def write_run(self, records):
+        path = os.path.join(self.tmp, f'run{self.nb_runs_written:06d}.txt')
+        self.nb_runs_written += 1
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(records)
+        return path
+
+    def merge_runs(self):
+        """Merge passes until at most MERGE_FAN_IN runs remain."""
+        runs = self.runs
+        while len(runs) > MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(runs), MERGE_FAN_IN):
+                group = runs[i:i + MERGE_FAN_IN]
+                files = [open(p, 'r', encoding='utf-8', newline='') for p in group]
+                try:
+                    merged.append(self.write_run(heapq.merge(*files)))
+                finally:
+                    for f in files:
+                        f.close()
+                for p in group:
+                    os.remove(p)
+            runs = merged
+        return runs
+
+    def add_surveillance(self, cle, o, path, line):
+        self.spill(cle, KIND_SURVEILLANCE, o, 0, path, line)
+
+    def add_inscription(self, cle, o, type_inc, path, line):
+        self.spill(cle, KIND_INSCRIPTION, o, 0, path, line, type_inc)
+
+    def add_radiation(self, cle, oi, orad, path, line):
+        self.spill(cle, KIND_RADIATION, oi, orad, path, line)
+
+    # -- merge-join -----------------------------------------------------------------------
+
+    def finish(self):
+        self.flush_run()
+        files = [open(p, 'r', encoding='utf-8', newline='') for p in self.merge_runs()]
+        try:
+            records = (rec.rstrip('\n').split('\t') for rec in heapq.merge(*files))
+            for cle, group in groupby(records, key=lambda rec: rec[0]):
+                self.check_client(cle, group)
+        finally:
+            for f in files:
+                f.close()
+
+    def check_client(self, cle, records):
+        """Records of one cle: surveillances, then inscriptions, then radiations, by date."""
+        survs = []  # ordinals
+        inscriptions = set()  # ordinals
+        last = None
+        for _, kind, a, b, file_id, line, type_inc in records:
+            a, b, path, line = int(a), int(b), self.paths[int(file_id)], int(line)
+            if (kind, a, b) == last:
+                self.report('duplicate_event', path, line, duplicate_message(cle, kind, a, b))
+            last = (kind, a, b)
+            if kind == KIND_SURVEILLANCE:
+                survs.append(a)
+            elif kind == KIND_INSCRIPTION:
+                inscriptions.add(a)
+                if type_inc == 'PAIEMENT' and not any(in_paiement_window(s, a) for s in survs):
+                    self.report('paiement_delay', path, line, paiement_delay_message(cle, a, survs))
+            elif not inscriptions:
+                self.report('radiation_orphan', path, line, f"{cle}: radiation without inscription")
+            elif a not in inscriptions:
+                self.report('radiation_mismatch', path, line, f"{cle}: no inscription dated {ordinal_iso(a)}")
+
+
+def validate(root: str, memory_budget: int = None, spill_dir: str = None):
+    """All violations of the lake at root (empty list when coherent). With memory_budget
+    (records per sorted run) the cross-file rules run out of core."""
+    if memory_budget:
+        return ExternalValidator(root, memory_budget, spill_dir).run()
+    return LakeValidator(root).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate FICP business rules across the lake.')
+    parser.add_argument('root', nargs='?', default=DEFAULT_LAKE, help='lake root (default: ficp_data_lake)')
+    parser.add_argument('--limit', type=int, default=50, help='violations printed (0 = all)')
+    parser.add_argument('--memory-budget', type=int, metavar='ROWS',
+                        help='external-memory mode: events held in memory per sorted run')
+    parser.add_argument('--spill-dir', type=str, help='directory for the sorted runs (default: system temp)')
+    args = parser.parse_args(argv)
+
+    if args.memory_budget:
+        validator = ExternalValidator(args.root, args.memory_budget, args.spill_dir)
+    else:
+        validator = LakeValidator(args.root)
+    violations = validator.run()
+
+    print("VALIDATION SUMMARY")
+    for area in ('inscription', 'radiation', 'consultation'):
+        print(f"- {area}: {validator.rows[area]} rows")
+    if not violations:
+        print("\nVIOLATIONS: none")
+        return 0
+    print(f"\nVIOLATIONS: {len(violations)}")
+    for rule, count in sorted(Counter(v.rule for v in violations).items()):
+        print(f"- {rule}: {count}")
+    shown = violations if args.limit == 0 else violations[:args.limit]
+    print()
+    for v in shown:
+        print(v)
+    if len(shown) < len(violations):
+        print(f"... {len(violations) - len(shown)} more (use --limit 0)")
+    return 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import filecmp
+import contextlib
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+
+START = datetime(2025, 1, 1)
+AREAS = ('consultation', 'inscription', 'radiation')
+# globaux du générateur réécrits par gen.set_data_root
+ROOT_GLOBALS = ('DATA_ROOT', 'DIR_CONSULT', 'DIR_INSCR', 'DIR_RAD', 'DIR_STATE', 'STATE_PATH',
+                'EVENTS_PATH')
+
+
+def point_generator(mp, root):
+    for name in ROOT_GLOBALS:
+        mp.setattr(gen, name, getattr(gen, name))
+    gen.set_data_root(root)
+    return gen.DATA_ROOT
+
+
+@pytest.fixture(autouse=True)
+def _restore_data_root(monkeypatch):
+    # un test qui appelle gen.set_data_root ne déplace pas le lake des tests suivants
+    for name in ROOT_GLOBALS:
+        monkeypatch.setattr(gen, name, getattr(gen, name))
+
+
+@pytest.fixture
+def data_root(monkeypatch):
+    """data_root(root): pointe le générateur sur root jusqu'à la fin du test."""
+    return lambda root: point_generator(monkeypatch, str(root))
+
+
+@pytest.fixture(scope='session')
+def build_lake():
+    """build_lake(root, nb_days, start=START, daily=False, **kwargs): génère nb_days jours.
+
+    generate_range par défaut, ou generate_daily jour par jour (daily=True); kwargs passés
+    tels quels (use_state, workers, shards...). Le générateur reste pointé sur son lake
+    d'origine une fois le lake construit.
+    """
+    def build(root, nb_days, start=START, daily=False, **kwargs):
+        with pytest.MonkeyPatch.context() as mp, contextlib.redirect_stdout(None):
+            point_generator(mp, str(root))
+            if daily:
+                for i in range(nb_days):
+                    gen.generate_daily(start + timedelta(days=i), **kwargs)
+            else:
+                gen.generate_range(start, start + timedelta(days=nb_days - 1), **kwargs)
+        return str(root)
+    return build
+
+
+@pytest.fixture(scope='session')
+def assert_same_lake():
+    """assert_same_lake(a, b, nb_days=None): mêmes fichiers, octet pour octet, dans les 3 zones."""
+    def check(a, b, nb_days=None):
+        for area in AREAS:
+            names = sorted(os.listdir(os.path.join(a, area)))
+            assert names == sorted(os.listdir(os.path.join(b, area)))
+            match, mismatch, errors = filecmp.cmpfiles(os.path.join(a, area), os.path.join(b, area), names,
+                                                       shallow=False)
+            assert not mismatch and not errors, f"{area}: {mismatch or errors}"
+            assert nb_days is None or len(match) == nb_days
+    return check
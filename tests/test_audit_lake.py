@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import shutil
+import hashlib
+import contextlib
+import subprocess
+from io import StringIO
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import audit_lake  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 5
+
+
+def build_lake(root):
+    gen.set_data_root(root)
+    with contextlib.redirect_stdout(None):
+        gen.generate_range(START, START + timedelta(days=NB_DAYS - 1), use_state=False)
+
+
+def test_scan_file_single_pass(tmp_path):
+    path = tmp_path / '2025-01-01.csv'
+    content = 'a,b,c\r\n1,2,3\r\n"x\r\ny",2,3\r\n1,2\r\n\r\n4,5,6'
+    path.write_bytes(content.encode('utf-8'))
+    header, rows, bad_rows, digest = audit_lake.scan_file(str(path), 3)
+    assert header == ['a', 'b', 'c']
+    assert (rows, bad_rows) == (5, 2)  # champ multi-ligne = 1 ligne, ligne vide = mauvaise largeur
+    assert digest == hashlib.md5(content.encode('utf-8')).hexdigest()
+
+    empty = tmp_path / 'empty.csv'
+    empty.write_bytes(b'')
+    assert audit_lake.scan_file(str(empty), 3) == (None, 0, 0, hashlib.md5(b'').hexdigest())
+
+
+def test_audit_area_reports_problems(tmp_path):
+    root = str(tmp_path)
+    build_lake(root)
+    infos, problems = audit_lake.audit_area(root, 'consultation')
+    assert problems == []
+    assert len(infos) == NB_DAYS
+    assert sum(fi.rows for fi in infos) == NB_DAYS * gen.CONSULTATIONS_PAR_JOUR
+    for fi in infos:
+        with open(fi.path, 'rb') as f:
+            assert fi.md5 == hashlib.md5(f.read()).hexdigest()
+
+    folder = os.path.join(root, 'inscription')
+    os.remove(os.path.join(folder, '2025-01-03.csv'))
+    with open(os.path.join(folder, '2025-01-02.csv'), 'a', encoding='utf-8') as f:
+        f.write('TOOSHORT,INSCRIT\n')
+    with open(os.path.join(folder, '2025-01-04.csv'), 'wb'):
+        pass
+    _, problems = audit_lake.audit_area(root, 'inscription')
+    assert any('1 row(s) with wrong column count' in p and '2025-01-02' in p for p in problems)
+    assert any(p.startswith('Read error') and '2025-01-04' in p for p in problems)
+    assert any(p.startswith('Missing days in inscription') and '2025-01-03' in p for p in problems)
+
+
+def test_manifest_skips_unchanged_files(tmp_path):
+    root = str(tmp_path)
+    build_lake(root)
+    with contextlib.redirect_stdout(None):
+        assert audit_lake.main([root]) == 0  # lecture seule par défaut
+    assert sorted(os.listdir(root)) == ['consultation', 'inscription', 'radiation']
+    with contextlib.redirect_stdout(None):
+        assert audit_lake.main([root, '--save-manifest', '--save-kpi']) == 0
+    assert os.path.exists(os.path.join(root, '_state', 'kpi.json'))
+    catalog = audit_lake.load_manifest(root)
+    assert len(catalog) == 3 * NB_DAYS
+    entry = catalog['radiation/2025-01-02.csv']
+    assert (entry['area'], entry['date'], entry['header_ok']) == ('radiation', '2025-01-02', True)
+
+    # fichier modifié: seul lui est relu, le reste vient du manifeste
+    path = os.path.join(root, 'inscription', '2025-01-02.csv')
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('TOOSHORT,INSCRIT\n')
+    infos, problems = audit_lake.audit_area(root, 'inscription', audit_lake.load_manifest(root))
+    assert [os.path.basename(fi.path) for fi in infos if not fi.cached] == ['2025-01-02.csv']
+    assert any('1 row(s) with wrong column count' in p for p in problems)
+
+    # un fichier supprimé sort du catalogue; --full relit tout
+    os.remove(os.path.join(root, 'consultation', '2025-01-05.csv'))
+    with contextlib.redirect_stdout(None):
+        assert audit_lake.main([root, '--full', '--save-manifest']) == 1
+    catalog = audit_lake.load_manifest(root)
+    assert 'consultation/2025-01-05.csv' not in catalog
+    assert catalog['inscription/2025-01-02.csv']['bad_rows'] == 1
+
+
+def test_workers_give_same_report(tmp_path):
+    root = str(tmp_path)
+    build_lake(root)
+    with open(os.path.join(root, 'radiation', '2025-01-03.csv'), 'a', encoding='utf-8') as f:
+        f.write('TOOSHORT\n')
+    reports = []
+    for workers in ('1', '2'):
+        out = StringIO()
+        with contextlib.redirect_stdout(out):
+            assert audit_lake.main([root, '--full', '--workers', workers]) == 1
+        reports.append(out.getvalue().replace('from manifest: 0', ''))
+    assert reports[0] == reports[1]
+    assert 'radiation/2025-01-03.csv: 1 row(s)' in reports[0].replace(os.sep, '/')
+
+
+def test_missing_lake_is_reported_not_created(tmp_path):
+    # copie des scripts: rien ne doit apparaître à côté (ficp_data_lake/ par défaut)
+    scripts = os.path.join(str(tmp_path), 'repo', 'scripts')
+    shutil.copytree(os.path.join(os.path.dirname(__file__), '..', 'scripts'), scripts,
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    root = os.path.join(str(tmp_path), 'absent')
+    for argv in ([root], []):
+        proc = subprocess.run([sys.executable, os.path.join(scripts, 'audit_lake.py')] + argv,
+                              capture_output=True, text=True)
+        assert proc.returncode == 1
+        assert 'Missing folder' in proc.stdout
+    assert not os.path.exists(root)
+    assert sorted(os.listdir(os.path.join(str(tmp_path), 'repo'))) == ['scripts']
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import contextlib
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import ficp_daemon  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 12
+
+
+def test_warm_generation_matches_cold_runs(tmp_path, data_root, build_lake, assert_same_lake):
+    cold, warm_root = str(tmp_path / 'cold'), str(tmp_path / 'warm')
+    build_lake(cold, NB_DAYS, daily=True)
+
+    data_root(warm_root)
+    with contextlib.redirect_stdout(None):
+        gen.generate_daily(START)  # état initial sur disque
+    warm = ficp_daemon.WarmGenerator(checkpoint=0)
+    assert warm.upto == START + timedelta(days=1)
+    for i in range(1, 6):
+        result = warm.trigger()
+        assert result['days'] == [gen.str_date(START + timedelta(days=i))] and not result['resynced']
+    # un jour regénéré sous le service: l'historique est rechargé (relecture, pas d'état à jour)
+    with contextlib.redirect_stdout(None):
+        gen.generate_daily(START + timedelta(days=3), overwrite=True, use_state=False)
+    result = warm.trigger(START + timedelta(days=NB_DAYS - 1))
+    assert result['resynced'] and len(result['days']) == NB_DAYS - 6
+    status = warm.status()
+    assert status['triggers'] == 6 and status['resyncs'] == 1 and status['days_generated'] == NB_DAYS - 1
+    assert status['unsaved_days'] == NB_DAYS - 6 and status['rss_kb'] > 0
+    warm.close()  # --checkpoint 0: état sauvegardé à l'arrêt
+    assert warm.history[1].folder  # relecture: registre créé puis gardé ouvert
+    assert_same_lake(cold, warm_root, NB_DAYS)
+
+    # état sauvegardé par le service: une exécution isolée reprend dessus
+    assert gen.load_history_snapshot(START + timedelta(days=NB_DAYS)) is not None
+
+
+def test_socket_and_trigger_file_commands(tmp_path):
+    root = str(tmp_path / 'lake')
+    gen.set_data_root(root)
+    warm = ficp_daemon.WarmGenerator(start=START)
+    trigger = str(tmp_path / 'run.trigger')
+    service = ficp_daemon.Service(warm, port=0, trigger_file=trigger, poll=0.05)
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    with contextlib.redirect_stdout(None):
+        thread.start()
+        reply = ficp_daemon.send('next', service.port)
+        assert reply['ok'] and reply['days'] == ['2025-01-01'] and 'consultation_status' in reply['phases']
+        reply = ficp_daemon.send('run 2025-01-04', service.port)
+        assert reply['days'] == ['2025-01-02', '2025-01-03', '2025-01-04']
+        assert not ficp_daemon.send('run hier', service.port)['ok']
+        assert not ficp_daemon.send('dance', service.port)['ok']
+
+        with open(trigger, 'w', encoding='utf-8') as f:
+            f.write('next')
+        ficp_daemon.send('status', service.port)  # réveille la boucle
+        while not os.path.exists(trigger + '.out'):
+            thread.join(0.05)
+        status = ficp_daemon.send('status', service.port)
+        assert status['upto'] == '2025-01-06' and status['days_generated'] == 5
+        assert ficp_daemon.send('stop', service.port)['ok']
+        thread.join(10)
+    assert not thread.is_alive()
+    assert sorted(os.listdir(os.path.join(root, 'inscription'))) == [f'2025-01-0{d}.csv' for d in range(1, 6)]
+
+
+def test_failed_trigger_keeps_service_and_resyncs(tmp_path, monkeypatch):
+    root = str(tmp_path / 'lake')
+    gen.set_data_root(root)
+    service = ficp_daemon.Service(ficp_daemon.WarmGenerator(start=START, checkpoint=0))
+    write_day = gen.write_day
+
+    def disk_full(*args):
+        raise OSError(28, 'No space left on device')
+
+    def corrupt(*args):
+        raise KeyError('cle')
+
+    with contextlib.redirect_stdout(None), contextlib.redirect_stderr(None):
+        assert service.handle('next')['days'] == ['2025-01-01']
+        monkeypatch.setattr(gen, 'write_day', disk_full)
+        reply = service.handle('next')
+        assert not reply['ok'] and reply['stale'] and service.running
+        monkeypatch.setattr(gen, 'write_day', corrupt)
+        reply = service.handle('next')
+        assert not reply['ok'] and reply['error'].startswith('KeyError') and service.running
+        monkeypatch.setattr(gen, 'write_day', write_day)
+        reply = service.handle('next')  # rechargé depuis le disque avant de générer
+        assert reply['ok'] and reply['resynced'] and reply['days'] == ['2025-01-02']
+
+        # lake avancé sous le service: next génère le jour suivant le lake rechargé
+        gen.generate_daily(START + timedelta(days=2))
+        gen.generate_daily(START + timedelta(days=3))
+        reply = service.handle('next')
+        assert reply['resynced'] and reply['days'] == ['2025-01-05']
+        service.close()
+    assert sorted(os.listdir(os.path.join(root, 'inscription'))) == [f'2025-01-0{d}.csv' for d in range(1, 6)]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import random
+import filecmp
+import contextlib
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import key_registry  # noqa: E402
+from key_registry import BloomFilter, KeyRegistry  # noqa: E402
+from history_store import PackedKeys  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 30
+
+
+def random_keys(rng, n):
+    return {gen.draw_key(rng) for _ in range(n)}
+
+
+def build_lake(root, use_state):
+    gen.set_data_root(root)
+    with contextlib.redirect_stdout(None):
+        for i in range(NB_DAYS):
+            gen.generate_daily(START + timedelta(days=i), use_state=use_state)
+
+
+def assert_same_lake(a, b):
+    for area in ('consultation', 'inscription', 'radiation'):
+        names = sorted(os.listdir(os.path.join(a, area)))
+        match, mismatch, errors = filecmp.cmpfiles(os.path.join(a, area), os.path.join(b, area), names, shallow=False)
+        assert len(match) == NB_DAYS and not mismatch and not errors, f"{area}: {mismatch or errors}"
+
+
+def test_registry_behaves_like_sorted_set(tmp_path, monkeypatch):
+    monkeypatch.setattr(key_registry, 'MERGE_MIN', 100)
+    rng = random.Random(7)
+    keys = random_keys(rng, 2000)
+    folder = str(tmp_path)
+    reg = KeyRegistry.create(folder, sorted(keys), '2025-01-01')
+    for day in range(3):
+        new = random_keys(rng, 40 if day < 2 else 120)  # le dernier lot dépasse MERGE_MIN
+        reg.update(new | set(rng.sample(sorted(keys), 10)))
+        keys |= new
+        upto = f'2025-01-0{day + 2}'
+        reg.save(upto)
+        reg = KeyRegistry.open(folder)
+        assert reg.upto == upto
+        expected = sorted(keys)
+        assert len(reg) == len(expected) and list(reg) == expected
+        assert [reg[i] for i in range(len(reg))] == expected
+        assert all(k in reg for k in rng.sample(expected, 200))
+        assert not any(k in reg for k in random_keys(rng, 200) - keys)
+    assert len(reg.delta) == 0 and len(reg.base) == len(keys)  # fusionné au dernier jour
+
+    # même tirage par rang que la liste triée
+    r1, r2 = random.Random(3), random.Random(3)
+    assert [r1.choice(reg) for _ in range(50)] == [r2.choice(sorted(keys)) for _ in range(50)]
+
+    # fichiers incohérents avec keys.json: registre invalide
+    with open(os.path.join(folder, key_registry.DELTA_NAME), 'a', encoding='ascii') as f:
+        f.write('ZZZZZZZZ00000,0\n')
+    assert KeyRegistry.open(folder) is None
+
+
+def test_in_memory_registry_merges_its_delta(monkeypatch):
+    monkeypatch.setattr(key_registry, 'MEMORY_MERGE', 100)
+    rng = random.Random(5)
+    keys = random_keys(rng, 500)
+    reg = KeyRegistry.in_memory(PackedKeys(sorted(keys)))
+    for _ in range(4):
+        new = random_keys(rng, 70)  # une fusion tous les deux lots
+        reg.update(new | set(rng.sample(sorted(keys), 10)))
+        keys |= new
+        expected = sorted(keys)
+        assert len(reg) == len(expected) and list(reg) == expected
+        assert [reg[i] for i in range(len(reg))] == expected
+        assert all(k in reg for k in new) and not any(k in reg for k in random_keys(rng, 100) - keys)
+    assert reg.folder is None and len(reg.delta) <= key_registry.MEMORY_MERGE
+
+
+def test_bloom_batch_matches_single_adds(monkeypatch):
+    keys = sorted(random_keys(random.Random(1), 5000))
+    batch, single = BloomFilter.for_capacity(5000), BloomFilter.for_capacity(5000)
+    batch.add_many(keys)
+    monkeypatch.setattr(key_registry, 'np', None)
+    single.add_many(keys)
+    assert batch.bits == single.bits
+    assert all(k in single for k in keys)
+    fp = sum(k in single for k in random_keys(random.Random(2), 20000) - set(keys))
+    assert fp < 20000 * 0.03
+
+
+def test_generation_with_merges_matches_full_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(key_registry, 'MERGE_MIN', 2000)  # une fusion tous les 2 ou 3 jours
+    a, b = str(tmp_path / 'state'), str(tmp_path / 'reload')
+    build_lake(a, use_state=True)
+    build_lake(b, use_state=False)
+    assert_same_lake(a, b)
+
+    day = START + timedelta(days=NB_DAYS)
+    gen.set_data_root(a)
+    _, known, _ = gen.load_history(day)
+    _, expected, _ = gen.load_history_upto(day)
+    assert known.folder and expected.folder is None and list(known) == list(expected)
+
+    # registre perdu: l'état est reconstruit depuis le lake, avec un registre neuf
+    os.remove(os.path.join(a, '_state', key_registry.META_NAME))
+    assert gen.load_history_snapshot(day) is None
+    with contextlib.redirect_stdout(None):
+        gen.generate_daily(day)
+    assert KeyRegistry.open(os.path.join(a, '_state')).upto == gen.str_date(day + timedelta(days=1))
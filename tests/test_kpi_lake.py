@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import os
+import csv
+import sys
+import contextlib
+from io import StringIO
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import audit_lake  # noqa: E402
+import compact_lake  # noqa: E402
+import kpi_lake  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 40
+
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def generate(root, first, last):
+    gen.set_data_root(root)
+    with contextlib.redirect_stdout(None):
+        gen.generate_range(START + timedelta(days=first), START + timedelta(days=last), use_state=False)
+
+
+def test_incremental_matches_recomputation(tmp_path):
+    root = str(tmp_path)
+    generate(root, 0, 29)
+    _, folded, rebuilt = kpi_lake.update(root)
+    assert (folded, rebuilt) == (90, True)
+
+    generate(root, 30, NB_DAYS - 1)
+    state, folded, rebuilt = kpi_lake.update(root)
+    assert (folded, rebuilt) == (30, False)
+    assert kpi_lake.update(root)[1:] == (0, False)
+    expected, _, _ = kpi_lake.update(root, full=True)
+    assert kpi_lake.daily_rows(state) == kpi_lake.daily_rows(expected)
+    assert kpi_lake.summary(state) == kpi_lake.summary(expected)
+
+    # comptages directs sur les fichiers
+    statuts = Counter()
+    types = Counter()
+    for name in os.listdir(os.path.join(root, 'consultation')):
+        statuts.update(row['statut_ficp'] for row in read_csv(os.path.join(root, 'consultation', name)))
+    for name in os.listdir(os.path.join(root, 'inscription')):
+        types.update(row['type_incident'] for row in read_csv(os.path.join(root, 'inscription', name))
+                     if row['statut_ficp'] == 'INSCRIT')
+    summary = kpi_lake.summary(state)
+    assert summary['consultations_by_statut'] == dict(statuts)
+    assert summary['inscriptions_by_type'] == dict(types)
+    assert summary['days'] == NB_DAYS
+    assert 0 < summary['radiation_rate'] <= 1
+
+    # compaction: fichiers remplacés, agrégats recalculés à l'identique
+    with contextlib.redirect_stdout(None):
+        compact_lake.main(['--root', root])
+    compacted, _, rebuilt = kpi_lake.update(root)
+    assert rebuilt and kpi_lake.daily_rows(compacted) == kpi_lake.daily_rows(expected)
+
+
+def test_cli_outputs_and_audit_summary(tmp_path):
+    root = str(tmp_path)
+    generate(root, 0, 4)
+    with contextlib.redirect_stdout(None):
+        assert kpi_lake.main([root]) == 0
+    rows = read_csv(os.path.join(root, 'kpi', 'kpi_daily.csv'))
+    assert [r['date'] for r in rows] == [gen.str_date(START + timedelta(days=i)) for i in range(5)]
+    assert all(int(r['consultations']) == gen.CONSULTATIONS_PAR_JOUR for r in rows)
+    assert os.path.exists(os.path.join(root, 'kpi', 'kpi_summary.json'))
+
+    out = StringIO()
+    with contextlib.redirect_stdout(out):
+        audit_lake.main([root])
+    assert 'KPI: 5 days, 0 file(s) folded in' in out.getvalue()
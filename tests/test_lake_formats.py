@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import contextlib
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import lake_io  # noqa: E402
+import audit_lake  # noqa: E402
+import validate_lake  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 40
+AREAS = ('consultation', 'inscription', 'radiation')
+
+
+def build_lake(root, fmt):
+    gen.set_data_root(root)
+    gen.configure(format=fmt)
+    with contextlib.redirect_stdout(None):
+        gen.generate_range(START, START + timedelta(days=NB_DAYS - 1))
+
+
+def lake_rows(root):
+    rows = {}
+    for area in AREAS:
+        folder = os.path.join(root, area)
+        for day_str, name in lake_io.list_day_files(folder):
+            with lake_io.open_rows(os.path.join(folder, name)) as (header, it):
+                rows[area, day_str] = (header, [list(r) for r in it])
+    return rows
+
+
+@pytest.fixture
+def restore_format(monkeypatch):
+    monkeypatch.setattr(gen, 'FORMAT', gen.FORMAT)
+
+
+@pytest.mark.parametrize('fmt', ['csv.gz', 'parquet'])
+def test_formats_hold_the_same_lake(fmt, tmp_path, restore_format):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    ref, other = str(tmp_path / 'csv'), str(tmp_path / fmt.replace('.', '_'))
+    build_lake(ref, 'csv')
+    build_lake(other, fmt)
+    assert all(name.endswith('.' + fmt) for area in AREAS for name in os.listdir(os.path.join(other, area)))
+    assert lake_rows(other) == lake_rows(ref)
+
+    day = START + timedelta(days=NB_DAYS)
+    gen.set_data_root(ref)
+    expected = gen.load_history_upto(day)
+    gen.set_data_root(other)
+    events, known, schedule = gen.load_history_upto(day)
+    assert (events, list(known), schedule) == (expected[0], list(expected[1]), expected[2])
+    assert gen.load_history_snapshot(day) is not None  # empreinte des fichiers .csv.gz / .parquet
+
+    store = HistoryStore.from_lake(other, day.toordinal())
+    assert (len(store), len(store.insc_date)) == (len(expected[1]), len(expected[0].base.insc_date))
+    assert validate_lake.validate(other) == []
+    with contextlib.redirect_stdout(None):
+        assert audit_lake.main([other, '--full', '--save-manifest']) == 0
+    assert len(audit_lake.load_manifest(other)) == 3 * NB_DAYS
+
+
+def test_overwrite_in_another_format_replaces_the_day(tmp_path, restore_format):
+    root = str(tmp_path)
+    build_lake(root, 'csv')
+    day = START + timedelta(days=NB_DAYS - 1)
+    before = lake_rows(root)
+
+    gen.configure(format='csv.gz')
+    with contextlib.redirect_stdout(None):
+        gen.generate_daily(day, overwrite=True, use_state=False)
+    consult, inscr, rad = gen.existing_day_files(day)
+    assert [os.path.basename(p) for p in consult + inscr + rad] == [gen.str_date(day) + '.csv.gz'] * 3
+    assert lake_rows(root) == before
+
+    # un lake mixte se relit normalement et un jour existant n'est pas regénéré
+    with contextlib.redirect_stdout(None):
+        gen.generate_range(START, day + timedelta(days=1), use_state=False)
+    assert validate_lake.validate(root) == []
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import random
+import contextlib
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import compact_lake  # noqa: E402
+import lake_index  # noqa: E402
+import lake_io  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 70
+
+
+def build_lake(root):
+    gen.set_data_root(root)
+    gen.configure(index=True)
+    try:
+        with contextlib.redirect_stdout(None):
+            gen.generate_range(START, START + timedelta(days=NB_DAYS - 1))
+    finally:
+        gen.configure(index=False)
+    with contextlib.redirect_stdout(None):
+        compact_lake.main(['--root', root, '--month', '2025-01'])
+
+
+def run_both(root, **kwargs):
+    indexed, full = {}, {}
+    rows = list(lake_index.query(root, stats=indexed, **kwargs))
+    assert rows == list(lake_index.query(root, use_index=False, stats=full, **kwargs))
+    assert indexed['blocks'] == full['blocks'] and full['blocks_read'] == full['blocks']
+    return rows, indexed
+
+
+def test_queries_match_full_scan(tmp_path):
+    root = str(tmp_path)
+    build_lake(root)
+    assert lake_index.update(root)['indexed'] == 0  # compaction de janvier déjà reportée dans l'index
+
+    rng = random.Random(5)
+    inscr = lake_io.read_day(os.path.join(root, 'inscription', '2025-01.csv'), '2025-01-15')[1]
+    for cle in [row[0] for row in rng.sample(inscr, 5)] + ['ZZZZZZZZ00000']:
+        rows, stats = run_both(root, cle=cle)
+        assert all(row[0] == cle for _, _, row in rows)
+        assert stats['blocks_read'] <= len({(a, d) for a, d, _ in rows}) + 10  # faux positifs du Bloom
+    assert not rows
+
+    rows, stats = run_both(root, date_from='2025-01-30', date_to='2025-02-02')
+    assert {d for _, d, _ in rows} == {'2025-01-30', '2025-01-31', '2025-02-01', '2025-02-02'}
+    assert stats['blocks_read'] == stats['blocks'] == 12
+
+    rows, stats = run_both(root, date_from='2025-01-10', date_to='2025-01-12', column='date_inscription',
+                           areas=('radiation',))
+    assert rows and all('2025-01-10' <= row[1] <= '2025-01-12' for _, _, row in rows)
+    assert stats['blocks_read'] < stats['blocks'] / 4
+
+
+def test_incremental_update(tmp_path):
+    root = str(tmp_path)
+    build_lake(root)
+    lake_index.update(root)
+    day = START + timedelta(days=NB_DAYS)
+    gen.set_data_root(root)
+    try:
+        with contextlib.redirect_stdout(None):
+            assert gen.main(['--root', root, '--date', gen.str_date(day), '--index']) == 0
+    finally:
+        gen.configure(index=False)
+    entries = lake_index.load_month(root, 'consultation', gen.str_date(day)[:7])
+    assert f'{gen.str_date(day)}.csv' in entries
+    assert lake_index.update(root) == {'files': 3 * 41, 'indexed': 0, 'months_written': 0}
+
+    # index existant: tenu à jour sans --index, une requête s'en sert sans rafraîchissement
+    day += timedelta(days=1)
+    gen.set_data_root(root)
+    with contextlib.redirect_stdout(None):
+        assert gen.main(['--root', root, '--date', gen.str_date(day)]) == 0
+    assert lake_index.update(root) == {'files': 3 * 42, 'indexed': 0, 'months_written': 0}
+    cle = lake_io.read_day(os.path.join(root, 'inscription', f'{gen.str_date(day)}.csv'), gen.str_date(day))[1][0][0]
+    rows, stats = run_both(root, cle=cle)
+    assert any(d == gen.str_date(day) for _, d, _ in rows)
+
+    # jour réécrit hors générateur: seul son fichier est réindexé
+    path = os.path.join(root, 'radiation', '2025-02-10.csv')
+    header, rows = lake_io.read_day(path, '2025-02-10')
+    lake_io.write_rows(path, header, rows[:1])
+    assert lake_index.update(root) == {'files': 3 * 42, 'indexed': 1, 'months_written': 1}
+    assert lake_index.load_month(root, 'radiation', '2025-02')['2025-02-10.csv']['blocks']['2025-02-10']['rows'] == 1
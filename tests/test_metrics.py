@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import pstats
+import contextlib
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import audit_lake  # noqa: E402
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_generator_and_audit_metrics(tmp_path):
+    root = str(tmp_path / 'lake')
+    out = str(tmp_path / 'gen.json')
+    prof = str(tmp_path / 'gen.prof')
+    with contextlib.redirect_stdout(None):
+        assert gen.main(['--root', root, '--start', '2025-01-01', '--days', '3',
+                         '--metrics', out, '--profile', prof]) == 0
+    data = read_json(out)
+    assert data['script'] == 'generate_ficp_daily' and data['exit_code'] == 0
+    for name in ('load_history', 'paiement_scan', 'new_events', 'radiation_scan',
+                 'consultation_status', 'write', 'save_state'):
+        assert name in data['phases'], name
+    assert data['phases']['write']['calls'] == 3
+    counters = data['counters']
+    written = [os.path.join(root, area, name) for area in ('consultation', 'inscription', 'radiation', '_state')
+               for name in os.listdir(os.path.join(root, area))]  # + état et registre de cle
+    assert counters['days_generated'] == 3 and counters['files_written'] == len(written)
+    assert counters['bytes_written'] == sum(os.path.getsize(path) for path in written)
+    assert counters['rows_written'] > 3 * gen.CONSULTATIONS_PAR_JOUR
+    assert pstats.Stats(prof).total_calls > 0
+
+    # jour suivant: l'historique est relu depuis l'état, la ligne METRICS part sur stdout
+    stdout = StringIO()
+    with contextlib.redirect_stdout(stdout):
+        assert gen.main(['--root', root, '--date', '2025-01-04', '--metrics']) == 0
+    line = stdout.getvalue().splitlines()[-1]
+    assert line.startswith('METRICS ')
+    day4 = json.loads(line[len('METRICS '):])['counters']
+    assert day4['files_read'] >= 1
+
+    with contextlib.redirect_stdout(None):
+        audit_lake.main([root, '--save-manifest', '--metrics', out])
+    data = read_json(out)
+    assert set(data['phases']) >= {'scan_consultation', 'scan_inscription', 'scan_radiation', 'report', 'kpi'}
+    assert data['counters']['files_scanned'] == 12
+    assert data['counters']['rows_scanned'] == counters['rows_written'] + day4['rows_written']
+    with contextlib.redirect_stdout(None):
+        audit_lake.main([root, '--metrics', out])
+    assert read_json(out)['counters']['files_cached'] == 12
+    assert 'files_scanned' not in read_json(out)['counters']
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import test_coherence  # noqa: E402
+import validate_lake  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 45
+
+
+@pytest.fixture
+def numpy_engine(monkeypatch):
+    for name in ('ENGINE', 'CONSULTATIONS_PAR_JOUR', 'EVENEMENTS_PAR_JOUR', 'PART_SURDET', 'PART_CONNUS'):
+        monkeypatch.setattr(gen, name, getattr(gen, name))
+    gen.configure(consultations=3000, evenements=900, engine='numpy')
+
+
+def test_md5_mod_array_matches_scalar_delays():
+    keys = [f'K{i:07d}ABCDE' for i in range(2000)]
+    pay = gen.SURV_TO_INS_DMIN + gen.md5_mod_array('pay:', keys, gen.SURV_TO_INS_DMAX - gen.SURV_TO_INS_DMIN + 1)
+    radd = gen.RAD_DMIN + gen.md5_mod_array('radd:', keys, gen.RAD_DMAX - gen.RAD_DMIN + 1)
+    radp = (gen.md5_mod_array('radp:', keys, 10000) / 10000.0) < gen.RAD_PROBA
+    assert pay.tolist() == [gen.payment_delay_days(k) for k in keys]
+    assert radd.tolist() == [gen.radiation_delay_days(k) for k in keys]
+    assert radp.tolist() == [gen.will_radiate(k) for k in keys]
+
+
+def test_numpy_engine_business_rules(numpy_engine, tmp_path, data_root, build_lake):
+    data_root(build_lake(tmp_path, NB_DAYS))
+
+    violations = validate_lake.validate(gen.DATA_ROOT)
+    assert not violations, '\n'.join(map(str, violations[:20]))
+
+    day = START + timedelta(days=NB_DAYS - 1)
+    consult_path, inscr_path, rad_path = gen.day_paths(day)
+    _, consult = test_coherence.read_csv(consult_path)
+    _, inscr = test_coherence.read_csv(inscr_path)
+    _, rad = test_coherence.read_csv(rad_path)
+    assert len(consult) == 3000 and len(inscr) == 900
+    assert len({row[0] for row in consult[1800:]}) == 1200  # nouveaux clients uniques
+    assert any(row[2] == 'PAIEMENT' and row[1] == 'INSCRIT' for row in inscr) and rad
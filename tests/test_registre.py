@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import contextlib
+from io import StringIO
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import registre  # noqa: E402
+import ficp_status  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 40  # couvre les radiations (J+18..24)
+
+
+@pytest.fixture
+def with_registre(monkeypatch):
+    monkeypatch.setattr(gen, 'REGISTRE', gen.REGISTRE)
+    gen.configure(registre=True)
+
+
+def build_lake(root):
+    gen.set_data_root(root)
+    with contextlib.redirect_stdout(None):
+        gen.generate_range(START, START + timedelta(days=NB_DAYS - 2))
+        gen.generate_daily(START + timedelta(days=NB_DAYS - 1))
+
+
+def status(root, *args):
+    out = StringIO()
+    with contextlib.redirect_stdout(out):
+        assert ficp_status.main(['--root', root, *args]) == 0
+    return out.getvalue().splitlines()[1].split(',')
+
+
+def test_daily_snapshots_match_full_replay(tmp_path, with_registre):
+    root = str(tmp_path)
+    build_lake(root)
+    days = [d for d, _ in gen.lake_io.list_day_files(registre.registre_dir(root))]
+    assert days == [gen.str_date(START + timedelta(days=i)) for i in range(NB_DAYS)]
+    for day_str in (days[10], days[-2], days[-1]):
+        snapshot = registre.read_snapshot(registre.find_snapshot(root, day_str))
+        assert registre.compare(snapshot, registre.replay(root, day_str)) == []
+
+    snapshot = registre.read_snapshot(registre.find_snapshot(root, days[-1]))
+    radie = next(cle for cle, vals in snapshot.items() if vals[0] == registre.STATUT_RADIE)
+    inscrit = next(cle for cle, vals in snapshot.items() if vals[0] == registre.STATUT_INSCRIT)
+    # le registre applique les radiations; la consultation garde la dernière inscription
+    assert status(root, '--cle', radie, '--registre')[2] == 'RADIE'
+    assert status(root, '--cle', radie)[2] == 'INSCRIT'
+    assert status(root, '--cle', inscrit, '--registre') == status(root, '--cle', inscrit)
+    assert status(root, '--cle', 'ZZZZZZZZ00000', '--registre')[2] == 'NON_INSCRIT'
+
+
+def test_rebuild_from_older_snapshot_and_check(tmp_path, with_registre):
+    root = str(tmp_path)
+    build_lake(root)
+    folder = registre.registre_dir(root)
+    last = gen.str_date(START + timedelta(days=NB_DAYS - 1))
+    expected = registre.read_snapshot(registre.find_snapshot(root, last))
+    for day_str, name in gen.lake_io.list_day_files(folder):
+        if day_str != '2025-01-10':
+            os.remove(os.path.join(folder, name))
+
+    with contextlib.redirect_stdout(None):
+        assert registre.main(['--root', root, '--format', 'csv.gz']) == 0  # instantané 01-10 + deltas
+        assert registre.main(['--root', root, '--check']) == 0
+    assert registre.read_snapshot(registre.find_snapshot(root, last)) == expected
+
+    tampered = dict(expected)
+    cle = next(iter(tampered))
+    del tampered[cle]
+    registre.write_snapshot(root, last, tampered)
+    out = StringIO()
+    with contextlib.redirect_stdout(out):
+        assert registre.main(['--root', root, '--check']) == 1
+    assert f'- {cle}: instantane None' in out.getvalue()
+
+
+def test_lookup_matches_snapshot(tmp_path, with_registre):
+    root = str(tmp_path)
+    build_lake(root)
+    day_str = gen.str_date(START + timedelta(days=NB_DAYS - 1))
+    snapshot = registre.read_snapshot(registre.find_snapshot(root, day_str))
+    keys = sorted(snapshot)
+    cles = keys[:2] + keys[len(keys) // 2:len(keys) // 2 + 50] + keys[-2:] + \
+        ['0', keys[0][:-1], keys[-1] + 'Z', 'ZZZZZZZZZZZZZZ', '', 'CLÉ', keys[3]]
+    expected = [(snapshot[c][0], snapshot[c][2], snapshot[c][3]) if c in snapshot else ('NON_INSCRIT', '', '')
+                for c in cles]
+    for fmt in ('csv', 'csv.gz'):
+        registre.write_snapshot(root, day_str, snapshot, fmt)
+        assert registre.lookup(root, day_str, cles) == expected
+    assert registre.lookup(root, gen.str_date(START + timedelta(days=NB_DAYS)), cles) is None
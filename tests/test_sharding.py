@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import contextlib
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import sharding  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 45
+
+
+def build(root, shards, data_root, build_lake):
+    build_lake(root, 1, start=START + timedelta(days=10), daily=True)  # jour déjà présent au milieu de la plage
+    build_lake(root, NB_DAYS, shards=shards)
+    data_root(root)
+    with contextlib.redirect_stdout(None):
+        gen.generate_daily(START + timedelta(days=NB_DAYS))  # reprise sur l'état sauvegardé
+
+
+def test_sharded_range_matches_single_process(tmp_path, data_root, build_lake, assert_same_lake):
+    ref = str(tmp_path / 'ref')
+    build(ref, 1, data_root, build_lake)
+    for shards in (2, 3):
+        root = str(tmp_path / f'shards{shards}')
+        build(root, shards, data_root, build_lake)
+        assert_same_lake(ref, root, NB_DAYS + 1)
+
+
+def test_split_and_merge_history_roundtrip(tmp_path, data_root, build_lake):
+    data_root(build_lake(tmp_path, 41))
+    day = START + timedelta(days=41)
+    history = gen.load_history_upto(day)
+    parts = sharding.split_history(history, 4)
+    assert sum(len(events) for events, _ in parts) == len(history[0])
+    for s, (events, schedule) in enumerate(parts):
+        assert all(sharding.shard_of(cle, 4) == s for cle in events.keys())
+        assert all(sharding.shard_of(entry[0], 4) == s for entries in schedule['paiement'].values()
+                   for entry in entries)
+    merged = sharding.merge_parts(parts, history[1])
+    assert merged[0] == history[0] and merged[1] is history[1]
+    for kind in ('paiement', 'radiation'):
+        assert ({o: sorted(e) for o, e in merged[2][kind].items() if e}
+                == {o: sorted(e) for o, e in history[2][kind].items() if e})
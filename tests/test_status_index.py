@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import random
+import contextlib
+from io import StringIO
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import ficp_status  # noqa: E402
+from history_store import EventStore, HistoryStore, NO_DATE, iso_ordinal, ordinal_iso  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 40
+
+
+def reference_status(cle, o, events):
+    # implémentation historique: filtrage + tri complet à chaque consultation
+    inscs = sorted([x for x in events.inscriptions(cle) if x[0] <= o], key=lambda x: x[0])
+    if inscs:
+        last_insc, _, surv_o = inscs[-1]
+        return 'INSCRIT', ordinal_iso(surv_o), ordinal_iso(last_insc)
+    survs = sorted(s for s in events.surveillances(cle) if s <= o)
+    if survs:
+        return 'SURVEILLANCE', ordinal_iso(survs[-1]), ''
+    return 'NON_INSCRIT', '', ''
+
+
+def random_pairs(rng, keys, n=3000):
+    return [(rng.choice(keys), (START + timedelta(days=rng.randrange(NB_DAYS + 5))).toordinal()) for _ in range(n)]
+
+
+@pytest.fixture(scope='module')
+def lake(tmp_path_factory, build_lake):
+    return build_lake(tmp_path_factory.mktemp('lake'), NB_DAYS)
+
+
+def test_bisect_status_matches_reference(lake, data_root):
+    data_root(lake)
+    events, known, _ = gen.load_history(START + timedelta(days=NB_DAYS))
+    pairs = random_pairs(random.Random(0), list(known)) + [('INCONNU000000', START.toordinal())]
+    expected = [reference_status(cle, o, events) for cle, o in pairs]
+    assert events.status_batch(pairs) == expected
+    assert {s for s, _, _ in expected} == {'INSCRIT', 'SURVEILLANCE', 'NON_INSCRIT'}
+
+
+def test_status_cli(tmp_path, data_root, build_lake):
+    root = build_lake(tmp_path / 'lake', NB_DAYS)
+    data_root(root)
+    events, _, _ = gen.load_history(START + timedelta(days=NB_DAYS))
+    cle = next(c for c in events.keys() if events.inscriptions(c)[:1] and events.inscriptions(c)[0][1] == 'PAIEMENT')
+    insc, surv = (ordinal_iso(o) for o in events.inscriptions(cle)[0][::2])
+
+    keys = tmp_path / 'cles.txt'
+    keys.write_text(f'{cle},{surv}\n{cle}\n', encoding='utf-8')
+    out = StringIO()
+    with contextlib.redirect_stdout(out):
+        assert ficp_status.main(['--root', root, '--keys', str(keys), '--date', insc]) == 0
+    lines = out.getvalue().splitlines()
+    assert lines[1] == f'{cle},{surv},SURVEILLANCE,{surv},'
+    assert lines[2] == f'{cle},{insc},INSCRIT,{surv},{insc}'
+
+
+def test_history_store_matches_generator_history(lake, data_root):
+    data_root(lake)
+    upto = START + timedelta(days=NB_DAYS)
+    events, known, _ = gen.load_history_upto(upto)
+    store = HistoryStore.from_lake(lake, upto.toordinal())
+    assert len(store) == len(known) > len(events)
+    assert store.nbytes() < 40 * len(known)
+
+    pairs = random_pairs(random.Random(1), list(known))
+    pairs += [('INCONNU000000', START.toordinal()), ('', START.toordinal()), ('CLÉ0000000000', START.toordinal())]
+    assert store.status_batch(pairs) == events.status_batch(pairs)
+    for cle in known:
+        assert store.inscriptions(cle) == events.inscriptions(cle)
+        assert store.surveillances(cle) == events.surveillances(cle)
+
+
+def test_event_store_delta_and_compaction(lake, data_root):
+    data_root(lake)
+    upto = START + timedelta(days=NB_DAYS)
+    mid = START + timedelta(days=NB_DAYS // 2)
+    full, known, _ = gen.load_history_upto(upto)
+    # base jusqu'à mid, puis les événements suivants en delta, dans l'ordre des dates
+    events, _ = EventStore.from_lake(lake, mid.toordinal())
+    later = []
+    for cle in full.keys():
+        later += [(o, 0, cle, None, NO_DATE) for o in full.surveillances(cle) if o >= mid.toordinal()]
+        later += [(o, 1, cle, t, s) for o, t, s in full.inscriptions(cle) if o >= mid.toordinal()]
+    for o, kind, cle, type_inc, surv_o in sorted(later):
+        if kind:
+            events.add_inscription(cle, o, type_inc, surv_o)
+        else:
+            events.add_surveillance(cle, o)
+    assert events.pending == len(later) > 0
+    assert events == full
+
+    pairs = random_pairs(random.Random(2), list(known))
+    expected = full.status_batch(pairs)
+    assert events.status_batch(pairs) == expected
+    since = mid.toordinal()
+    assert sorted(events.last_surveillances(since)) == sorted(full.last_surveillances(since))
+    assert sorted(events.inscriptions_since(since)) == sorted(full.inscriptions_since(since))
+
+    events.compact()
+    assert events.pending == 0 and not events.surv and not events.insc
+    assert events == full and events.status_batch(pairs) == expected
+    parts = events.split(3, lambda cle: ord(cle[0]) % 3)
+    assert all(parts) and sum(map(len, parts)) == len(full) and EventStore.merge(parts) == full
+
+
+def test_iso_ordinal():
+    assert iso_ordinal('2025-03-01') == datetime(2025, 3, 1).toordinal()
+    assert gen.parse_date('2025-03-01') == datetime(2025, 3, 1)
+    for bad in ('2025-3-01', '2025/03/01', '2025-02-30', 'abcd-ef-gh'):
+        with pytest.raises(ValueError):
+            iso_ordinal(bad)
+        with pytest.raises(ValueError):
+            gen.parse_date(bad)
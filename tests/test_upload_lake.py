@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import filecmp
+import pytest
+import threading
+import contextlib
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import audit_lake  # noqa: E402
+import upload_lake  # noqa: E402
+import lake_index  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 5
+
+
+def build_lake(root):
+    gen.set_data_root(root)
+    with contextlib.redirect_stdout(None):
+        for i in range(NB_DAYS):
+            gen.generate_daily(START + timedelta(days=i))
+
+
+def assert_same_tree(src, dest):
+    for rel, path in upload_lake.lake_files(src):
+        assert filecmp.cmp(path, os.path.join(dest, rel), shallow=False), rel
+
+
+def test_local_upload_skips_identical_files(tmp_path):
+    src, dest = str(tmp_path / 'lake'), str(tmp_path / 'remote')
+    build_lake(src)
+    lake_index.update(src)  # index dérivé: reconstruit côté destination, pas envoyé
+    summary = upload_lake.upload(src, dest, workers=4, chunk_size=4096)
+    assert summary['files'] == 3 * NB_DAYS and summary['sent'] == summary['files'] and not summary['errors']
+    assert_same_tree(src, dest)
+    assert not os.path.exists(os.path.join(dest, '_state')) and not os.path.exists(os.path.join(dest, '_zonemap'))
+    skip = upload_lake.SKIPPED_DIRS + ('radiation',)
+    assert [rel.split('/')[0] for rel, _ in upload_lake.lake_files(src, skip)] == ['consultation'] * NB_DAYS + \
+        ['inscription'] * NB_DAYS
+
+    # relance: tout est identique, MD5 repris du manifest de l'audit
+    with contextlib.redirect_stdout(None):
+        assert audit_lake.main([src, '--save-manifest']) == 0
+    summary = upload_lake.upload(src, dest)
+    assert summary['sent'] == 0 and summary['skipped'] == summary['files']
+
+    # jour regénéré: seuls ses fichiers modifiés repartent
+    gen.set_data_root(src)
+    with contextlib.redirect_stdout(None):
+        gen.generate_daily(START + timedelta(days=NB_DAYS - 1), overwrite=True, use_state=False)
+        gen.generate_daily(START + timedelta(days=NB_DAYS))
+    summary = upload_lake.upload(src, dest, dry_run=True)
+    assert summary['pending'] == [f'{area}/{gen.str_date(START + timedelta(days=NB_DAYS))}.csv'
+                                  for area in ('consultation', 'inscription', 'radiation')]
+    summary = upload_lake.upload(src, dest)
+    assert summary['sent'] == 3 and summary['skipped'] == 3 * NB_DAYS
+    assert_same_tree(src, dest)
+
+
+class Flaky(upload_lake.LocalBackend):
+    """Un dépôt de bloc sur trois échoue de façon transitoire."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def stage(self, name, offset, data):
+        with self.lock:
+            self.calls += 1
+            fail = self.calls % 3 == 0
+        if fail:
+            raise upload_lake.TransientError('503')
+        super().stage(name, offset, data)
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def test_http_stand_in_and_retries(tmp_path):
+    src, remote = str(tmp_path / 'lake'), str(tmp_path / 'remote')
+    build_lake(src)
+    server = upload_lake.make_server(remote)
+    try:
+        url = serve(server)
+        summary = upload_lake.upload(src, url, workers=3, chunk_size=10000)
+        assert summary['sent'] == summary['files'] and not summary['errors']
+        assert_same_tree(src, remote)
+        assert upload_lake.upload(src, url)['skipped'] == summary['files']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    other = str(tmp_path / 'flaky')
+    summary = upload_lake.upload(src, Flaky(other), chunk_size=20000, backoff=0)
+    assert summary['retries'] > 0 and summary['sent'] == summary['files'] and not summary['errors']
+    assert_same_tree(src, other)
+
+    # fautes du bouchon (HTTP 503): retentées par HttpBackend
+    remote = str(tmp_path / 'flaky_http')
+    server = upload_lake.make_server(remote)
+    server.backend = Flaky(remote)
+    try:
+        summary = upload_lake.upload(src, serve(server), workers=3, chunk_size=20000, backoff=0)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert summary['retries'] > 0 and summary['sent'] == summary['files'] and not summary['errors']
+    assert_same_tree(src, remote)
+
+
+def test_azure_errors_are_translated():
+    exceptions = pytest.importorskip('azure.core.exceptions')
+    pytest.importorskip('azure.storage.blob')
+
+    def fail(ex):
+        raise ex
+
+    for ex, expected in ((exceptions.ServiceRequestError('reset'), upload_lake.TransientError),
+                         (exceptions.HttpResponseError(message='busy'), upload_lake.TransientError),
+                         (exceptions.ResourceExistsError(message='conflict'), ValueError)):
+        if isinstance(ex, exceptions.HttpResponseError):
+            ex.status_code = 503 if expected is upload_lake.TransientError else 409
+        with pytest.raises(expected):
+            upload_lake.AzureBlobBackend._call('PUT x', fail, ex)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import contextlib
+from io import StringIO
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import generate_ficp_daily as gen  # noqa: E402
+import validate_lake  # noqa: E402
+
+START = datetime(2025, 1, 1)
+NB_DAYS = 40
+
+
+def append(root, area, day, *lines):
+    path = os.path.join(root, area, day + '.csv')
+    with open(path, 'a', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + '\n')
+    with open(path, 'r', encoding='utf-8') as f:
+        nb_lines = sum(1 for _ in f)
+    return path, range(nb_lines - len(lines) + 1, nb_lines + 1)
+
+
+def build_lake(root):
+    gen.set_data_root(root)
+    with contextlib.redirect_stdout(None):
+        gen.generate_range(START, START + timedelta(days=NB_DAYS - 1), use_state=False)
+
+
+def test_reports_every_violation_with_location(tmp_path):
+    root = str(tmp_path)
+    build_lake(root)
+    assert validate_lake.validate(root) == []
+
+    insc_path, insc_lines = append(root, 'inscription', '2025-01-10',
+                                   'AAAAAAAA00001,SURVEILLANCE,SURENDETTEMENT,2025-01-10,',
+                                   'AAAAAAAA00002,INSCRIT,PAIEMENT,2025-01-01,2025-01-10',
+                                   'AAAAAAAA00003,INSCRIT,SURENDETTEMENT,,2025-13-01',
+                                   'AAAAAAAA00004,INSCRIT')
+    rad_path, rad_lines = append(root, 'radiation', '2025-01-20',
+                                 'AAAAAAAA00005,2025-01-05,2025-01-20,PAIEMENT',
+                                 'AAAAAAAA00002,2025-01-09,2025-01-20,PAIEMENT',
+                                 'AAAAAAAA00002,2025-01-10,2025-01-09,PAIEMENT')
+    cons_path, cons_lines = append(root, 'consultation', '2025-01-15',
+                                   'AAAAAAAA00006,2025-01-15,SURVEILLANCE,2025-01-16,',
+                                   'AAAAAAAA00007,2025-01-15,INSCRIT,2025-01-01,')
+    # PAIEMENT inscrit avant sa surveillance dans l'ordre des fichiers
+    append(root, 'inscription', '2025-01-30', 'AAAAAAAA00008,SURVEILLANCE,PAIEMENT,2024-12-01,')
+    append(root, 'inscription', '2025-01-05', 'AAAAAAAA00008,INSCRIT,PAIEMENT,2024-12-01,2025-01-05')
+
+    found = {(v.rule, v.path, v.line) for v in validate_lake.validate(root)}
+    assert found == {
+        ('surveillance_type', insc_path, insc_lines[0]),
+        ('paiement_delay', insc_path, insc_lines[1]),
+        ('bad_date', insc_path, insc_lines[2]),
+        ('shape', insc_path, insc_lines[3]),
+        ('radiation_orphan', rad_path, rad_lines[0]),
+        ('radiation_mismatch', rad_path, rad_lines[1]),
+        ('radiation_order', rad_path, rad_lines[2]),
+        ('consultation_chronology', cons_path, cons_lines[0]),
+        ('consultation_status', cons_path, cons_lines[1]),
+    }
+
+    out = StringIO()
+    with contextlib.redirect_stdout(out):
+        assert validate_lake.main([root, '--limit', '0']) == 1
+    assert f'{rad_path}:{rad_lines[2]}: [radiation_order]' in out.getvalue()
+
+
+def test_external_mode_matches_in_memory(tmp_path, monkeypatch):
+    root = str(tmp_path / 'lake')
+    build_lake(root)
+    # même cle inscrite deux fois à la même date dans deux fichiers quotidiens (MD5 distincts)
+    dup_path, dup_lines = append(root, 'inscription', '2025-01-12', 'BBBBBBBB00001,INSCRIT,SURENDETTEMENT,,2025-01-11')
+    append(root, 'inscription', '2025-01-11', 'BBBBBBBB00001,INSCRIT,SURENDETTEMENT,,2025-01-11')
+    append(root, 'radiation', '2025-01-25', 'CCCCCCCC00001,2025-01-05,2025-01-25,PAIEMENT',
+           'BBBBBBBB00001,2025-01-11,2025-01-30,SURENDETTEMENT')
+    append(root, 'radiation', '2025-01-26', 'BBBBBBBB00001,2025-01-11,2025-01-30,SURENDETTEMENT')
+
+    expected = {(v.rule, v.path, v.line) for v in validate_lake.validate(root)}
+    assert ('duplicate_event', dup_path, dup_lines[0]) in expected
+    assert {rule for rule, _, _ in expected} == {'duplicate_event', 'radiation_orphan'}
+
+    # budget minuscule: des centaines de runs, fusion en plusieurs passes
+    monkeypatch.setattr(validate_lake, 'MERGE_FAN_IN', 4)
+    spill = tmp_path / 'spill'
+    spill.mkdir()
+    violations = validate_lake.validate(root, memory_budget=50, spill_dir=str(spill))
+    assert {(v.rule, v.path, v.line) for v in violations} == expected
+    assert [(v.path, v.line) for v in violations] == sorted((v.path, v.line) for v in violations)
+    assert list(spill.iterdir()) == []